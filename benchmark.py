@@ -0,0 +1,364 @@
+"""
+Synthetic benchmarks for the playback, seek and logging hot paths. Runs headless (no display needed).
+
+Usage:
+    python benchmark.py [--quick] [--output bench.json] [--workdir DIR] [--compare OLD.json]
+
+Test videos are generated with cv2.VideoWriter at several resolutions, frame rates and GOP lengths, and
+synthetic logs from 1k to 1M entries. The real VideoProcessor, CSVLogger, LogPanel and CarCounterGUI handlers
+are timed against a stand-in GUI object whose widgets do nothing, so the results exclude Tk drawing.
+Results are written as JSON together with the commit they were measured on. Pass --workdir to keep the
+generated inputs between runs, so that runs on different commits use identical files.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import types
+from datetime import timedelta
+import cv2
+import numpy as np
+from video_processor import VideoProcessor
+from csv_logger import CSVLogger
+from log_panel import LogPanel
+from frame_cache import FrameCache
+from seek_index import SeekIndex
+from event_store import format_timestamp_ms
+from main_gui import CarCounterGUI
+
+# (width, height, fps, gop, fourcc). The GOP is requested from the writer; the measured one is reported.
+VIDEO_CONFIGS = [
+    (640, 480, 30, 12, 'mp4v'),
+    (1280, 720, 30, 12, 'mp4v'),
+    (1920, 1080, 30, 12, 'mp4v'),
+    (1280, 720, 15, 12, 'mp4v'),
+    (1280, 720, 30, 60, 'mp4v'),
+    (1280, 720, 30, 1, 'MJPG'),
+]
+QUICK_VIDEO_CONFIGS = [VIDEO_CONFIGS[0], VIDEO_CONFIGS[1], VIDEO_CONFIGS[-1]]
+LOG_SIZES = [1000, 10000, 100000, 1000000]
+QUICK_LOG_SIZES = [1000, 10000, 100000]
+START_MS = 7 * 3600 * 1000  # Start time of the synthetic videos, 07:00:00
+SKIPS = ['skip_back_5s', 'skip_forward_5s', 'skip_back_5min', 'skip_forward_5min', 'skip_back_1hr', 'skip_forward_1hr']
+ROW_PX = 16  # Pixel height of a log row in the stand-in Text widget
+
+
+class NullWidget:
+    """
+    Stand-in for the Tk widgets the code under test touches. Every call is accepted and does nothing.
+    """
+    def __init__(self, height=25):
+        self.options = {'height': height}
+        self.imgtk = None
+        self.top = 0  # First line shown, for Text.index('@x,y')
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def index(self, position):
+        y = int(position.split(',')[1])
+        return f"{self.top + y // ROW_PX + 1}.0"
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class HeadlessGUI:
+    """
+    The state CarCounterGUI keeps, without any Tk widgets. Handlers are borrowed from CarCounterGUI.
+    """
+    log_key_event = CarCounterGUI.log_key_event
+    log_key = CarCounterGUI.log_key
+    on_log_click = CarCounterGUI.on_log_click
+    update_log_display = CarCounterGUI.update_log_display
+
+    def __init__(self, video_path, log_path):
+        self.root = NullWidget()
+        self.paused = True
+        self.speed = 1
+        self.frame_pos = 0
+        self.start_offset = timedelta(milliseconds=START_MS)
+        self.capture_pos = 0
+        self.reader = None
+        self.play_job = None
+        self.proxy_path = None
+        self.source_fps = None
+        self.video_path = video_path
+        self.undo_stack = []
+        self.redo_stack = []
+        self.last_key = 'c'
+        self.frame_width = 640
+        self.frame_height = 480
+        self.frame_label = NullWidget()
+        self.status_label = NullWidget()
+        self.cache_label = NullWidget()
+        self.blank_imgtk = None
+        self.frame_photo = NullWidget()  # display_image() pastes into this instead of a PhotoImage
+        self.scaler = None
+        self.frame_cache = FrameCache((self.frame_width, self.frame_height))
+        self.log_text = NullWidget()
+        self.log_panel = LogPanel(self.log_text, NullWidget())
+        self.video = VideoProcessor.open_video(video_path)
+        self.seek_index = SeekIndex.load_or_build(video_path)
+        self.logger = CSVLogger(log_path) if log_path else None
+        self.update_log_display()
+
+    def close(self):
+        if self.logger:
+            self.logger.close()
+        self.video.release()
+
+
+def summarize(samples):
+    """
+    Return summary statistics of a list of timings in milliseconds.
+    """
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max': ordered[-1],
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def make_video(path, width, height, fps, gop, fourcc, seconds):
+    """
+    Write a synthetic traffic-camera-like video: a static textured background, a few moving blocks and sensor noise.
+    """
+    rng = np.random.default_rng(0)
+    texture = cv2.resize(rng.integers(0, 255, (height // 16, width // 16, 3), np.uint8), (width, height),
+                         interpolation=cv2.INTER_LINEAR)
+    noise = rng.integers(0, 8, (8, height, width, 3), np.uint8)
+    writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height),
+                             [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+    if not writer.isOpened():
+        raise RuntimeError(f"cannot write {path} with {fourcc}")
+    block = (width // 10, height // 10)
+    for i in range(int(seconds * fps)):
+        frame = cv2.add(texture, noise[i % len(noise)])
+        for lane in range(3):
+            x = (i * (4 + 3 * lane) * width // (fps * 20)) % (width + block[0]) - block[0]
+            y = height // 2 + (lane - 1) * height // 6
+            cv2.rectangle(frame, (x, y), (x + block[0], y + block[1]), (40 + 80 * lane, 200, 255 - 80 * lane), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def make_log(path, size, duration_ms):
+    """
+    Write a synthetic CSV log of size entries spread over duration_ms, in the app's format.
+    """
+    rng = np.random.default_rng(size)
+    stamps = np.sort(rng.integers(START_MS, START_MS + duration_ms, size))
+    keys = rng.choice(list('ctbm'), size)
+    with open(path, 'w') as f:
+        f.write("".join(f"{format_timestamp_ms(ms)}, {key}\n" for ms, key in zip(stamps.tolist(), keys.tolist())))
+
+
+def video_name(config, seconds):
+    width, height, fps, gop, fourcc = config
+    ext = '.avi' if fourcc == 'MJPG' else '.mp4'
+    return f"bench_{width}x{height}_{fps}fps_gop{gop}_{seconds}s{ext}"
+
+
+def bench_video(path, config, reps, rng):
+    """
+    Time show_frame throughput, every skip_* and a log-click seek on one video.
+    """
+    width, height, fps, gop, fourcc = config
+    results = []
+    label = f"{width}x{height}@{fps} gop{gop} {fourcc}"
+    start = time.perf_counter()
+    index = SeekIndex.build(path)
+    index_ms = (time.perf_counter() - start) * 1000
+    if index is not None:
+        index.save(path)
+    log_path = os.path.splitext(path)[0] + "_clicks.csv"
+    gui = HeadlessGUI(path, None)
+    frame_count = int(gui.video.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration_ms = int(frame_count * 1000 / fps)
+    make_log(log_path, 1000, duration_ms)
+    gui.logger = CSVLogger(log_path)
+    gui.update_log_display()
+    index = gui.seek_index
+    measured_gop = round(frame_count / len(index.keyframes), 1) if index is not None and index.keyframes else None
+    meta = {'video': label, 'frames': frame_count, 'measured_gop': measured_gop}
+    results.append(dict(meta, name='seek_index_build', unit='ms', **summarize([index_ms])))
+
+    # Sequential frames, as when stepping or playing without the reader thread
+    VideoProcessor.seek_to_frame(gui, 0)
+    count = min(frame_count - 1, reps * 10)
+    start = time.perf_counter()
+    for _ in range(count):
+        VideoProcessor.show_frame(gui)
+    elapsed = time.perf_counter() - start
+    results.append(dict(meta, name='show_frame', unit='fps', n=count, mean=count / elapsed))
+
+    # Skips from random positions, with an empty frame cache so every one decodes
+    for skip in SKIPS:
+        samples = []
+        for _ in range(reps):
+            VideoProcessor.seek_to_frame(gui, rng.randrange(frame_count))
+            gui.frame_cache.clear()
+            samples.append(timed(getattr(VideoProcessor, skip), gui))
+        results.append(dict(meta, name=skip, unit='ms', **summarize(samples)))
+
+    # Clicking a log entry seeks to its timestamp
+    samples = []
+    panel = gui.log_panel
+    for _ in range(reps):
+        line_number = rng.randrange(1, gui.logger.line_count() + 1)
+        if panel.virtual:
+            panel.first = line_number
+            gui.log_text.top = 0
+        else:
+            gui.log_text.top = line_number - 1
+        gui.frame_cache.clear()
+        samples.append(timed(gui.on_log_click, types.SimpleNamespace(y=ROW_PX // 2)))
+    results.append(dict(meta, name='log_click_seek', unit='ms', **summarize(samples)))
+    gui.close()
+    os.remove(log_path)
+    return results
+
+
+def bench_log(video_path, log_path, size, reps, rng):
+    """
+    Time loading, logging a key press, writing the sorted CSV and undo/redo on a log of the given size.
+    """
+    results = []
+    meta = {'log_size': size}
+    start = time.perf_counter()
+    gui = HeadlessGUI(video_path, log_path)
+    results.append(dict(meta, name='log_load', unit='ms', **summarize([(time.perf_counter() - start) * 1000])))
+    frame_count = int(gui.video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    samples = []
+    for _ in range(reps):
+        gui.frame_pos = rng.randrange(frame_count)
+        samples.append(timed(gui.log_key_event, types.SimpleNamespace(char=rng.choice('ctbm'))))
+    results.append(dict(meta, name='log_key_event', unit='ms', **summarize(samples)))
+
+    samples = [timed(gui.logger.sort_log_file) for _ in range(max(1, reps // 10))]
+    results.append(dict(meta, name='sort_log_file', unit='ms', **summarize(samples)))
+
+    for name, fn in (('delete_entry', lambda: gui.logger.undo(gui)),
+                     ('undo', lambda: gui.logger.restore_last_undo(gui)),
+                     ('redo', lambda: gui.logger.redo(gui))):
+        samples = []
+        for _ in range(reps):
+            gui.log_panel.set_highlight([rng.randrange(1, gui.logger.line_count() + 1)], see=False)
+            samples.append(timed(fn))
+        results.append(dict(meta, name=name, unit='ms', **summarize(samples)))
+    gui.close()
+    return results
+
+
+def environment():
+    """
+    Describe the commit and machine the benchmark ran on.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def result_key(result):
+    return (result['name'], result.get('video'), result.get('log_size'))
+
+
+def compare(old_path, results):
+    """
+    Print how each result changed relative to an earlier results file (lower is better for ms, higher for fps).
+    """
+    with open(old_path) as f:
+        old = {result_key(r): r for r in json.load(f)['results']}
+    for result in results:
+        before = old.get(result_key(result))
+        if before is None:
+            continue
+        field = 'median' if result['unit'] == 'ms' else 'mean'
+        if not before.get(field):
+            continue
+        ratio = result[field] / before[field]
+        label = ' '.join(str(v) for v in result_key(result) if v is not None)
+        print(f"{label:60} {before[field]:10.3f} -> {result[field]:10.3f} {result['unit']:3} ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Car Counter hot paths on synthetic inputs.")
+    parser.add_argument('--quick', action='store_true', help="fewer and shorter inputs")
+    parser.add_argument('--output', default='bench.json', help="results file to write (default bench.json)")
+    parser.add_argument('--workdir', help="folder for the generated inputs, kept between runs (default: temporary)")
+    parser.add_argument('--seconds', type=int, help="length of the test videos (default 120, 20 with --quick)")
+    parser.add_argument('--reps', type=int, help="repetitions per timed operation (default 50, 20 with --quick)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    seconds = args.seconds or (20 if args.quick else 120)
+    reps = args.reps or (20 if args.quick else 50)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='carcounter-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    rng = random.Random(0)
+    results = []
+    try:
+        configs = QUICK_VIDEO_CONFIGS if args.quick else VIDEO_CONFIGS
+        videos = []
+        for config in configs:
+            path = os.path.join(workdir, video_name(config, seconds))
+            if not os.path.exists(path):
+                print(f"generating {os.path.basename(path)}")
+                make_video(path, *config, seconds)
+            videos.append((path, config))
+        for path, config in videos:
+            print(f"video {os.path.basename(path)}")
+            results.extend(bench_video(path, config, reps, rng))
+        for size in (QUICK_LOG_SIZES if args.quick else LOG_SIZES):
+            log_path = os.path.join(workdir, f"bench_log_{size}.csv")
+            source_path = log_path + ".source"
+            if not os.path.exists(source_path):
+                make_log(source_path, size, seconds * 1000)
+            shutil.copyfile(source_path, log_path)  # The run modifies the log, start from the same one every time
+            print(f"log {size}")
+            results.extend(bench_log(videos[0][0], log_path, size, reps, rng))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+    print(f"{len(results)} results -> {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import os
+import time
+from tkinter import Toplevel, Frame, Label, Button
+from lazy_import import lazy_module
+from csv_logger import CSVLogger
+from event_store import format_timestamp_ms
+from frame_cache import FrameCache
+from frame_reader import FrameReader
+from perf_stats import PERF
+from video_processor import VideoProcessor
+
+cv2 = lazy_module('cv2')
+Image = lazy_module('PIL.Image')
+ImageTk = lazy_module('PIL.ImageTk')
+
+CELL_SIZE = (480, 360)  # Display size of each camera in the grid
+MAX_CAMERAS = 4
+
+
+class MasterClock:
+    """
+    Time of day shared by every camera of a grid, in milliseconds since midnight. While running it advances
+    with the wall clock at the playback speed.
+    """
+    def __init__(self, ms=0):
+        self.speed = 1.0
+        self.running = False
+        self._base_ms = ms
+        self._base_time = time.perf_counter()
+
+    def now_ms(self):
+        """
+        Return the current master time.
+        """
+        if not self.running:
+            return self._base_ms
+        return self._base_ms + (time.perf_counter() - self._base_time) * 1000 * self.speed
+
+    def seek(self, ms):
+        """
+        Jump to ms, carrying on from there if running.
+        """
+        self._base_ms = ms
+        self._base_time = time.perf_counter()
+
+    def start(self):
+        self.seek(self.now_ms())
+        self.running = True
+
+    def stop(self):
+        self.seek(self.now_ms())
+        self.running = False
+
+    def set_speed(self, speed):
+        self.seek(self.now_ms())
+        self.speed = speed
+
+
+class StreamClock:
+    """
+    The master clock as seen by one camera: which of its frames is due, in the PlaybackClock interface
+    FrameReader uses to skip late frames.
+    """
+    def __init__(self, master, stream):
+        self.master = master
+        self.stream = stream
+
+    def target_frame(self):
+        """
+        Return the index of the camera's frame that should be on screen right now.
+        """
+        return self.stream.frame_at(self.master.now_ms())
+
+    def seconds_until(self, frame_idx):
+        """
+        Return how many seconds remain until frame_idx is due (negative if it is already late).
+        """
+        return (self.stream.clock_ms(frame_idx) - self.master.now_ms()) / (1000 * self.master.speed)
+
+
+class CameraStream:
+    """
+    One camera of the grid: its capture, decode worker, log and grid cell. It keeps the same playback state
+    as the main window (video, seek_index, frame_pos, capture_pos, ...), so VideoProcessor's seek and timing
+    helpers work on it directly.
+    """
+    def __init__(self, parent, path, start_offset, size=CELL_SIZE):
+        self.video_path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.video = VideoProcessor.open_video(path)
+        self.start_offset = start_offset
+        self.start_ms = start_offset.total_seconds() * 1000
+        self.frame_width, self.frame_height = size
+        self.proxy_path = None
+        self.source_fps = None
+        self.seek_index = None
+        self.frame_pos = 0  # One past the displayed frame, as in the main window
+        self.capture_pos = 0
+        self.frame_cache = FrameCache(size, max_mb=32)  # Only used for frames decoded while landing seeks
+        self.scaler = None
+        self.reader = None
+        self.logger = CSVLogger(os.path.splitext(path)[0] + ".csv")
+        self.logged = []  # Entries logged from the grid, newest last, for Backspace
+        self.cell = Frame(parent, bd=3, bg='gray20')
+        self.photo = ImageTk.PhotoImage('RGBA', size)
+        self.blank = Image.new('RGBA', size, 'black')
+        self.image_label = Label(self.cell, image=self.photo, bg='black')
+        self.image_label.pack(side='top')
+        self.info_label = Label(self.cell, anchor='w')
+        self.info_label.pack(side='top', fill='x')
+        self.photo.paste(self.blank)
+        VideoProcessor.load_seek_index(self, path)
+        self.update_info()
+
+    def frame_count(self):
+        index = self.seek_index
+        return index.frame_count if index is not None else int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def frame_at(self, ms):
+        """
+        Return the index of this camera's frame at master time ms, or -1 before the video starts.
+        """
+        if ms < self.start_ms:
+            return -1
+        return VideoProcessor.ms_to_frame(self, ms - self.start_ms)
+
+    def clock_ms(self, frame_idx):
+        """
+        Return the master time at which frame_idx is shown.
+        """
+        return self.start_ms + VideoProcessor.frame_to_ms(self, frame_idx)
+
+    def update_info(self, selected=False):
+        self.cell.config(bg='yellow' if selected else 'gray20')
+        self.info_label.config(text=f"{self.name}  ({self.logger.line_count()} logged)")
+
+    def seek(self, ms):
+        """
+        Show the frame on screen at master time ms, or a blank cell if the camera is not recording then.
+        """
+        VideoProcessor.stop_reader(self)
+        frame_idx = self.frame_at(ms)
+        if frame_idx < 0:
+            VideoProcessor.position_capture(self, 0)
+            self.frame_pos = 0
+            self.photo.paste(self.blank)
+            return
+        frame_idx = min(frame_idx, self.frame_count() - 1)
+        VideoProcessor.position_capture(self, frame_idx)
+        ret, frame = self.video.read()
+        if not ret:
+            return
+        self.frame_pos = self.capture_pos = frame_idx + 1
+        self.photo.paste(VideoProcessor.scale_for_display(self, frame).image)
+
+    def start(self, master):
+        """
+        Start decoding ahead on a worker thread, paced by master.
+        """
+        if self.reader is None:
+            VideoProcessor.sync_capture(self)
+            self.reader = FrameReader(self.video, (self.frame_width, self.frame_height), clock=StreamClock(master, self))
+            self.reader.start()
+
+    def poll(self):
+        """
+        Show the newest frame that is due, if any. Returns the seconds until the next frame is due, or None if
+        none is ready yet.
+        """
+        reader = self.reader
+        if reader is None:
+            return None
+        item = reader.take(reader.clock.target_frame())
+        if item is not None:
+            self.frame_pos, frame = item
+            self.photo.paste(frame.image)
+            PERF.count('grid_frames_shown')
+        next_pos = reader.next_position()
+        if next_pos is None:
+            if reader.exhausted():
+                VideoProcessor.stop_reader(self)  # End of this camera's video, its last frame stays up
+            return None
+        return reader.clock.seconds_until(next_pos - 1)
+
+    def log(self, key):
+        """
+        Log key at this camera's displayed frame, in the same format as the main window.
+        Nothing is logged while the camera is not showing a frame yet.
+        """
+        if self.frame_pos == 0:
+            return
+        ms = VideoProcessor.frame_to_ms(self, self.frame_pos)
+        self.logged.append(self.logger.log_entry(key, VideoProcessor.format_timestamp(ms, self.start_offset)))
+
+    def undo(self):
+        """
+        Delete the last entry logged from the grid.
+        """
+        if self.logged:
+            self.logger.remove_event(self.logged.pop())
+
+    def close(self):
+        VideoProcessor.stop_reader(self)
+        self.logger.close()
+        self.video.release()
+
+
+class CameraGrid:
+    """
+    Window playing two to four cameras of one site side by side, aligned by their start times.
+    Every camera decodes on its own FrameReader thread paced by one MasterClock, and skips its own late frames,
+    so a camera that cannot keep up drops frames instead of holding back the others.
+    Click a camera or press 1-4 to choose which camera's log letter keys count into.
+    """
+    POLL_MS = 5  # Poll interval while no camera has a frame ready
+
+    def __init__(self, root, paths, offsets):
+        self.window = Toplevel(root)
+        self.window.title("Camera Grid")
+        grid_frame = Frame(self.window)
+        grid_frame.pack(side='top')
+        self.streams = []
+        for i, (path, offset) in enumerate(zip(paths, offsets)):
+            stream = CameraStream(grid_frame, path, offset)
+            stream.cell.grid(row=i // 2, column=i % 2, padx=2, pady=2)
+            for widget in (stream.cell, stream.image_label, stream.info_label):
+                widget.bind('<Button-1>', lambda e, n=i: self.select(n))
+            self.streams.append(stream)
+        self.clock = MasterClock(min(s.start_ms for s in self.streams))
+        self.selected = 0
+        self._job = None
+
+        controls = Frame(self.window)
+        controls.pack(side='top', fill='x', pady=4)
+        Button(controls, text="Play/Pause", command=self.toggle_play).pack(side='left')
+        Button(controls, text="Speed -", command=lambda: self.change_speed(-0.25)).pack(side='left')
+        self.status_label = Label(controls, width=24)  # Master time and speed
+        self.status_label.pack(side='left', padx=4)
+        Button(controls, text="Speed +", command=lambda: self.change_speed(0.25)).pack(side='left')
+        for text, seconds in (("-5min", -300), ("-5s", -5), ("+5s", 5), ("+5min", 300)):
+            Button(controls, text=text, command=lambda s=seconds: self.skip(s)).pack(side='left')
+
+        # Same keys as the main window, plus 1-4 to choose the camera
+        self.window.bind('<space>', lambda e: self.toggle_play())
+        self.window.bind('<KeyPress-equal>', lambda e: self.change_speed(0.25))
+        self.window.bind('<KeyPress-minus>', lambda e: self.change_speed(-0.25))
+        self.window.bind('<semicolon>', lambda e: self.skip(-5))
+        self.window.bind("'", lambda e: self.skip(5))
+        self.window.bind('[', lambda e: self.skip(-300))
+        self.window.bind(']', lambda e: self.skip(300))
+        self.window.bind('<BackSpace>', lambda e: self.undo())
+        for n in range(len(self.streams)):
+            self.window.bind(str(n + 1), lambda e, n=n: self.select(n))
+        for char in 'abcdefghijklmnopqrstuvwxyz':
+            self.window.bind(f'<KeyPress-{char}>', self.on_key)
+            self.window.bind(f'<KeyPress-{char.upper()}>', self.on_key)
+        self.window.bind('<Escape>', lambda e: self.close())
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
+
+        self.seek(self.clock.now_ms())
+        self.select(0)
+        self.window.focus_set()
+
+    def select(self, n):
+        """
+        Make camera n the one letter keys are logged against.
+        """
+        self.selected = n
+        for i, stream in enumerate(self.streams):
+            stream.update_info(selected=i == n)
+
+    def on_key(self, event):
+        if event.char.isalpha():
+            stream = self.streams[self.selected]
+            stream.log(event.char)
+            stream.update_info(selected=True)
+
+    def undo(self):
+        stream = self.streams[self.selected]
+        stream.undo()
+        stream.update_info(selected=True)
+
+    def update_status(self):
+        self.status_label.config(text=f"{format_timestamp_ms(self.clock.now_ms())[:8]}  {self.clock.speed}x")
+
+    def toggle_play(self):
+        if self.clock.running:
+            self.pause()
+            return
+        self.clock.start()
+        for stream in self.streams:
+            stream.start(self.clock)
+        self._tick()
+
+    def pause(self):
+        self.clock.stop()
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+            self._job = None
+        for stream in self.streams:
+            VideoProcessor.stop_reader(stream)
+        self.update_status()
+
+    def change_speed(self, delta):
+        self.clock.set_speed(min(10, max(0.25, self.clock.speed + delta)))
+        self.update_status()
+
+    def seek(self, ms):
+        """
+        Move every camera to master time ms, carrying on playing if the grid was playing.
+        """
+        running = self.clock.running
+        if running:
+            self.pause()
+        self.clock.seek(ms)
+        for stream in self.streams:
+            stream.seek(ms)
+        self.update_status()
+        if running:
+            self.toggle_play()
+
+    def skip(self, seconds):
+        self.seek(self.clock.now_ms() + seconds * 1000)
+
+    def _tick(self):
+        self._job = None
+        if not self.clock.running:
+            return
+        due = [d for d in (stream.poll() for stream in self.streams) if d is not None]
+        self.update_status()
+        if all(stream.reader is None for stream in self.streams):
+            self.pause()  # Every camera has reached its end
+            return
+        delay = max(1, min(50, int(min(due) * 1000))) if due else self.POLL_MS
+        self._job = self.window.after(delay, self._tick)
+
+    def close(self):
+        """
+        Stop playback, save every camera's log and close the window.
+        """
+        self.pause()
+        for stream in self.streams:
+            stream.close()
+        self.window.destroy()
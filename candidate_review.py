@@ -0,0 +1,185 @@
+import threading
+from tkinter import Frame, messagebox
+from video_processor import VideoProcessor
+import motion_detector
+
+
+class RegionSelector:
+    """
+    Lets the user drag a rectangle on the video to choose the region motion detection looks at.
+    The region is stored on the GUI as gui.motion_region, (x, y, w, h) as fractions of the frame.
+    """
+    def __init__(self, gui):
+        self.gui = gui
+        self.label = gui.frame_label
+        self._start = None
+        # Four thin frames drawn over the video label form the rectangle outline
+        self._edges = [Frame(self.label, bg='yellow') for _ in range(4)]
+
+    def arm(self):
+        """
+        Start listening for a drag on the video.
+        """
+        self.label.config(cursor='crosshair')
+        self.label.bind('<ButtonPress-1>', self._on_press)
+        self.label.bind('<B1-Motion>', self._on_drag)
+        self.label.bind('<ButtonRelease-1>', self._on_release)
+
+    def show(self):
+        """
+        Draw the current region outline, or hide it if there is none.
+        """
+        region = self.gui.motion_region
+        if region is None:
+            for edge in self._edges:
+                edge.place_forget()
+            return
+        w, h = self.gui.frame_width, self.gui.frame_height
+        self._draw(region[0] * w, region[1] * h, (region[0] + region[2]) * w, (region[1] + region[3]) * h)
+
+    def _draw(self, x0, y0, x1, y1):
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        top, bottom, left, right = self._edges
+        top.place(x=x0, y=y0, width=max(1, x1 - x0), height=2)
+        bottom.place(x=x0, y=y1 - 2, width=max(1, x1 - x0), height=2)
+        left.place(x=x0, y=y0, width=2, height=max(1, y1 - y0))
+        right.place(x=x1 - 2, y=y0, width=2, height=max(1, y1 - y0))
+
+    def _clamp(self, event):
+        return (min(max(event.x, 0), self.gui.frame_width), min(max(event.y, 0), self.gui.frame_height))
+
+    def _on_press(self, event):
+        self._start = self._clamp(event)
+
+    def _on_drag(self, event):
+        if self._start is not None:
+            self._draw(*self._start, *self._clamp(event))
+
+    def _on_release(self, event):
+        for sequence in ('<ButtonPress-1>', '<B1-Motion>', '<ButtonRelease-1>'):
+            self.label.unbind(sequence)
+        self.label.config(cursor='')
+        if self._start is None:
+            return
+        (x0, y0), (x1, y1) = self._start, self._clamp(event)
+        self._start = None
+        w, h = self.gui.frame_width, self.gui.frame_height
+        if abs(x1 - x0) < 4 or abs(y1 - y0) < 4:
+            self.gui.motion_region = None  # A click without a drag clears the region
+        else:
+            self.gui.motion_region = (min(x0, x1) / w, min(y0, y1) / h, abs(x1 - x0) / w, abs(y1 - y0) / h)
+        self.show()
+
+
+class CandidateReview:
+    """
+    Steps through the candidate events proposed by motion_detector. Tab and Shift+Tab jump to the next and
+    previous suggestion, Return logs the suggestion with the last key used and moves on to the next one.
+    """
+    POLL_MS = 500
+
+    def __init__(self, gui, label):
+        self.gui = gui
+        self.label = label  # Shows the review position
+        self.suggestions = []  # Candidate timestamps in ms, as written to the .candidates file
+        self.current = -1
+        self._worker = None
+        self._result = None
+        self.update_label()
+
+    def load(self, video_path):
+        """
+        Load the candidates saved for a video, if there are any. For a folder timeline, those of every segment.
+        """
+        self.suggestions = sorted(ms for path, _ in self.sources(video_path) for ms in motion_detector.read_candidates(path))
+        self.current = -1
+        self.update_label()
+
+    def sources(self, video_path):
+        """
+        Return [(video file, start time in ms)] making up the open video: each segment of a folder timeline,
+        or the video itself.
+        """
+        timeline = getattr(self.gui.video, 'index', None)
+        if timeline is not None:
+            return [(path, timeline.start_ms + start) for path, start in zip(timeline.paths, timeline.starts)]
+        gui = self.gui
+        return [(video_path, int(gui.start_offset.total_seconds() * 1000) if gui.start_offset else 0)]
+
+    def update_label(self):
+        if self._worker is not None:
+            self.label.config(text="Detecting motion...")
+        elif not self.suggestions:
+            self.label.config(text="No suggestions")
+        elif self.current < 0:
+            self.label.config(text=f"{len(self.suggestions)} suggestions (Tab)")
+        else:
+            self.label.config(text=f"Suggestion {self.current + 1}/{len(self.suggestions)}")
+
+    def detect(self):
+        """
+        Run motion detection on the open video in the background and load the suggestions when it finishes.
+        """
+        gui = self.gui
+        if not gui.video or self._worker is not None:
+            return
+        path, region = gui.video_path, gui.motion_region
+        sources = self.sources(path)
+
+        def worker():
+            try:
+                for source, start_ms in sources:
+                    candidates = motion_detector.detect(source, region)
+                    motion_detector.write_candidates(source, candidates, start_ms)
+                self._result = (path, None)
+            except Exception as e:
+                self._result = (path, e)
+
+        self._result = None
+        self._worker = threading.Thread(target=worker, daemon=True)
+        self._worker.start()
+        self.update_label()
+        gui.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        if self._result is None:
+            self.gui.root.after(self.POLL_MS, self._poll)
+            return
+        path, error = self._result
+        self._worker = None
+        if error is not None:
+            messagebox.showerror("Detect Motion", f"Motion detection failed: {error}")
+        if path == self.gui.video_path:
+            self.load(path)
+        else:
+            self.update_label()
+
+    def step(self, direction):
+        """
+        Seek to the next (direction 1) or previous (direction -1) suggestion.
+        """
+        if not self.suggestions or not self.gui.video:
+            return
+        self.current = min(len(self.suggestions) - 1, max(0, self.current + direction))
+        self.show_current()
+
+    def show_current(self):
+        gui = self.gui
+        offset_ms = gui.start_offset.total_seconds() * 1000 if gui.start_offset else 0
+        frame_idx = VideoProcessor.ms_to_frame(gui, max(0, self.suggestions[self.current] - offset_ms))
+        gui.paused = True
+        VideoProcessor.seek_to_frame(gui, frame_idx)
+        self.update_label()
+
+    def accept(self):
+        """
+        Log the current suggestion with the last key used, then move to the next one.
+        """
+        if not 0 <= self.current < len(self.suggestions) or not self.gui.logger:
+            return
+        self.gui.log_key(self.gui.last_key)
+        if self.current < len(self.suggestions) - 1:
+            self.step(1)
+        else:
+            self.update_label()
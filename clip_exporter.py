@@ -0,0 +1,197 @@
+"""
+Short video clips around logged events, for QA audits.
+
+Usage:
+    python clip_exporter.py VIDEO [--log CSV] [--start HH:MM:SS] [--before 3] [--after 3] [--key K]
+                                  [--sample N] [--seed S] [--workers N] [--out FOLDER]
+
+Every event (or a random sample of them) gets an .mp4 of the seconds around it, named after its key and
+timestamp, in <video>_clips next to the video. Events are sorted and their clips grouped into decode runs:
+clips that overlap or lie close together are written from one seek and a single pass through the frames.
+The runs are spread across a process pool, each worker writing the clips of its runs with cv2.VideoWriter.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from lazy_import import lazy_module
+from event_store import UNPARSED_MS, make_event, format_timestamp_ms
+from seek_index import SeekIndex, frame_at_ms
+from segmented_capture import video_start_ms
+
+cv2 = lazy_module('cv2')
+
+CLIP_FOURCC = 'mp4v'
+MERGE_GAP_SECONDS = 2  # Clips closer than this share a run: decoding through the gap is cheaper than a seek
+MAX_RUN_SECONDS = 120  # Longer runs are split, so dense stretches of events spread across the workers
+
+
+def read_events(log_path):
+    """
+    Read the (ms, key) of every timestamped line of a log, in time order.
+    """
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        events = [make_event(i, line) for i, line in enumerate(f) if line.strip()]
+    return sorted((e.ms, e.key) for e in events if e.ms < UNPARSED_MS)
+
+
+def sample_events(events, n=None, seed=None):
+    """
+    Return a random sample of n events in time order, or all of them if n is None or at least their number.
+    """
+    if n is None or n >= len(events):
+        return list(events)
+    return sorted(random.Random(seed).sample(list(events), n))
+
+
+def clips_folder(video_path):
+    """
+    Return the folder clips of a video (or of a folder of segments) are written to.
+    """
+    return os.path.splitext(os.path.normpath(video_path))[0] + "_clips"
+
+
+def plan_runs(events, start_ms, fps, frame_count, before=3, after=3, index=None):
+    """
+    Turn events (ms, key) into clips (first frame, end frame, file name) and group them into decode runs
+    (first frame, end frame, [clips]), both with exclusive ends. Events outside the video are left out.
+    """
+    clips = []
+    names = set()
+    for ms, key in sorted(events):
+        frame_idx = frame_at_ms(ms - start_ms, fps, frame_count, index)
+        if frame_idx is None:
+            continue
+        first = max(0, frame_idx - int(before * fps))
+        end = min(frame_count, frame_idx + int(after * fps) + 1)
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in key) or "event"
+        base = f"{safe_key}_{format_timestamp_ms(ms).replace(':', '')}"
+        name, n = base, 1
+        while name in names:
+            n += 1
+            name = f"{base}_{n}"  # Several events of one key logged at the same time
+        names.add(name)
+        clips.append((first, end, name + ".mp4"))
+    runs = []
+    gap = int(MERGE_GAP_SECONDS * fps)
+    max_run = int(MAX_RUN_SECONDS * fps)
+    for clip in sorted(clips):
+        if runs and clip[0] <= runs[-1][1] + gap and clip[1] - runs[-1][0] <= max_run:
+            first, end, members = runs[-1]
+            runs[-1] = (first, max(end, clip[1]), members + [clip])
+        else:
+            runs.append((clip[0], clip[1], [clip]))
+    return runs
+
+
+def export_run(video_path, run, out_folder):
+    """
+    Decode one run of a video from the keyframe before it and write its clips. Runs in a worker process.
+    Returns the paths of the clips written.
+    """
+    first, end, clips = run
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return []
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = SeekIndex.load(video_path)
+    pos = index.keyframe_before(first) if index is not None else first
+    cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+    fourcc = cv2.VideoWriter_fourcc(*CLIP_FOURCC)
+    waiting = list(clips)  # Sorted by first frame
+    active = []  # (end frame, writer)
+    written = []
+    try:
+        while pos < end:
+            if pos < first:
+                if not cap.grab():
+                    break
+                pos += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            while waiting and waiting[0][0] <= pos:
+                clip_first, clip_end, name = waiting.pop(0)
+                path = os.path.join(out_folder, name)
+                writer = cv2.VideoWriter(path, fourcc, fps, (frame.shape[1], frame.shape[0]))
+                if writer.isOpened():
+                    active.append((clip_end, writer))
+                    written.append(path)
+            for _, writer in active:
+                writer.write(frame)
+            pos += 1
+            for item in [a for a in active if a[0] <= pos]:
+                item[1].release()
+                active.remove(item)
+    finally:
+        for _, writer in active:
+            writer.release()
+        cap.release()
+    return written
+
+
+def export_clips(video_path, events, start_ms=0, out_folder=None, before=3, after=3, workers=None,
+                 progress=None, stop_event=None):
+    """
+    Write a clip around each event (ms, key) of a video file, whose first frame is at clock time start_ms,
+    using a process pool. progress, if given, is called with the fraction of runs done.
+    Returns the paths of the clips written.
+    """
+    out_folder = out_folder or clips_folder(video_path)
+    os.makedirs(out_folder, exist_ok=True)
+    index = SeekIndex.load(video_path)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if index is not None:
+        fps, frame_count = index.fps, index.frame_count
+    runs = plan_runs(events, start_ms, fps, frame_count, before, after, index)
+    if not runs:
+        return []
+    written = []
+    # Spawned workers, for the same reason as in motion_detector.detect
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = {pool.submit(export_run, video_path, run, out_folder) for run in runs}
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                written.extend(future.result())
+            if progress is not None:
+                progress(1 - len(pending) / len(runs))
+            if stop_event is not None and stop_event.is_set():
+                # Drop the runs not started yet, leaving the block then only waits for the ones in progress
+                pool.shutdown(wait=False, cancel_futures=True)
+                break
+    return sorted(written)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a short clip around each logged event of a video.")
+    parser.add_argument('video')
+    parser.add_argument('--log', help="log CSV (default: the CSV next to the video)")
+    parser.add_argument('--start', help="video start time HH:MM:SS or HHMMSS (default: from the file name)")
+    parser.add_argument('--before', type=float, default=3, help="seconds before each event (default 3)")
+    parser.add_argument('--after', type=float, default=3, help="seconds after each event (default 3)")
+    parser.add_argument('--key', help="only events with this key")
+    parser.add_argument('--sample', type=int, help="export a random sample of this many events")
+    parser.add_argument('--seed', type=int, help="random seed for --sample, to repeat a sample")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--out', help="output folder (default: <video>_clips)")
+    args = parser.parse_args(argv)
+    try:
+        start_ms = video_start_ms(args.video, args.start)
+    except ValueError as e:
+        parser.error(str(e))
+    events = read_events(args.log or os.path.splitext(args.video)[0] + ".csv")
+    if args.key:
+        events = [e for e in events if e[1] == args.key]
+    events = sample_events(events, args.sample, args.seed)
+    paths = export_clips(args.video, events, start_ms, args.out, args.before, args.after, args.workers)
+    print(f"{len(paths)} clips -> {args.out or clips_folder(args.video)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Contact sheets of the frame at each logged event, for checking a session at a glance.
+
+Usage:
+    python contact_sheet.py VIDEO [--log CSV] [--start HH:MM:SS] [--key K] [--columns 5] [--rows 6] [--width 200]
+                                  [--out FOLDER]
+
+The events are sorted and the video is read once from start to end: frames between events are skipped with
+grab(), and only the frame at an event is retrieved, shrunk to a thumbnail and labelled with its timestamp and key.
+Thumbnails are tiled into pages written as JPEGs to <video>_sheets next to the video, one page in memory at a
+time, with an index (sheets.json) of the event on each tile. In the GUI, clicking a tile seeks to its event.
+"""
+import argparse
+import json
+import os
+from lazy_import import lazy_module
+from clip_exporter import read_events
+from event_store import format_timestamp_ms
+from seek_index import SeekIndex, frame_at_ms
+from segmented_capture import video_start_ms
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+ImageTk = lazy_module('PIL.ImageTk')
+
+INDEX_NAME = "sheets.json"
+LABEL_HEIGHT = 16  # Band under each thumbnail holding its label
+SEEK_GAP_SECONDS = 60  # With a seek index, gaps longer than this are crossed by seeking to a keyframe instead of grabbing
+
+
+def sheets_folder(video_path):
+    """
+    Return the folder the contact sheets of a video (or of a folder of segments) are written to.
+    """
+    return os.path.splitext(os.path.normpath(video_path))[0] + "_sheets"
+
+
+class SheetPages:
+    """
+    Tiles labelled thumbnails into pages of columns x rows and writes each page once it is full.
+    Only the page being filled is kept in memory.
+    """
+    def __init__(self, out_folder, columns=5, rows=6, width=200):
+        self.out_folder = out_folder
+        self.columns = columns
+        self.rows = rows
+        self.width = width
+        self.height = None  # Thumbnail height, from the aspect ratio of the first frame
+        self.page = None
+        self.tiles = []  # (ms, key) of each tile on the current page
+        self.sheets = []  # {'file': name, 'tiles': [[ms, key], ...]} of each page written
+
+    def add(self, frame, ms, key):
+        """
+        Add a thumbnail of a BGR frame labelled with the event's timestamp and key.
+        """
+        if self.height is None:
+            self.height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        if self.page is None:
+            self.page = np.zeros((self.rows * (self.height + LABEL_HEIGHT), self.columns * self.width, 3), np.uint8)
+        row, column = divmod(len(self.tiles), self.columns)
+        x, y = column * self.width, row * (self.height + LABEL_HEIGHT)
+        self.page[y:y + self.height, x:x + self.width] = cv2.resize(frame, (self.width, self.height),
+                                                                    interpolation=cv2.INTER_AREA)
+        cv2.putText(self.page, f"{format_timestamp_ms(ms)}  {key}", (x + 4, y + self.height + LABEL_HEIGHT - 4),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
+        self.tiles.append([ms, key])
+        if len(self.tiles) == self.columns * self.rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the current page, if it has any tiles.
+        """
+        if not self.tiles:
+            return
+        name = f"sheet_{len(self.sheets) + 1:04d}.jpg"
+        cv2.imwrite(os.path.join(self.out_folder, name), self.page)
+        self.sheets.append({'file': name, 'tiles': self.tiles})
+        self.page = None
+        self.tiles = []
+
+    def write_index(self):
+        """
+        Write the last page and the index of all pages. Returns the path of the index.
+        """
+        self.flush()
+        path = os.path.join(self.out_folder, INDEX_NAME)
+        with open(path, 'w') as f:
+            json.dump({'columns': self.columns, 'rows': self.rows, 'tile_width': self.width,
+                       'tile_height': (self.height or 0) + LABEL_HEIGHT, 'sheets': self.sheets}, f)
+        return path
+
+
+def walk_video(path, start_ms, events, pages, progress=None, stop_event=None):
+    """
+    Read one video file front to back and add the frame of every event (ms, key) that falls in it to pages.
+    Returns the number of events added.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return 0
+    index = SeekIndex.load(path)
+    fps = index.fps if index is not None else (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    frame_count = index.frame_count if index is not None else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    targets = []
+    for ms, key in events:
+        frame_idx = frame_at_ms(ms - start_ms, fps, frame_count, index)
+        if frame_idx is not None:
+            targets.append((frame_idx, ms, key))
+    targets.sort()
+    seek_gap = int(SEEK_GAP_SECONDS * fps)
+    pos = 0
+    added = 0
+    try:
+        i = 0
+        while i < len(targets) and not (stop_event is not None and stop_event.is_set()):
+            target = targets[i][0]
+            if index is not None and index.keyframe_before(target) > pos + seek_gap:
+                # Far from the next event: a keyframe seek is cheaper than decoding the whole gap
+                pos = index.keyframe_before(target)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            while pos <= target:
+                if not cap.grab():
+                    return added
+                pos += 1
+            ret, frame = cap.retrieve()
+            # Every event on this frame gets a tile from one retrieve
+            while i < len(targets) and targets[i][0] == target:
+                if ret:
+                    pages.add(frame, targets[i][1], targets[i][2])
+                    added += 1
+                i += 1
+            if progress is not None:
+                progress(i / len(targets))
+    finally:
+        cap.release()
+    return added
+
+
+def make_contact_sheets(sources, events, out_folder, columns=5, rows=6, width=200, progress=None, stop_event=None):
+    """
+    Make contact sheets of events (ms, key) in the videos of sources [(video file, start time in ms)], read in
+    that order. Returns the path of the index written to out_folder, or None if stopped first: the index is
+    only written once every page is, so an interrupted run never passes for finished sheets.
+    """
+    os.makedirs(out_folder, exist_ok=True)
+    for name in os.listdir(out_folder):
+        if name == INDEX_NAME or (name.startswith("sheet_") and name.endswith(".jpg")):
+            os.remove(os.path.join(out_folder, name))  # Sheets of an earlier run
+    pages = SheetPages(out_folder, columns, rows, width)
+    events = sorted(events)
+    for n, (path, start_ms) in enumerate(sources):
+        step = None
+        if progress is not None:
+            step = lambda fraction: progress((n + fraction) / len(sources))
+        walk_video(path, start_ms, events, pages, step, stop_event)
+    if stop_event is not None and stop_event.is_set():
+        return None
+    return pages.write_index()
+
+
+def load_index(out_folder):
+    """
+    Read the index of the contact sheets in out_folder, or return None if there is none.
+    """
+    try:
+        with open(os.path.join(out_folder, INDEX_NAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ContactSheetViewer:
+    """
+    Window that pages through the contact sheets of the open video. Clicking a tile seeks to its event.
+    """
+    def __init__(self, gui, out_folder, index):
+        from tkinter import Toplevel, Frame, Label, Button, Canvas, LEFT, RIGHT
+        self.gui = gui
+        self.out_folder = out_folder
+        self.index = index
+        self.current = 0
+        self.photo = None
+        self.window = Toplevel(gui.root)
+        self.window.title("Contact Sheets")
+        top = Frame(self.window)
+        top.pack(side='top', fill='x', padx=6, pady=4)
+        Button(top, text="< Prev", command=lambda: self.show(self.current - 1)).pack(side=LEFT)
+        Button(top, text="Next >", command=lambda: self.show(self.current + 1)).pack(side=LEFT)
+        self.page_label = Label(top, anchor='w')
+        self.page_label.pack(side=LEFT, padx=8)
+        self.event_label = Label(top, anchor='e')
+        self.event_label.pack(side=RIGHT)
+        width = index['columns'] * index['tile_width']
+        height = index['rows'] * index['tile_height']
+        self.canvas = Canvas(self.window, width=width, height=height, highlightthickness=0, bg='black')
+        self.canvas.pack(side='top')
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.window.bind('<Left>', lambda e: self.show(self.current - 1))
+        self.window.bind('<Right>', lambda e: self.show(self.current + 1))
+        self.show(0)
+
+    def show(self, page):
+        """
+        Show page number page (from 0) of the sheets.
+        """
+        sheets = self.index['sheets']
+        if not sheets:
+            self.page_label.config(text="No events in the video")
+            return
+        self.current = min(len(sheets) - 1, max(0, page))
+        image = Image.open(os.path.join(self.out_folder, sheets[self.current]['file']))
+        self.photo = ImageTk.PhotoImage(image)
+        self.canvas.delete('all')
+        self.canvas.create_image(0, 0, image=self.photo, anchor='nw')
+        self.page_label.config(text=f"Sheet {self.current + 1}/{len(sheets)}")
+
+    def on_click(self, event):
+        """
+        Seek the open video to the event of the clicked tile.
+        """
+        from video_processor import VideoProcessor
+        sheets = self.index['sheets']
+        if not sheets:
+            return
+        column = event.x // self.index['tile_width']
+        tile = event.y // self.index['tile_height'] * self.index['columns'] + column
+        tiles = sheets[self.current]['tiles']
+        if column >= self.index['columns'] or tile >= len(tiles):
+            return
+        ms, key = tiles[tile]
+        self.event_label.config(text=f"{format_timestamp_ms(ms)}, {key}")
+        gui = self.gui
+        if not gui.video:
+            return
+        offset_ms = gui.start_offset.total_seconds() * 1000 if gui.start_offset else 0
+        gui.paused = True
+        VideoProcessor.seek_to_frame(gui, VideoProcessor.ms_to_frame(gui, max(0, ms - offset_ms)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Make contact sheets of the frame at each logged event of a video.")
+    parser.add_argument('video')
+    parser.add_argument('--log', help="log CSV (default: the CSV next to the video)")
+    parser.add_argument('--start', help="video start time HH:MM:SS or HHMMSS (default: from the file name)")
+    parser.add_argument('--key', help="only events with this key")
+    parser.add_argument('--columns', type=int, default=5, help="thumbnails across a sheet (default 5)")
+    parser.add_argument('--rows', type=int, default=6, help="thumbnails down a sheet (default 6)")
+    parser.add_argument('--width', type=int, default=200, help="thumbnail width in pixels (default 200)")
+    parser.add_argument('--out', help="output folder (default: <video>_sheets)")
+    args = parser.parse_args(argv)
+    try:
+        start_ms = video_start_ms(args.video, args.start)
+    except ValueError as e:
+        parser.error(str(e))
+    events = read_events(args.log or os.path.splitext(args.video)[0] + ".csv")
+    if args.key:
+        events = [e for e in events if e[1] == args.key]
+    out_folder = args.out or sheets_folder(args.video)
+    make_contact_sheets([(args.video, start_ms)], events, out_folder, args.columns, args.rows, args.width)
+    index = load_index(out_folder)
+    print(f"{sum(len(s['tiles']) for s in index['sheets'])} events on {len(index['sheets'])} sheets -> {out_folder}")
+
+
+if __name__ == "__main__":
+    main()
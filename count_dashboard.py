@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from tkinter import Toplevel, Frame, Label, Spinbox, StringVar, RIGHT, LEFT, Y, BOTH
+from tkinter import ttk
+from event_store import UNPARSED_MS, bound, format_timestamp_ms
+
+INTERVAL_CHOICES = (1, 5, 10, 15, 30, 60)  # Minutes
+
+
+class IntervalCounts:
+    """
+    Number of log events per key in each interval of the day, kept up to date one event at a time.
+    """
+    def __init__(self, interval_ms):
+        self.interval_ms = interval_ms
+        self.counts = {}  # Interval start ms -> {key: count}
+        self.totals = {}  # Key -> count over the whole log
+
+    def interval_of(self, event):
+        """
+        Return the start of the interval event falls in, or None if it has no readable timestamp.
+        """
+        return None if event.ms >= UNPARSED_MS else event.ms // self.interval_ms * self.interval_ms
+
+    def apply(self, op, event):
+        """
+        Count an added ('+') or removed ('-') event. Returns the interval that changed, or None.
+        """
+        start = self.interval_of(event)
+        if start is None:
+            return None
+        delta = 1 if op == '+' else -1
+        row = self.counts.setdefault(start, {})
+        row[event.key] = row.get(event.key, 0) + delta
+        self.totals[event.key] = self.totals.get(event.key, 0) + delta
+        return start
+
+    def rebuild(self, logger):
+        """
+        Recount everything from a logger's indexed event lists, without visiting each event.
+        """
+        self.counts = {}
+        self.totals = {}
+        if logger is None:
+            return
+        timed = logger.count(None, None, UNPARSED_MS)
+        if not timed:
+            return
+        start = logger.events[0].ms // self.interval_ms * self.interval_ms
+        last = logger.events[timed - 1].ms
+        while start <= last:
+            row = logger.count_by_key(start, start + self.interval_ms)
+            if row:
+                self.counts[start] = row
+                for key, n in row.items():
+                    self.totals[key] = self.totals.get(key, 0) + n
+            # Jump straight to the interval of the next event, skipping empty ones
+            next_index = logger.events.bisect_left(bound(start + self.interval_ms))
+            if next_index >= timed:
+                break
+            start = logger.events[next_index].ms // self.interval_ms * self.interval_ms
+
+
+class CountDashboard:
+    """
+    Window with live counts per key for each interval of the open video's log.
+    It listens to the logger, so each logged, deleted, undone or redone entry updates a single row.
+    """
+    def __init__(self, gui):
+        self.gui = gui
+        self.window = None
+        self.logger = None
+        self.counts = IntervalCounts(15 * 60 * 1000)
+        self.keys = []  # Key columns currently shown
+        self.rows = []  # Interval starts shown, ascending
+
+    def show(self):
+        """
+        Open the window (or raise it if it is already open) for the current log.
+        """
+        if self.window is not None:
+            self.window.lift()
+            return
+        self.window = Toplevel(self.gui.root)
+        self.window.title("Live Counts")
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
+        top = Frame(self.window)
+        top.pack(side='top', fill='x', padx=6, pady=4)
+        Label(top, text="Interval (min):").pack(side=LEFT)
+        self.interval_var = StringVar(value=str(self.counts.interval_ms // 60000))
+        Spinbox(top, values=INTERVAL_CHOICES, textvariable=self.interval_var, width=4,
+                command=self.on_interval_change).pack(side=LEFT)
+        self.total_label = Label(top, anchor='e')
+        self.total_label.pack(side=RIGHT)
+        body = Frame(self.window)
+        body.pack(side='top', fill=BOTH, expand=True)
+        self.tree = ttk.Treeview(body, show='headings', height=20)
+        scrollbar = ttk.Scrollbar(body, command=self.tree.yview)
+        self.tree['yscrollcommand'] = scrollbar.set
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self.attach(self.gui.logger)
+
+    def close(self):
+        self.attach(None)
+        self.window.destroy()
+        self.window = None
+
+    def attach(self, logger):
+        """
+        Follow logger's changes, stopping to follow the previous one. Does nothing while the window is closed.
+        """
+        if self.logger is not None and self.on_change in self.logger.listeners:
+            self.logger.listeners.remove(self.on_change)
+        self.logger = logger if self.window is not None else None
+        if self.logger is not None:
+            self.logger.listeners.append(self.on_change)
+        if self.window is not None:
+            self.rebuild()
+
+    def on_interval_change(self):
+        try:
+            minutes = int(self.interval_var.get())
+        except ValueError:
+            return
+        if minutes > 0 and minutes * 60000 != self.counts.interval_ms:
+            self.counts.interval_ms = minutes * 60000
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Recount the whole log and redraw the table.
+        """
+        self.counts.rebuild(self.logger)
+        self._redraw()
+
+    def _redraw(self):
+        self.keys = sorted(self.counts.totals)
+        columns = ['interval'] + self.keys + ['total']
+        self.tree.delete(*self.tree.get_children())
+        self.tree['columns'] = columns
+        self.tree.heading('interval', text="Interval")
+        self.tree.column('interval', width=100, anchor='w')
+        for column in columns[1:]:
+            self.tree.heading(column, text=column.capitalize() if column == 'total' else column)
+            self.tree.column(column, width=50, anchor='e')
+        self.rows = sorted(start for start, row in self.counts.counts.items() if any(row.values()))
+        for start in self.rows:
+            self.tree.insert('', 'end', iid=str(start), values=self._values(start))
+        self._update_total()
+
+    def _values(self, start):
+        row = self.counts.counts.get(start, {})
+        end = start + self.counts.interval_ms
+        label = f"{format_timestamp_ms(start)[:5]}-{format_timestamp_ms(end)[:5]}"
+        return [label] + [row.get(key, 0) for key in self.keys] + [sum(row.values())]
+
+    def _update_total(self):
+        self.total_label.config(text=f"Total: {sum(self.counts.totals.values())}")
+
+    def on_change(self, op, event):
+        """
+        Logger listener: update the row of the interval the event falls in.
+        """
+        if op == 'sync':
+            self.rebuild()
+            return
+        start = self.counts.apply(op, event)
+        if start is None:
+            return
+        if event.key not in self.keys:
+            self._redraw()  # New key, add its column
+            return
+        iid = str(start)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self._values(start))
+        else:
+            i = bisect_left(self.rows, start)
+            self.rows.insert(i, start)
+            self.tree.insert('', i, iid=iid, values=self._values(start))
+        self.tree.see(iid)
+        self._update_total()
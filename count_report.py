@@ -0,0 +1,174 @@
+"""
+Headless batch report of interval counts from many CSV logs.
+
+Usage:
+    python count_report.py LOGS_OR_FOLDERS... [--interval 15] [--output counts.csv] [--per-file per_file.csv]
+
+Every CSV written by the Car Counter app is parsed in a process pool and its events are binned per interval
+and key with NumPy. The merged table has one row per interval start and one column per key.
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from event_store import format_timestamp_ms
+
+# "HH:MM:SS:ms, key" lines as written by CSVLogger.log_entry (ms is optional in older logs)
+LINE_RE = re.compile(rb'^[ \t]*(\d+):(\d+):(\d+)(?::(\d+))?[ \t]*,[ \t]*(\S+)', re.MULTILINE)
+# Older "key: HH:MM:SS:ms" lines, which like event_store.parse_log_line only apply to lines without a comma
+LEGACY_RE = re.compile(rb'^[ \t]*([^\s:,]+)[ \t]*:[ \t]*(\d+):(\d+):(\d+)(?::(\d+))?[^,\n]*$', re.MULTILINE)
+# Layout of the usual fixed-width line "HH:MM:SS:mmm, k"
+DIGIT_OFFSETS = np.array([0, 1, 3, 4, 6, 7, 9, 10, 11])
+DIGIT_WEIGHTS = np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1])
+
+
+def parse_lines_re(text):
+    """
+    Parse log lines of any layout with a regular expression. Returns (timestamps in ms, keys) arrays.
+    """
+    matches = LINE_RE.findall(text) + [(h, m, s, ms, key) for key, h, m, s, ms in LEGACY_RE.findall(text)]
+    if not matches:
+        return np.empty(0, np.int64), np.empty(0, 'S1')
+    fields = np.array(matches, dtype='S')
+    fields[fields[:, 3] == b'', 3] = b'0'
+    h, m, s, ms = fields[:, :4].astype(np.int64).T
+    return ((h * 60 + m) * 60 + s) * 1000 + ms, fields[:, 4]
+
+
+def parse_log(path):
+    """
+    Parse a CSV log into (timestamps in integer ms, keys) NumPy arrays.
+    Fixed-width lines are decoded straight from the byte array; anything else goes through parse_lines_re.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if not raw.endswith(b'\n'):
+        raw += b'\n'
+    data = np.frombuffer(raw, np.uint8)
+    ends = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    fixed = ((lengths == 15) | ((lengths == 16) & (data[np.minimum(starts + 15, len(data) - 1)] == ord('\r'))))
+    candidates = starts[fixed]
+    layout_ok = ((data[candidates + 2] == ord(':')) & (data[candidates + 5] == ord(':')) &
+                 (data[candidates + 8] == ord(':')) & (data[candidates + 12] == ord(',')) &
+                 (data[candidates + 13] == ord(' ')))
+    digits = data[candidates[:, None] + DIGIT_OFFSETS].astype(np.int64) - ord('0')
+    layout_ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    fixed[np.flatnonzero(fixed)[~layout_ok]] = False
+    timestamps = digits[layout_ok] @ DIGIT_WEIGHTS
+    keys = data[candidates[layout_ok] + 14].view('S1')
+    if not fixed.all():
+        other = b'\n'.join(raw[a:b] for a, b in zip(starts[~fixed], ends[~fixed]))
+        other_timestamps, other_keys = parse_lines_re(other)
+        timestamps = np.concatenate((timestamps, other_timestamps))
+        keys = np.concatenate((keys.astype('S'), other_keys))
+    return timestamps, keys
+
+
+def bin_counts(timestamps, keys, interval_ms):
+    """
+    Count events per (interval, key). Returns (interval starts in ms, keys, counts) arrays.
+    """
+    if timestamps.size == 0:
+        return np.empty(0, np.int64), np.empty(0, 'S1'), np.empty(0, np.int64)
+    key_names, key_codes = np.unique(keys, return_inverse=True)
+    bins = timestamps // interval_ms
+    cells, counts = np.unique(bins * len(key_names) + key_codes, return_counts=True)
+    return (cells // len(key_names)) * interval_ms, key_names[cells % len(key_names)], counts
+
+
+def count_file(path, interval_ms):
+    """
+    Parse and bin one log file. Runs in a worker process.
+    """
+    try:
+        timestamps, keys = parse_log(path)
+    except OSError:
+        timestamps, keys = np.empty(0, np.int64), np.empty(0, 'S1')
+    return path, bin_counts(timestamps, keys, interval_ms)
+
+
+def find_logs(paths):
+    """
+    Expand folders into the CSV logs they contain (recursively) and return the sorted list of log files.
+    """
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            logs.extend(glob.glob(os.path.join(path, '**', '*.csv'), recursive=True))
+        else:
+            logs.append(path)
+    return sorted(set(logs))
+
+
+def aggregate(logs, interval_ms, workers=None):
+    """
+    Bin every log in a process pool. Returns the per-file results and the merged
+    (interval starts, keys, counts) arrays summed over all files.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(logs) // ((workers or os.cpu_count() or 1) * 4))
+        results = list(pool.map(count_file, logs, [interval_ms] * len(logs), chunksize=chunksize))
+    starts = np.concatenate([r[1][0] for r in results]) if results else np.empty(0, np.int64)
+    keys = np.concatenate([r[1][1] for r in results]) if results else np.empty(0, 'S1')
+    counts = np.concatenate([r[1][2] for r in results]) if results else np.empty(0, np.int64)
+    if counts.size == 0:
+        return results, (starts, keys, counts)
+    key_names, key_codes = np.unique(keys, return_inverse=True)
+    cells, inverse = np.unique(starts // interval_ms * len(key_names) + key_codes, return_inverse=True)
+    merged = np.bincount(inverse, weights=counts).astype(np.int64)
+    return results, ((cells // len(key_names)) * interval_ms, key_names[cells % len(key_names)], merged)
+
+
+def write_merged(path, starts, keys, counts):
+    """
+    Write the merged table: one row per interval start, one column per key and a total column.
+    """
+    key_names = [k.decode() for k in np.unique(keys)]
+    rows = {}
+    for start, key, count in zip(starts.tolist(), keys.tolist(), counts.tolist()):
+        rows.setdefault(start, dict.fromkeys(key_names, 0))[key.decode()] = count
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['interval_start'] + key_names + ['total'])
+        for start in sorted(rows):
+            values = [rows[start][k] for k in key_names]
+            writer.writerow([format_timestamp_ms(start)] + values + [sum(values)])
+
+
+def write_per_file(path, results):
+    """
+    Write the per-file table: one row per file, interval start and key.
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'interval_start', 'key', 'count'])
+        for log, (starts, keys, counts) in results:
+            for start, key, count in zip(starts.tolist(), keys.tolist(), counts.tolist()):
+                writer.writerow([log, format_timestamp_ms(start), key.decode(), count])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate Car Counter CSV logs into per-interval counts.")
+    parser.add_argument('logs', nargs='+', help="CSV log files or folders to search for them")
+    parser.add_argument('--interval', type=float, default=15, help="interval length in minutes (default 15)")
+    parser.add_argument('--output', default='counts.csv', help="merged table to write (default counts.csv)")
+    parser.add_argument('--per-file', help="also write a per-file table to this path")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    interval_ms = max(1, int(args.interval * 60 * 1000))
+    outputs = {os.path.abspath(p) for p in (args.output, args.per_file) if p}
+    logs = [log for log in find_logs(args.logs) if os.path.abspath(log) not in outputs]
+    results, merged = aggregate(logs, interval_ms, args.workers)
+    write_merged(args.output, *merged)
+    if args.per_file:
+        write_per_file(args.per_file, results)
+    print(f"{len(logs)} logs, {int(merged[2].sum())} events -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,295 @@
 import os
+import queue
+import threading
+import zlib
+from perf_stats import PERF
+from event_store import SortedEventList, bound, make_event, parse_query, format_timestamp_ms
 
 class CSVLogger:
+    """
+    Keeps the log as an in-memory sorted list of events and persists it in the background.
+    Every change is appended to a journal file (<csv>.journal) by a writer thread, and the CSV itself is
+    rewritten as a sorted snapshot every COMPACT_EVERY changes, on export and on close. The journal records
+    which CSV contents it applies to, so the CSV plus the journal can always be recovered after a crash.
+    If a ProjectStore is attached, the writer thread also applies each batch of changes to it in one transaction.
+    Functions in listeners are called with (op, event) after every change, and with ('sync', None) when the
+    whole log is replaced, so views such as the live counts can follow the log without rescanning it.
+    """
+    COMPACT_EVERY = 500  # Journal records between CSV snapshots
+    INVERSE = {'+': '-', '-': '+'}  # Operation that undoes an insert ('+') or a delete ('-')
+
     def __init__(self, filename):
         self.filename = filename
+        self.journal_filename = filename + ".journal"
+        self.events = SortedEventList()
+        self.by_key = {}  # Key -> SortedEventList of that key's events, for per-key queries
+        self._next_id = 0
+        self._journal_count = 0  # Records written to the journal since the last snapshot
+        self._writes = queue.Queue()
+        self._journal = None
+        self._store = None  # ProjectStore and video id changes are mirrored to, owned by the writer thread
+        self._video_id = None
+        self.listeners = []
+        self.load()
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+
+    def _new_event(self, text):
+        event = make_event(self._next_id, text)
+        self._next_id += 1
+        return event
+
+    def load(self):
+        """
+        Load the CSV and replay any journal left behind by a session that did not close cleanly.
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                content = f.read()
+        except OSError:
+            content = b""
+        lines = [line for line in content.decode('utf-8', errors='replace').splitlines() if line.strip()]
+        events = [self._new_event(line) for line in lines]
+        replayed = False
+        try:
+            with open(self.journal_filename, 'r') as f:
+                header = f.readline().strip()
+                if header == self._journal_header(content):
+                    # Identical lines are interchangeable in the CSV, so a delete may remove any entry with that text
+                    by_text = {}
+                    for i, event in enumerate(events):
+                        by_text.setdefault(event.text, []).append(i)
+                    for record in f:
+                        if not record.endswith('\n'):
+                            break  # Torn last record: the crash came before it was fully written
+                        op, text = record[:1], record[2:-1]
+                        if op == '+':
+                            by_text.setdefault(text, []).append(len(events))
+                            events.append(self._new_event(text))
+                        elif op == '-' and by_text.get(text):
+                            events[by_text[text].pop()] = None
+                        replayed = True
+        except OSError:
+            pass
+        self.events = SortedEventList(event for event in events if event is not None)
+        self._index_keys()
+        if replayed:
+            self._write_snapshot(self.lines())
+        else:
+            self._open_journal(content)
+
+    def _index_keys(self):
+        by_key = {}
+        for event in self.events:
+            by_key.setdefault(event.key, []).append(event)
+        self.by_key = {key: SortedEventList(events) for key, events in by_key.items()}
+
+    @staticmethod
+    def _journal_header(content):
+        return f"# base crc32={zlib.crc32(content)} size={len(content)}"
+
+    def _open_journal(self, content):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_filename, 'w')
+        self._journal.write(self._journal_header(content) + "\n")
+        self._journal.flush()
+
+    def _write_snapshot(self, lines):
+        # Write the CSV atomically, then start a new journal based on it
+        with PERF.time('csv_snapshot'):
+            content = "".join(line + "\n" for line in lines).encode('utf-8')
+            tmp_path = self.filename + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filename)
+            self._open_journal(content)
+
+    def _run_writer(self):
+        while True:
+            records = [self._writes.get()]
+            while True:
+                try:
+                    records.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            store_ops = []
+            for record in records:
+                kind = record[0]
+                try:
+                    if kind == 'journal':
+                        self._journal.write(record[1])
+                        if self._store is not None:
+                            store_ops.append(record[2:])
+                    elif kind == 'snapshot':
+                        self._write_snapshot(record[1])
+                    elif kind in ('attach', 'sync'):
+                        self._flush_store(store_ops)
+                        if kind == 'attach':
+                            self._store, self._video_id = record[1], record[2]
+                        if self._store is not None:
+                            self._store.replace_events(self._video_id, record[-2])
+                    elif kind == 'stop':
+                        self._flush_store(store_ops)
+                        self._journal.close()
+                except Exception:
+                    pass
+                if kind != 'journal':
+                    record[-1].set()
+                if kind == 'stop':
+                    return
+            try:
+                with PERF.time('journal_sync'):
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+            except Exception:
+                pass
+            PERF.count('journal_batches')
+            self._flush_store(store_ops)
+
+    def _flush_store(self, ops):
+        # Apply the changes collected from the journal records to the project store in one transaction
+        if ops and self._store is not None:
+            try:
+                with PERF.time('store_batch'):
+                    self._store.apply(self._video_id, ops)
+            except Exception:
+                pass
+        ops.clear()
+
+    def _record(self, op, event):
+        self._writes.put(('journal', f"{op} {event.text}\n", op, event))
+        self._journal_count += 1
+        if self._journal_count >= self.COMPACT_EVERY:
+            self._snapshot(wait=False)
+
+    def _snapshot(self, wait=True):
+        self._journal_count = 0
+        done = threading.Event()
+        self._writes.put(('snapshot', self.lines(), done))
+        if wait:
+            done.wait()
+
+    def attach_store(self, store, video_id):
+        """
+        Mirror the log to a ProjectStore under video_id. The stored events are replaced with the current log,
+        and every later change is written to the store along with the journal.
+        """
+        self._writes.put(('attach', store, video_id, list(self.events), threading.Event()))
+
+    def lines(self):
+        """
+        Return the log entries as lines of text in sorted order.
+        """
+        return [event.text for event in self.events]
+
+    def line_count(self):
+        """
+        Return the number of log entries.
+        """
+        return len(self.events)
+
+    def line_text(self, line_number):
+        """
+        Return the text of the entry at the given 1-based line number.
+        """
+        return self.events[line_number - 1].text
+
+    def line_number(self, event):
+        """
+        Return the 1-based line number of event in the sorted log.
+        """
+        return self.events.index(event) + 1
+
+    def add_event(self, event):
+        """
+        Insert an event into the log and return its 1-based line number.
+        """
+        with PERF.time('log_add'):
+            rank = self.events.add(event)
+            self.by_key.setdefault(event.key, SortedEventList()).add(event)
+            self._record('+', event)
+        self._notify('+', event)
+        return rank + 1
+
+    def remove_event(self, event):
+        """
+        Remove an event from the log and return the 1-based line number it had.
+        """
+        rank = self.events.remove(event)
+        self.by_key[event.key].remove(event)
+        self._record('-', event)
+        self._notify('-', event)
+        return rank + 1
+
+    def _notify(self, op, event):
+        for listener in self.listeners:
+            listener(op, event)
+
+    def apply(self, op, event):
+        """
+        Apply an operation to the log: '+' inserts event, '-' removes it. Returns the 1-based line number affected.
+        """
+        return self.add_event(event) if op == '+' else self.remove_event(event)
+
+    def _range(self, key, start_ms, end_ms):
+        # The sorted list to search and the positions of the events in [start_ms, end_ms) within it
+        events = self.events if key is None else self.by_key.get(key, SortedEventList())
+        start = events.bisect_left(bound(start_ms)) if start_ms is not None else 0
+        stop = events.bisect_left(bound(end_ms)) if end_ms is not None else len(events)
+        return events, start, stop
+
+    def query(self, key=None, start_ms=None, end_ms=None):
+        """
+        Return the events with the given key (any key if None) timestamped in [start_ms, end_ms), in order.
+        Either end of the range may be None. Takes O(log n + k) time for k results.
+        """
+        events, start, stop = self._range(key, start_ms, end_ms)
+        return list(events.islice(start, stop))
+
+    def count(self, key=None, start_ms=None, end_ms=None):
+        """
+        Return the number of events query() would return, in O(log n) time.
+        """
+        _, start, stop = self._range(key, start_ms, end_ms)
+        return max(0, stop - start)
+
+    def count_by_key(self, start_ms=None, end_ms=None):
+        """
+        Return {key: number of events in [start_ms, end_ms)} for every key that has events in the range.
+        """
+        counts = {key: self.count(key, start_ms, end_ms) for key in sorted(self.by_key)}
+        return {key: n for key, n in counts.items() if n}
 
     def log_entry(self, key, timestamp):
         """
-        Append a new log entry with the given key and timestamp to the CSV file.
+        Add a new log entry with the given key and timestamp. Returns the new LogEvent.
         """
-        with open(self.filename, 'a') as file:
-            file.write(f"{timestamp}, {key}\n")
+        event = self._new_event(f"{timestamp}, {key}")
+        self.add_event(event)
+        return event
 
     def sort_log_file(self):
         """
-        Sort the log file entries by timestamp in ascending order.
+        Write the sorted log to the CSV file now, instead of waiting for the next background snapshot.
         """
-        import re
-        try:
-            with open(self.filename, 'r') as f:
-                lines = [line for line in f if line.strip()]
-            def parse_ts(line):
-                if ',' in line:
-                    ts = line.split(',')[0].strip()
-                elif ':' in line:
-                    ts = line.split(':', 1)[1].strip()
-                else:
-                    return float('inf')
-                parts = re.split(r'[:]', ts)
-                try:
-                    h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-                    ms = int(parts[3]) if len(parts) > 3 else 0
-                    return h * 3600 + m * 60 + s + ms / 1000.0
-                except Exception:
-                    return float('inf')
-            lines.sort(key=parse_ts)
-            with open(self.filename, 'w') as f:
-                f.writelines(lines)
-        except Exception:
-            pass
+        self._snapshot()
+
+    def close(self):
+        """
+        Write the final CSV snapshot and stop the background writer.
+        """
+        if self._writer.is_alive():
+            self._snapshot()
+            done = threading.Event()
+            self._writes.put(('stop', done))
+            done.wait()
+            try:
+                os.remove(self.journal_filename)
+            except OSError:
+                pass
 
     def export_log(self, gui):
         """
@@ -59,6 +311,7 @@ class CSVLogger:
         )
         if export_path:
             try:
+                self.sort_log_file()
                 with open(self.filename, 'r') as src, open(export_path, 'w') as dst:
                     dst.write(src.read())
             except Exception:
@@ -74,114 +327,102 @@ class CSVLogger:
         confirm = messagebox.askyesno("Clear Log", "Are you sure you want to clear the log? This cannot be undone.")
         if confirm:
             try:
-                with open(self.filename, 'w') as f:
-                    f.write("")
+                self.events = SortedEventList()
+                self.by_key = {}
+                self._writes.put(('sync', [], threading.Event()))
+                self._notify('sync', None)
+                self.sort_log_file()
+                gui.undo_stack.clear()
+                gui.redo_stack.clear()
                 gui.update_log_display()
             except Exception:
                 pass
 
     def undo(self, gui):
         """
-        Undo the last log entry (or highlighted entry) in the GUI, supporting undo/redo stacks.
+        Delete the highlighted entry (or the last one if none is highlighted) and record it on the undo stack.
         """
-        highlight_next = None
         try:
-            ranges = gui.log_text.tag_ranges('highlight')
-            if ranges:
-                start = ranges[0]
-                line_number = int(str(start).split('.')[0])
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                if 1 <= line_number <= len(lines):
-                    removed_entry = lines[line_number - 1]
-                    removed_index = line_number - 1
-                    gui.undo_stack.append((removed_entry, removed_index))
-                    gui.redo_stack.clear()
-                    del lines[line_number - 1]
-                    with open(self.filename, 'w') as f:
-                        f.writelines(lines)
-                    self.sort_log_file()
-                    if line_number > 1:
-                        highlight_next = line_number - 1
-                    elif lines:
-                        highlight_next = 1
-                    else:
-                        highlight_next = None
-            else:
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                if lines:
-                    removed_entry = lines[-1]
-                    removed_index = len(lines) - 1
-                    gui.undo_stack.append((removed_entry, removed_index))
-                    gui.redo_stack.clear()
-                self.undo_last_entry()
-                self.sort_log_file()
+            highlighted = gui.log_panel.highlighted_line()
+            line_number = highlighted if highlighted is not None else len(self.events)
+            if 1 <= line_number <= len(self.events):
+                removed_entry = self.events[line_number - 1]
+                self.remove_event(removed_entry)
+                gui.undo_stack.append(('-', removed_entry))
+                gui.redo_stack.clear()
+                if highlighted is None:
+                    highlight_next = None
+                elif line_number > 1:
+                    highlight_next = line_number - 1
+                elif self.events:
+                    highlight_next = 1
+                else:
+                    highlight_next = None
+                gui.log_panel.delete_line(line_number, highlight_line=highlight_next)
         except Exception:
             pass
         gui.paused = True
-        gui.update_log_display(highlight_line=highlight_next)
 
     def restore_last_undo(self, gui):
         """
-        Restore the last undone log entry from the undo stack and update the GUI log display.
+        Undo the last operation on the undo stack (re-adding a deleted entry or removing a logged one)
+        and move it to the redo stack.
         """
         if gui.undo_stack:
             try:
-                entry, index = gui.undo_stack.pop()
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                insert_at = min(index, len(lines))
-                lines.insert(insert_at, entry)
-                with open(self.filename, 'w') as f:
-                    f.writelines(lines)
-                self.sort_log_file()
-                with open(self.filename, 'r') as f:
-                    sorted_lines = [line for line in f if line.strip()]
-                highlight_line = None
-                for idx, line in enumerate(sorted_lines, 1):
-                    if line.strip() == entry.strip():
-                        highlight_line = idx
-                        break
-                gui.redo_stack.append((entry, index))
-                gui.update_log_display(highlight_line=highlight_line)
+                op, event = gui.undo_stack.pop()
+                self._show_op(gui, self.INVERSE[op], event)
+                gui.redo_stack.append((op, event))
             except Exception:
                 pass
 
     def redo(self, gui):
         """
-        Redo the last undone log entry from the redo stack and update the GUI log display.
+        Apply the last undone operation again and move it back to the undo stack.
         """
         if gui.redo_stack:
             try:
-                entry, index = gui.redo_stack.pop()
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                for i, line in enumerate(lines):
-                    if line.strip() == entry.strip():
-                        del lines[i]
-                        break
-                with open(self.filename, 'w') as f:
-                    f.writelines(lines)
-                self.sort_log_file()
-                gui.undo_stack.append((entry, index))
-                highlight_line = index if index > 0 else 1
-                gui.update_log_display(highlight_line=highlight_line)
+                op, event = gui.redo_stack.pop()
+                self._show_op(gui, op, event)
+                gui.undo_stack.append((op, event))
             except Exception:
                 pass
 
+    def _show_op(self, gui, op, event):
+        # Apply op and update the log display in place. Events are found by (time, id), so identical lines never mix.
+        line_number = self.apply(op, event)
+        if op == '+':
+            gui.log_panel.insert_line(line_number, highlight=True)
+        else:
+            gui.log_panel.delete_line(line_number, highlight_line=min(max(1, line_number - 1), len(self.events)) or None)
+
     def search_entries(self, search_term, gui):
         """
-        Highlight all log entries containing the search_term (case-insensitive) in the GUI log display.
+        Highlight the log entries matching search_term in the GUI log display.
+        A query such as "t 07:30-08:15" (a key, a time range, or both) is answered from the key and time indexes
+        and the count of each key in the range is shown. Anything else is matched as text, ignoring case.
         """
-        if not os.path.exists(self.filename):
-            print("No log file found.")
+        from tkinter import messagebox
+        if not self.events:
+            print("No log entries found.")
+            return
+        parsed = parse_query(search_term)
+        if parsed is not None:
+            key, start_ms, end_ms = parsed
+            highlight_lines = [self.line_number(event) for event in self.query(key, start_ms, end_ms)]
+            gui.log_panel.set_highlight(highlight_lines)
+            start_text = format_timestamp_ms(start_ms) if start_ms is not None else "start"
+            end_text = format_timestamp_ms(end_ms) if end_ms is not None else "end"
+            counts = self.count_by_key(start_ms, end_ms)
+            summary = ", ".join(f"{k}: {n}" for k, n in counts.items()) or "none"
+            messagebox.showinfo("Search Log", f"{len(highlight_lines)} entries from {start_text} to {end_text}.\n"
+                                              f"Entries per key in this range: {summary}")
             return
         highlight_lines = []
-        with open(self.filename, 'r') as f:
-            for idx, line in enumerate(f, 1):
-                if search_term.lower() in line.lower():
-                    highlight_lines.append(idx)
-        gui.update_log_display(highlight_lines=highlight_lines)
+        term = search_term.lower()
+        for idx, event in enumerate(self.events, 1):
+            if term in event.text.lower():
+                highlight_lines.append(idx)
+        gui.log_panel.set_highlight(highlight_lines)
         if not highlight_lines:
-            print(f"No entries found containing: {search_term}")
\ No newline at end of file
+            print(f"No entries found containing: {search_term}")
@@ -0,0 +1,256 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+
+# One logged event. Events sort by time, then by id so entries at the same time keep the order they were logged in.
+# ms is the timestamp in integer milliseconds (UNPARSED_MS if the line has no readable timestamp),
+# text is the line exactly as it appears in the CSV, without the newline.
+LogEvent = namedtuple('LogEvent', ['ms', 'id', 'key', 'text'])
+
+UNPARSED_MS = 2 ** 62  # Sorts lines without a readable timestamp after everything else
+
+
+def parse_timestamp_ms(ts):
+    """
+    Parse an HH:MM:SS:ms (or HH:MM:SS) timestamp string into integer milliseconds. Returns None if unreadable.
+    """
+    parts = ts.strip().split(':')
+    try:
+        h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
+        ms = int(parts[3]) if len(parts) > 3 else 0
+    except (ValueError, IndexError):
+        return None
+    return ((h * 60 + m) * 60 + s) * 1000 + ms
+
+
+def format_timestamp_ms(ms):
+    """
+    Format integer milliseconds as an HH:MM:SS:ms string, the inverse of parse_timestamp_ms.
+    """
+    seconds, milliseconds = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}:{milliseconds:03}"
+
+
+def parse_clock_ms(text):
+    """
+    Parse a clock time given as HH:MM, HH:MM:SS or HH:MM:SS:ms into integer milliseconds. Returns None if unreadable.
+    """
+    parts = text.strip().split(':')
+    if not 2 <= len(parts) <= 4:
+        return None
+    return parse_timestamp_ms(':'.join(parts + ['0'] * (3 - len(parts))))
+
+
+def parse_query(text):
+    """
+    Parse a log query such as "t 07:30-08:15", "07:00-08:00" or "t" into (key, start_ms, end_ms).
+    The key and either end of the range may be None. Returns None if text is not a query.
+    """
+    key = start_ms = end_ms = None
+    for token in text.split():
+        if '-' in token:
+            start_text, end_text = token.split('-', 1)
+            start_ms = parse_clock_ms(start_text) if start_text else None
+            end_ms = parse_clock_ms(end_text) if end_text else None
+            if (start_text and start_ms is None) or (end_text and end_ms is None):
+                return None
+        elif key is None and len(token) == 1 and token.isalpha():
+            key = token
+        else:
+            return None
+    if key is None and start_ms is None and end_ms is None:
+        return None
+    return key, start_ms, end_ms
+
+
+def bound(ms):
+    """
+    Return a sentinel that sorts before every event at ms, for bisecting a SortedEventList by time.
+    """
+    return LogEvent(ms, -1, '', '')
+
+
+def parse_log_line(line):
+    """
+    Split a log line into (timestamp string, key). Accepts "timestamp, key" and the older "key: timestamp" format.
+    Returns (None, None) if the line has neither form.
+    """
+    if ',' in line:
+        ts, key = line.split(',', 1)
+        return ts.strip(), key.strip()
+    if ':' in line:
+        key, ts = line.split(':', 1)
+        return ts.strip(), key.strip()
+    return None, None
+
+
+def make_event(event_id, text):
+    """
+    Build a LogEvent from a line of the log file.
+    """
+    text = text.rstrip('\r\n')
+    ts, key = parse_log_line(text)
+    ms = parse_timestamp_ms(ts) if ts is not None else None
+    return LogEvent(UNPARSED_MS if ms is None else ms, event_id, key or '', text)
+
+
+class SortedEventList:
+    """
+    Sorted sequence of events split into small buckets, with a Fenwick tree over the bucket sizes.
+    Inserting, removing and finding the position of an event, or fetching the event at a position,
+    take O(log n) time, so the cost of a keypress does not grow with the size of the log.
+    """
+    LOAD = 256  # Buckets are split when they reach twice this size
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self._buckets = [items[i:i + self.LOAD] for i in range(0, len(items), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(items)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def __getitem__(self, rank):
+        if rank < 0:
+            rank += self._len
+        if not 0 <= rank < self._len:
+            raise IndexError('event index out of range')
+        b, offset = self._locate(rank)
+        return self._buckets[b][offset]
+
+    def islice(self, start, stop):
+        """
+        Iterate over the items at positions start..stop (exclusive) without visiting the ones before them.
+        """
+        stop = min(stop, self._len)
+        if start >= stop:
+            return
+        b, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._buckets[b][offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            b += 1
+            offset = 0
+
+    def add(self, item):
+        """
+        Insert item and return its position.
+        """
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            self._rebuild_tree()
+            return 0
+        b = bisect_left(self._maxes, item)
+        if b == len(self._maxes):
+            b -= 1
+            self._buckets[b].append(item)
+            self._maxes[b] = item
+        else:
+            insort(self._buckets[b], item)
+        self._len += 1
+        rank = self._prefix(b) + bisect_left(self._buckets[b], item)
+        if len(self._buckets[b]) > 2 * self.LOAD:
+            bucket = self._buckets[b]
+            self._buckets[b:b + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[b:b + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(b, 1)
+        return rank
+
+    def remove(self, item):
+        """
+        Remove item and return the position it had. Raises ValueError if it is not present.
+        """
+        b = bisect_left(self._maxes, item)
+        if b == len(self._maxes):
+            raise ValueError('event not in list')
+        bucket = self._buckets[b]
+        i = bisect_left(bucket, item)
+        if i == len(bucket) or bucket[i] != item:
+            raise ValueError('event not in list')
+        rank = self._prefix(b) + i
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[b] = bucket[-1]
+            self._tree_add(b, -1)
+        else:
+            del self._buckets[b]
+            del self._maxes[b]
+            self._rebuild_tree()
+        return rank
+
+    def index(self, item):
+        """
+        Return the position of item. Raises ValueError if it is not present.
+        """
+        rank = self.bisect_left(item)
+        if rank == self._len or self[rank] != item:
+            raise ValueError('event not in list')
+        return rank
+
+    def bisect_left(self, item):
+        """
+        Return the position where item would be inserted before any equal items.
+        """
+        b = bisect_left(self._maxes, item)
+        if b == len(self._maxes):
+            return self._len
+        return self._prefix(b) + bisect_left(self._buckets[b], item)
+
+    def bisect_right(self, item):
+        """
+        Return the position where item would be inserted after any equal items.
+        """
+        b = bisect_right(self._maxes, item)
+        if b == len(self._maxes):
+            return self._len
+        return self._prefix(b) + bisect_right(self._buckets[b], item)
+
+    def _rebuild_tree(self):
+        # Fenwick tree over bucket sizes, 1-based
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, b, delta):
+        i = b + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, b):
+        # Number of items in the buckets before bucket b
+        total = 0
+        while b > 0:
+            total += self._tree[b]
+            b -= b & -b
+        return total
+
+    def _locate(self, rank):
+        # Find (bucket, offset) of the item at rank by descending the Fenwick tree
+        b = 0
+        step = 1 << (len(self._tree).bit_length())
+        while step:
+            nxt = b + step
+            if nxt < len(self._tree) and self._tree[nxt] <= rank:
+                b = nxt
+                rank -= self._tree[nxt]
+            step >>= 1
+        return b, rank
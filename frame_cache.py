@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from lazy_import import lazy_module
+from frame_reader import DisplayFrame
+
+np = lazy_module('numpy')
+
+
+class FrameCache:
+    """
+    Memory-bounded LRU cache of display-size frames keyed by frame index. Frames shown during playback and
+    decoded while landing a seek are copied in, so stepping back and forth around the playhead can show them
+    without touching the decoder. Buffers of evicted frames are recycled, so filling the cache does not allocate.
+    """
+    def __init__(self, size, max_mb=256):
+        self.size = size
+        self.frame_bytes = size[0] * size[1] * 4
+        self.max_frames = 0
+        self._frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.resize(max_mb)
+
+    def resize(self, max_mb):
+        """
+        Change the memory limit, dropping the least recently used frames if needed.
+        """
+        self.max_mb = max_mb
+        self.max_frames = max(0, int(max_mb * 1024 * 1024) // self.frame_bytes)
+        while len(self._frames) > self.max_frames:
+            self._frames.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every cached frame, for example when another video is opened.
+        """
+        self._frames.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, frame_idx):
+        return frame_idx in self._frames
+
+    def put(self, frame_idx, frame):
+        """
+        Copy a DisplayFrame into the cache under frame_idx.
+        """
+        if self.max_frames == 0:
+            return
+        cached = self._frames.get(frame_idx)
+        if cached is None:
+            if len(self._frames) >= self.max_frames:
+                _, cached = self._frames.popitem(last=False)
+            else:
+                cached = DisplayFrame(self.size)
+            self._frames[frame_idx] = cached
+        else:
+            self._frames.move_to_end(frame_idx)
+        np.copyto(cached.array, frame.array)
+
+    def get(self, frame_idx):
+        """
+        Return the cached DisplayFrame for frame_idx, or None. Counts towards the hit rate.
+        """
+        cached = self._frames.get(frame_idx)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._frames.move_to_end(frame_idx)
+        return cached
+
+    def hit_rate(self):
+        """
+        Return the fraction of lookups that were served from the cache, or None before any lookup.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def describe(self):
+        """
+        Return a short summary of the cache for the status display.
+        """
+        rate = self.hit_rate()
+        rate_text = f"{rate:.0%}" if rate is not None else "-"
+        return f"Cache {len(self._frames)}/{self.max_frames}f, {rate_text} hits"
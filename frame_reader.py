@@ -0,0 +1,273 @@
+import queue
+import threading
+from lazy_import import lazy_module
+from perf_stats import PERF
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+
+
+class DisplayFrame:
+    """
+    A display-size RGBA buffer and a PIL image that shares its memory, so the Tk side can paste() it
+    straight into a reused PhotoImage. RGBA is used because PIL can only share memory with 4-byte pixels.
+    """
+    __slots__ = ('array', 'image')
+
+    def __init__(self, size):
+        width, height = size
+        self.array = np.empty((height, width, 4), np.uint8)
+        self.array[..., 3] = 255
+        self.image = Image.frombuffer('RGBA', size, self.array, 'raw', 'RGBA', 0, 1)
+
+
+class FrameScaler:
+    """
+    Scales BGR frames to display size without allocating anything per frame.
+    Output goes into a ring of preallocated DisplayFrames, and one is reused after `slots` more frames have been scaled.
+    """
+    def __init__(self, size, slots=1):
+        width, height = size
+        self.size = size
+        self._frames = [DisplayFrame(size) for _ in range(slots)]
+        self._scaled = np.empty((height, width, 3), np.uint8)
+        self._halfway = np.empty((height * 2, width * 2, 3), np.uint8)
+        self._next = 0
+        self._source_size = None
+        self._two_stage = False
+
+    def _choose_interpolation(self, width, height):
+        # Bilinear is cheap and fine down to half size. Beyond that it aliases and INTER_AREA is slow for
+        # non-integer ratios, so scale bilinearly to twice the target and finish with an exact 2x INTER_AREA.
+        self._source_size = (width, height)
+        ratio = min(width / self.size[0], height / self.size[1])
+        self._two_stage = ratio >= 2
+
+    def scale(self, frame):
+        """
+        Scale a BGR frame into the next DisplayFrame of the ring and return it.
+        """
+        height, width = frame.shape[:2]
+        if (width, height) != self._source_size:
+            self._choose_interpolation(width, height)
+        with PERF.time('resize'):
+            if self._two_stage:
+                cv2.resize(frame, (self.size[0] * 2, self.size[1] * 2), dst=self._halfway, interpolation=cv2.INTER_LINEAR)
+                cv2.resize(self._halfway, self.size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+            else:
+                cv2.resize(frame, self.size, dst=self._scaled, interpolation=cv2.INTER_LINEAR)
+        slot = self._next
+        self._next = (slot + 1) % len(self._frames)
+        frame = self._frames[slot]
+        with PERF.time('cvtColor'):
+            cv2.cvtColor(self._scaled, cv2.COLOR_BGR2RGBA, dst=frame.array)
+        return frame
+
+
+class FrameReader:
+    """
+    Decodes and pre-scales frames on a background thread into a bounded queue ahead of the playhead.
+    The Tk loop only takes ready frames off the queue. While the reader is running it owns the capture,
+    so it must be stopped before anything else reads from or seeks the video.
+    If a PlaybackClock is given, frames that are already late are skipped with grab() instead of decoded.
+    """
+    HELD_FRAMES = 0  # Decoded frames the thread keeps outside the queue
+
+    def __init__(self, capture, size, max_frames=8, clock=None):
+        self.capture = capture
+        self.size = size
+        self.clock = clock
+        self.frames = queue.Queue(maxsize=max_frames)
+        # Room for a full queue, held frames, the pending frame, the frame being shown and the frame being scaled
+        self.scaler = FrameScaler(size, slots=max_frames + self.HELD_FRAMES + 3)
+        self.position = int(capture.get(cv2.CAP_PROP_POS_FRAMES))  # Next frame the thread will decode
+        self.finished = False  # Set once the end of the video is reached
+        self.dropped = 0  # Frames skipped or discarded to keep up with the clock
+        self._pending = None  # Frame taken off the queue that is not due yet
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start decoding frames from the capture's current position.
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the decode thread and discard any frames still waiting in the queue.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """
+        Discard all queued frames.
+        """
+        self._pending = None
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def get(self):
+        """
+        Return the next ready (position, DisplayFrame) pair, or None if no frame is ready yet.
+        Position is the capture position after the frame, matching CAP_PROP_POS_FRAMES after a read().
+        """
+        try:
+            return self.frames.get_nowait()
+        except queue.Empty:
+            return None
+
+    def take(self, target_frame):
+        """
+        Return the newest ready (position, DisplayFrame) pair whose frame index is at or before target_frame,
+        discarding older late frames. Returns None if no frame is due yet.
+        """
+        item = None
+        while True:
+            if self._pending is None:
+                self._pending = self.get()
+                if self._pending is None:
+                    break
+            if self._pending[0] - 1 > target_frame:
+                break
+            if item is not None:
+                self.dropped += 1
+            item, self._pending = self._pending, None
+        return item
+
+    def next_position(self):
+        """
+        Return the position of the next frame that take() will hand out, or None if none is ready.
+        """
+        if self._pending is None:
+            self._pending = self.get()
+        return self._pending[0] if self._pending is not None else None
+
+    def exhausted(self):
+        """
+        Return True if the end of the video was reached and every decoded frame has been consumed.
+        """
+        return self.finished and self._pending is None and self.frames.empty()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self.clock is not None and self.position < self.clock.target_frame():
+                # Already late for this frame, advance past it without decoding a picture
+                with PERF.time('grab'):
+                    ok = self.capture.grab()
+                if not ok:
+                    self.finished = True
+                    return
+                self.position += 1
+                self.dropped += 1
+                continue
+            with PERF.time('decode'):
+                ret, frame = self.capture.read()
+            if not ret:
+                self.finished = True
+                return
+            self.position += 1
+            if not self._put((self.position, self.scaler.scale(frame))):
+                return
+
+    def _put(self, item):
+        # Queue item, waiting for room. Returns False if the thread was stopped first.
+        while not self._stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class ReverseReader(FrameReader):
+    """
+    Plays backwards from end_frame (exclusive). The frames before it are decoded forward on the background thread
+    in chunks of up to CHUNK_FRAMES that start from a keyframe, and each chunk is queued in reverse, so the
+    thread decodes the chunk before while the current one is shown. In a GOP longer than a chunk, the frames
+    ahead of the chunk are skipped with grab() and the GOP is decoded again for the next chunk.
+    The clock runs at a negative speed: take() hands out frames at or after the target frame, and frames that are
+    already late are not decoded at all. Without keyframe_before (no seek index, or a proxy where every frame
+    is a keyframe), chunks start wherever the backend can seek to.
+    """
+    CHUNK_FRAMES = 32
+    # The chunk being decoded, plus the one before it: scaler slots are reused in decode order, but the first
+    # frame decoded of a chunk is the last one shown
+    HELD_FRAMES = 2 * CHUNK_FRAMES
+
+    def __init__(self, capture, size, end_frame, clock, keyframe_before=None):
+        super().__init__(capture, size, max_frames=self.CHUNK_FRAMES, clock=clock)
+        self.end = end_frame  # Frames before this are still to be decoded
+        self.keyframe_before = keyframe_before
+
+    def take(self, target_frame):
+        """
+        Return the oldest ready (position, DisplayFrame) pair whose frame index is at or after target_frame,
+        discarding later late frames. Returns None if no frame is due yet.
+        """
+        item = None
+        while True:
+            if self._pending is None:
+                self._pending = self.get()
+                if self._pending is None:
+                    break
+            if self._pending[0] - 1 < target_frame:
+                break
+            if item is not None:
+                self.dropped += 1
+            item, self._pending = self._pending, None
+        return item
+
+    def _run(self):
+        end = self.end
+        first = True  # The clock is restarted once the first chunk is ready, so nothing in it is late
+        while end > 0 and not self._stop_event.is_set():
+            # Frames the clock has already passed are late, carry on from the target instead
+            target = self.clock.target_frame()
+            if not first and end > target + 1:
+                self.dropped += end - max(0, target + 1)
+                end = max(0, target + 1)
+                if end == 0:
+                    break
+            start = max(0, end - self.CHUNK_FRAMES)
+            keyframe = self.keyframe_before(start) if self.keyframe_before is not None else start
+            if not keyframe <= self.position <= start:
+                with PERF.time('reverse_seek'):
+                    self.capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                self.position = keyframe
+            chunk = []
+            while self.position < end and not self._stop_event.is_set():
+                if self.position < start or (not first and self.position > self.clock.target_frame()):
+                    # Before the chunk, or already late by the time it is decoded
+                    with PERF.time('grab'):
+                        ok = self.capture.grab()
+                    if self.position >= start:
+                        self.dropped += 1
+                else:
+                    with PERF.time('decode'):
+                        ok, frame = self.capture.read()
+                    if ok:
+                        chunk.append((self.position + 1, self.scaler.scale(frame)))
+                if not ok:
+                    break
+                self.position += 1
+            if first:
+                self.clock.set_speed(self.clock.speed, self.clock.start_frame)
+                first = False
+            for item in reversed(chunk):
+                if not self._put(item):
+                    return
+            end = start
+        self.finished = not self._stop_event.is_set()
@@ -0,0 +1,50 @@
+"""
+Deferred imports of the heavy libraries (OpenCV, NumPy, Pillow).
+
+Importing cv2 alone takes a large part of the start-up time, so modules the GUI loads at start-up bind these
+libraries with lazy_module() instead of importing them. The GUI then preloads them on a background thread once
+its window is up, and they are normally imported by the time a video is opened.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported when one of its attributes is first used.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+def lazy_module(name):
+    """
+    Return a stand-in for the module name, imported on first use, e.g. cv2 = lazy_module('cv2').
+    """
+    return LazyModule(name)
+
+
+def preload(*names):
+    """
+    Import the named modules on a background thread, so they are ready (or well on the way) by the time they are
+    first used. Returns the thread.
+    """
+    def worker():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass  # Reported properly by the first real use
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
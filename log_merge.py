@@ -0,0 +1,267 @@
+"""
+Merge the logs of several people counting the same video, to check their agreement.
+
+Usage:
+    python log_merge.py LOG LOG [LOG...] [--tolerance 1.0] [--min-votes N] [--output consensus.csv]
+                                         [--disagreements disagreements.csv]
+
+The logs are parsed into integer-ms timestamps and merged in time order. Events with the same key are matched
+across annotators when they lie within the tolerance of the first event of the match, each annotator counting
+at most once per match; an event joins the oldest open match its annotator is not in yet, so close events of one
+key pair up in order. Matches found by at least min-votes annotators (default: more than half) are the
+consensus. It is written as a log in the app's own format, so it opens in the GUI and count_report.py reads it.
+Matches not found by everyone are disagreements. Per-annotator agreement statistics are printed.
+"""
+import argparse
+import csv
+import os
+from collections import deque
+import numpy as np
+from count_report import parse_log
+from event_store import format_timestamp_ms
+
+MAX_ROWS_SHOWN = 5000  # Disagreements listed in the window; all of them are still counted
+
+
+def merge_logs(logs, tolerance_ms=1000, min_votes=None, names=None):
+    """
+    Match the events of several logs, each given as (timestamps in integer ms, keys) arrays as returned by
+    count_report.parse_log. Returns a MergeResult.
+    """
+    names = list(names) if names is not None else [f"log {i + 1}" for i in range(len(logs))]
+    ms = np.concatenate([np.asarray(t, np.int64) for t, _ in logs]) if logs else np.empty(0, np.int64)
+    keys = np.concatenate([np.asarray(k, 'S') for _, k in logs]) if logs else np.empty(0, 'S1')
+    annotators = np.repeat(np.arange(len(logs)), [len(t) for t, _ in logs])
+    key_names, codes = np.unique(keys, return_inverse=True)
+    # Each log arrives as a few time-ordered runs (its fixed-width lines, then the others), and the stable
+    # sort (Timsort for int64) mostly just merges runs
+    order = np.argsort(ms, kind='stable')
+    ms, codes, annotators = ms[order], codes[order], annotators[order]
+    # Greedy matching in one pass. Each key has a queue of open matches [match id, first timestamp, annotators
+    # bitmask], oldest first; an event joins the oldest one its annotator is not in yet, or opens a new one
+    match_ids = np.empty(len(ms), np.int64)
+    open_matches = [deque() for _ in key_names]
+    count = 0
+    for i, (t, code, a) in enumerate(zip(ms.tolist(), codes.tolist(), annotators.tolist())):
+        bit = 1 << a
+        queue = open_matches[code]
+        while queue and t - queue[0][1] > tolerance_ms:
+            queue.popleft()
+        for match in queue:
+            if not match[2] & bit:
+                match[2] |= bit
+                match_ids[i] = match[0]
+                break
+        else:
+            queue.append([count, t, bit])
+            match_ids[i] = count
+            count += 1
+    times = np.full((count, len(logs)), -1, np.int64)  # Timestamp each annotator logged the match at, or -1
+    times[match_ids, annotators] = ms
+    match_keys = np.empty(count, np.int64)
+    match_keys[match_ids] = codes
+    return MergeResult(names, [k.decode() for k in key_names], match_keys, times, min_votes)
+
+
+class MergeResult:
+    """
+    Events of several annotators grouped into matches, one row of times per match in order of its first event.
+    A match found by at least min_votes annotators is part of the consensus.
+    """
+    def __init__(self, names, key_names, match_keys, times, min_votes=None):
+        self.names = names
+        self.key_names = key_names
+        self.match_keys = match_keys  # Index into key_names of each match
+        self.times = times
+        self.present = times >= 0
+        self.votes = self.present.sum(axis=1)
+        self.min_votes = min_votes or len(names) // 2 + 1
+        self.consensus = self.votes >= self.min_votes
+        # Mean of the annotators' timestamps
+        self.match_ms = np.where(self.present, times, 0).sum(axis=1) // np.maximum(self.votes, 1)
+
+    def consensus_events(self):
+        """
+        Return the consensus as (ms, key) pairs in time order.
+        """
+        ms = self.match_ms[self.consensus]
+        order = np.argsort(ms, kind='stable')
+        keys = self.match_keys[self.consensus][order]
+        return [(t, self.key_names[k]) for t, k in zip(ms[order].tolist(), keys.tolist())]
+
+    def consensus_counts(self):
+        """
+        Return {key: number of consensus events}.
+        """
+        counts = np.bincount(self.match_keys[self.consensus], minlength=len(self.key_names))
+        return {key: n for key, n in zip(self.key_names, counts.tolist()) if n}
+
+    def disagreement_mask(self):
+        """
+        Return a boolean array of the matches that not every annotator logged.
+        """
+        return self.votes < len(self.names)
+
+    def disagreements(self, limit=None):
+        """
+        Return the matches not every annotator logged as (ms, key, [timestamp or None per annotator], in consensus),
+        in time order, up to limit of them.
+        """
+        rows = np.flatnonzero(self.disagreement_mask())[:limit]
+        result = []
+        for row in rows.tolist():
+            times = [t if t >= 0 else None for t in self.times[row].tolist()]
+            result.append((int(self.match_ms[row]), self.key_names[self.match_keys[row]], times, bool(self.consensus[row])))
+        return result
+
+    def annotator_stats(self):
+        """
+        Return a dict per annotator: events logged, matched (in the consensus), extra (not in it), missed
+        (consensus events they did not log), agreement (matched / (events + missed)) and the mean offset
+        in ms of their matched events from the consensus time.
+        """
+        stats = []
+        total = int(self.consensus.sum())
+        for a, name in enumerate(self.names):
+            present = self.present[:, a]
+            matched = present & self.consensus
+            n_matched = int(matched.sum())
+            events = int(present.sum())
+            missed = total - n_matched
+            offsets = np.abs(self.times[matched, a] - self.match_ms[matched])
+            stats.append({'name': name, 'events': events, 'matched': n_matched, 'extra': events - n_matched,
+                          'missed': missed, 'agreement': n_matched / (events + missed) if events + missed else 1.0,
+                          'mean_offset_ms': float(offsets.mean()) if n_matched else 0.0})
+        return stats
+
+    def write_consensus(self, path):
+        """
+        Write the consensus as a log in the app's "timestamp, key" format.
+        """
+        with open(path, 'w') as f:
+            for ms, key in self.consensus_events():
+                f.write(f"{format_timestamp_ms(ms)}, {key}\n")
+
+    def write_disagreements(self, path):
+        """
+        Write every disagreement as a CSV row: timestamp, key, whether it is in the consensus, then the
+        timestamp each annotator logged it at (blank if they did not).
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'key', 'consensus'] + self.names)
+            for ms, key, times, consensus in self.disagreements():
+                writer.writerow([format_timestamp_ms(ms), key, int(consensus)] +
+                                [format_timestamp_ms(t) if t is not None else '' for t in times])
+
+
+class MergeWindow:
+    """
+    Window with the result of a merge: consensus counts, agreement per annotator and the list of disagreements.
+    Clicking a disagreement seeks the open video to it.
+    """
+    def __init__(self, gui, result):
+        from tkinter import Toplevel, Frame, Label, Button, RIGHT, LEFT, Y, BOTH
+        from tkinter import ttk
+        self.gui = gui
+        self.result = result
+        self.window = Toplevel(gui.root)
+        self.window.title("Merged Logs")
+        counts = result.consensus_counts()
+        summary = ", ".join(f"{key}: {n}" for key, n in sorted(counts.items())) or "none"
+        top = Frame(self.window)
+        top.pack(side='top', fill='x', padx=6, pady=4)
+        Label(top, text=f"Consensus ({result.min_votes} of {len(result.names)}) - {summary}", anchor='w').pack(side=LEFT)
+        Button(top, text="Save Consensus", command=self.save_consensus).pack(side=RIGHT)
+        columns = ['name', 'events', 'matched', 'extra', 'missed', 'agreement', 'offset']
+        stats = ttk.Treeview(self.window, show='headings', columns=columns, height=len(result.names))
+        for column in columns:
+            stats.heading(column, text="Offset (ms)" if column == 'offset' else column.capitalize())
+            stats.column(column, width=140 if column == 'name' else 70, anchor='w' if column == 'name' else 'e')
+        for s in result.annotator_stats():
+            stats.insert('', 'end', values=[s['name'], s['events'], s['matched'], s['extra'], s['missed'],
+                                            f"{s['agreement']:.1%}", f"{s['mean_offset_ms']:.0f}"])
+        stats.pack(side='top', fill='x', padx=6)
+        total = int(result.disagreement_mask().sum())
+        shown = min(total, MAX_ROWS_SHOWN)
+        Label(self.window, text=f"Disagreements: {total}" + (f" (first {shown} shown)" if shown < total else ""),
+              anchor='w').pack(side='top', fill='x', padx=6, pady=(6, 0))
+        body = Frame(self.window)
+        body.pack(side='top', fill=BOTH, expand=True, padx=6, pady=(0, 6))
+        columns = ['time', 'key', 'consensus'] + [f"a{i}" for i in range(len(result.names))]
+        self.tree = ttk.Treeview(body, show='headings', columns=columns, height=15)
+        self.tree.heading('time', text="Time")
+        self.tree.heading('key', text="Key")
+        self.tree.heading('consensus', text="Consensus")
+        self.tree.column('time', width=100)
+        self.tree.column('key', width=40)
+        self.tree.column('consensus', width=70)
+        for i, name in enumerate(result.names):
+            self.tree.heading(f"a{i}", text=name)
+            self.tree.column(f"a{i}", width=100)
+        self.rows = result.disagreements(limit=MAX_ROWS_SHOWN)
+        for i, (ms, key, times, consensus) in enumerate(self.rows):
+            self.tree.insert('', 'end', iid=str(i), values=[format_timestamp_ms(ms), key, "yes" if consensus else "no"] +
+                             [format_timestamp_ms(t) if t is not None else "-" for t in times])
+        scrollbar = ttk.Scrollbar(body, command=self.tree.yview)
+        self.tree['yscrollcommand'] = scrollbar.set
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+
+    def on_select(self, event=None):
+        """
+        Seek the open video to the selected disagreement.
+        """
+        from video_processor import VideoProcessor
+        gui = self.gui
+        selection = self.tree.selection()
+        if not selection or not gui.video:
+            return
+        ms = self.rows[int(selection[0])][0]
+        offset_ms = gui.start_offset.total_seconds() * 1000 if gui.start_offset else 0
+        gui.paused = True
+        VideoProcessor.seek_to_frame(gui, VideoProcessor.ms_to_frame(gui, max(0, ms - offset_ms)))
+
+    def save_consensus(self):
+        from tkinter import filedialog, messagebox
+        base = os.path.splitext(self.gui.video_path)[0] if self.gui.video_path else "log"
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                            initialfile=os.path.basename(base) + "_consensus.csv",
+                                            filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        try:
+            self.result.write_consensus(path)
+        except OSError as e:
+            messagebox.showerror("Save Consensus", f"Could not write {path}: {e}", parent=self.window)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the logs of several annotators of one video.")
+    parser.add_argument('logs', nargs='+', help="CSV logs of the same video, one per annotator")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="seconds between events of the same key that still match (default 1.0)")
+    parser.add_argument('--min-votes', type=int, help="annotators needed for the consensus (default: more than half)")
+    parser.add_argument('--output', help="write the consensus log to this path")
+    parser.add_argument('--disagreements', help="write the disagreements to this CSV")
+    args = parser.parse_args(argv)
+    if len(args.logs) < 2:
+        parser.error("at least two logs are needed")
+    result = merge_logs([parse_log(path) for path in args.logs], int(args.tolerance * 1000), args.min_votes,
+                        names=[os.path.basename(path) for path in args.logs])
+    if args.output:
+        result.write_consensus(args.output)
+    if args.disagreements:
+        result.write_disagreements(args.disagreements)
+    counts = result.consensus_counts()
+    print(f"Consensus ({result.min_votes} of {len(result.names)}): {sum(counts.values())} events - " +
+          ", ".join(f"{key}: {n}" for key, n in sorted(counts.items())))
+    print(f"Disagreements: {int(result.disagreement_mask().sum())}")
+    for s in result.annotator_stats():
+        print(f"  {s['name']}: {s['events']} events, {s['matched']} matched, {s['extra']} extra, {s['missed']} missed, "
+              f"agreement {s['agreement']:.1%}, mean offset {s['mean_offset_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+from bisect import bisect_left
+
+
+class LogPanel:
+    """
+    Keeps the log Text widget in step with the logger without rebuilding it on every change.
+    Single entries are inserted or deleted in place and only the highlight tag is moved. Once the log has more than
+    virtual_threshold entries the panel switches to a virtualized mode that only renders the visible rows, with the
+    scrollbar driven by the panel, so the cost of an update stays constant however long the log gets.
+    Line numbers are 1-based positions in the whole log, whichever mode the panel is in.
+    """
+    def __init__(self, text, scrollbar, virtual_threshold=2000):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.virtual_threshold = virtual_threshold
+        self.source = None  # Logger providing line_count() and line_text(line_number)
+        self.virtual = False
+        self.first = 1  # First rendered line in virtual mode
+        self.highlights = []  # Sorted highlighted line numbers
+        self.text.tag_configure('highlight', background='yellow')
+        self.scrollbar.config(command=self.yview)
+        self.text['yscrollcommand'] = self._on_text_scroll
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.text.bind(sequence, self._on_wheel)
+
+    def rows(self):
+        """
+        Return the number of rows the widget shows at once.
+        """
+        return int(self.text['height'])
+
+    def count(self):
+        """
+        Return the number of entries in the log.
+        """
+        return self.source.line_count() if self.source else 0
+
+    def refresh(self, highlight_lines=(), see=None):
+        """
+        Rebuild the widget from the log and highlight the given lines, scrolling to see (or the first highlight).
+        """
+        self.highlights = sorted(highlight_lines)
+        if see is None and self.highlights:
+            see = self.highlights[0]
+        self.virtual = self.count() > self.virtual_threshold
+        self.text.config(state='normal', wrap='none' if self.virtual else 'char')
+        self.text.delete('1.0', 'end')
+        if self.source is None:
+            self.text.insert('end', "No log file found.")
+        elif not self.virtual:
+            self.text.insert('end', "".join(self.source.line_text(n) + "\n" for n in range(1, self.count() + 1)))
+        self.text.config(state='disabled')
+        if self.virtual:
+            self.first = 1
+            self._scroll_to(see if see is not None else self.first)
+            self._render()
+        else:
+            self._tag_highlights()
+            if see is not None:
+                self.text.see(f'{see}.0')
+
+    def insert_line(self, line_number, highlight=True):
+        """
+        Show a line that was just inserted into the log at line_number.
+        """
+        if self.virtual != (self.count() > self.virtual_threshold):
+            self.refresh([line_number] if highlight else ())
+            return
+        self.highlights = [line_number] if highlight else [n + (n >= line_number) for n in self.highlights]
+        if self.virtual:
+            self._scroll_to(line_number)
+            self._render()
+            return
+        self.text.config(state='normal')
+        self.text.insert(f'{line_number}.0', self.source.line_text(line_number) + "\n")
+        self.text.config(state='disabled')
+        self._tag_highlights()
+        self.text.see(f'{line_number}.0')
+
+    def delete_line(self, line_number, highlight_line=None):
+        """
+        Remove the line that was just deleted from the log at line_number, optionally highlighting another line.
+        """
+        if self.virtual != (self.count() > self.virtual_threshold):
+            self.refresh([highlight_line] if highlight_line else ())
+            return
+        self.highlights = [highlight_line] if highlight_line else []
+        if self.virtual:
+            self._scroll_to(highlight_line or line_number)
+            self._render()
+            return
+        self.text.config(state='normal')
+        self.text.delete(f'{line_number}.0', f'{line_number + 1}.0')
+        self.text.config(state='disabled')
+        self._tag_highlights()
+        if highlight_line:
+            self.text.see(f'{highlight_line}.0')
+
+    def set_highlight(self, lines, see=True):
+        """
+        Highlight the given line numbers (replacing any previous highlight) without touching the content.
+        """
+        self.highlights = sorted(lines)
+        if self.virtual:
+            if see and self.highlights:
+                self._scroll_to(self.highlights[0])
+            self._render()
+        else:
+            self._tag_highlights()
+            if see and self.highlights:
+                self.text.see(f'{self.highlights[0]}.0')
+
+    def highlighted_line(self):
+        """
+        Return the first highlighted line number, or None.
+        """
+        return self.highlights[0] if self.highlights else None
+
+    def line_at(self, y):
+        """
+        Return the line number of the log entry at pixel row y of the widget, or None if there is none.
+        """
+        row = int(self.text.index(f'@0,{y}').split('.')[0])
+        line_number = self.first + row - 1 if self.virtual else row
+        return line_number if 1 <= line_number <= self.count() else None
+
+    def yview(self, *args):
+        """
+        Scrollbar command. In virtual mode scrolling moves the rendered window instead of the widget.
+        """
+        if not self.virtual:
+            return self.text.yview(*args)
+        total = self.count()
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * total) + 1
+        elif args[0] == 'scroll':
+            step = self.rows() if args[2] == 'pages' else 1
+            self.first += int(args[1]) * step
+        self._clamp()
+        self._render()
+
+    def _on_wheel(self, event):
+        if not self.virtual:
+            return None
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.yview('scroll', -3, 'units')
+        else:
+            self.yview('scroll', 3, 'units')
+        return 'break'
+
+    def _on_text_scroll(self, first, last):
+        if not self.virtual:
+            self.scrollbar.set(first, last)
+
+    def _clamp(self):
+        self.first = max(1, min(self.first, self.count() - self.rows() + 1))
+
+    def _scroll_to(self, line_number):
+        # Move the window only if the line is outside it, keeping it roughly centred
+        if not self.first <= line_number < self.first + self.rows():
+            self.first = line_number - self.rows() // 2
+        self._clamp()
+
+    def _render(self):
+        last = min(self.count(), self.first + self.rows() - 1)
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('end', "\n".join(self.source.line_text(n) for n in range(self.first, last + 1)))
+        self.text.config(state='disabled')
+        self._tag_highlights()
+        total = max(1, self.count())
+        self.scrollbar.set((self.first - 1) / total, last / total)
+
+    def _tag_highlights(self):
+        self.text.tag_remove('highlight', '1.0', 'end')
+        if self.virtual:
+            start = bisect_left(self.highlights, self.first)
+            offset = self.first - 1
+            for line_number in self.highlights[start:]:
+                if line_number >= self.first + self.rows():
+                    break
+                row = line_number - offset
+                self.text.tag_add('highlight', f'{row}.0', f'{row}.end')
+        else:
+            for line_number in self.highlights:
+                self.text.tag_add('highlight', f'{line_number}.0', f'{line_number}.end')
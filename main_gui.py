@@ -1,11 +1,27 @@
 import os
-import cv2
 import threading
-from tkinter import Tk, Button, Label, filedialog, StringVar, Frame, Text, Scrollbar, RIGHT, Y, LEFT, BOTH, simpledialog, messagebox, Toplevel
+import time
+from tkinter import Tk, Button, Checkbutton, BooleanVar, Label, filedialog, StringVar, Frame, Text, Scrollbar, RIGHT, Y, LEFT, BOTH, simpledialog, messagebox, Toplevel, PhotoImage
 from video_processor import VideoProcessor
-from csv_logger import CSVLogger
+from log_panel import LogPanel
+from thumbnail_strip import TimelineStrip
+from frame_cache import FrameCache
+from candidate_review import CandidateReview, RegionSelector
+import proxy
+from perf_stats import PERF, PerfHUD
+from project_store import ProjectStore
+from segmented_capture import SegmentedCapture
+from camera_grid import CameraGrid, MAX_CAMERAS
+from count_dashboard import CountDashboard
+from skim import Skimmer
 from datetime import timedelta
-from PIL import Image, ImageTk
+from lazy_import import lazy_module, preload
+from video_opener import VideoOpener
+import clip_exporter
+import contact_sheet
+from event_store import UNPARSED_MS
+
+cv2 = lazy_module('cv2')
 
 class CarCounterGUI:
     def __init__(self, root):
@@ -13,14 +29,30 @@ class CarCounterGUI:
         self.root.title("Car Counter")
         # Playback and state variables
         self.paused = True
+        self.reverse = False  # Playing backwards
         self.speed = 1
         self.frame_pos = 0
         self.start_offset = timedelta()
         self.video = None
+        self.capture_pos = 0  # Next frame the capture will decode, can differ from frame_pos after a cache hit
+        self.reader = None  # Background FrameReader while playing
+        self.seek_index = None  # SeekIndex of the open video, once loaded
+        self.play_job = None  # Pending root.after id of the playback loop
         self.logger = None
+        self.project = None  # ProjectStore the log is mirrored to, if a project is open
         self.video_path = ""
-        self.undo_stack = []  # Stack of (entry, index) for undo
-        self.redo_stack = []  # Stack of (entry, index) for redo
+        self.proxy_path = None  # Low-resolution proxy frames are decoded from, if one is in use
+        self.source_fps = None  # Frame rate of the source video while playing from a proxy
+        self.proxy_stop = threading.Event()  # Stops a proxy being built in the background
+        self.proxy_progress = None  # Fraction of the proxy built so far, while building
+        self.undo_stack = []  # Stack of (op, LogEvent) for undo, op is '+' for a logged entry and '-' for a deleted one
+        self.redo_stack = []  # Stack of (op, LogEvent) for redo
+        self.last_key = 'c'  # Key used for the last logged event, also used to accept suggestions
+        self.motion_region = None  # (x, y, w, h) fractions of the frame watched by motion detection
+        self.skim = Skimmer(self)  # Speeds through static footage while enabled
+        self.opener = None  # VideoOpener of the video being opened, until it is done
+        self.clips_stop = None  # Stops a clip export running in the background
+        self.sheets_stop = None  # Stops contact sheets being made in the background
 
         # --- GUI Layout ---
         # Main frame contains video and log
@@ -32,18 +64,26 @@ class CarCounterGUI:
         log_frame.pack(side=RIGHT, fill=Y, padx=10, pady=10)
         self.log_text = Text(log_frame, width=20, height=25, state='disabled')  # Shows event log
         self.log_text.pack(side=LEFT, fill=Y)
-        scrollbar = Scrollbar(log_frame, command=self.log_text.yview)
+        scrollbar = Scrollbar(log_frame)
         scrollbar.pack(side=RIGHT, fill=Y)
-        self.log_text['yscrollcommand'] = scrollbar.set
+        self.log_panel = LogPanel(self.log_text, scrollbar)  # Applies log changes to log_text in place
 
         # Video display (left side)
         self.frame_width = 640  # Default video frame width
         self.frame_height = 480  # Default video frame height
-        black_img = Image.new('RGB', (self.frame_width, self.frame_height), color='black')
-        self.blank_imgtk = ImageTk.PhotoImage(image=black_img)
-        self.frame_label = Label(main_frame, image=self.blank_imgtk, bg='black')  # Where video frames are shown
+        self.blank_imgtk = PhotoImage(width=self.frame_width, height=self.frame_height)  # Empty, shows the black background
+        video_frame = Frame(main_frame)
+        video_frame.pack(side=LEFT, padx=10, pady=10)
+        self.frame_label = Label(video_frame, image=self.blank_imgtk, bg='black')  # Where video frames are shown
         self.frame_label.imgtk = self.blank_imgtk  # Keep reference to avoid garbage collection
-        self.frame_label.pack(side=LEFT, padx=10, pady=10)
+        self.frame_photo = None  # PhotoImage reused for every video frame
+        self.scaler = None  # FrameScaler for frames shown while paused
+        self.frame_cache = FrameCache((self.frame_width, self.frame_height))  # Recent frames around the playhead
+        self.frame_label.pack(side='top')
+        self.perf_hud = PerfHUD(self)  # Timing overlay, toggled with F3
+        # Thumbnail strip under the video for scrubbing
+        self.timeline = TimelineStrip(video_frame, self, self.frame_width)
+        self.timeline.canvas.pack(side='top', fill='x', pady=(4, 0))
 
         # Controls container (vertical stack of buttons and controls)
         controls_container = Frame(main_frame)
@@ -57,23 +97,42 @@ class CarCounterGUI:
 
         # Open Video button lets user select a video file
         self.open_btn = Button(controls_container, text="Open Video", command=self.open_video)
-        self.open_btn.pack(side='top', pady=(0, 16), fill='x')
+        self.open_btn.pack(side='top', pady=(0, 2), fill='x')
+        # Open Folder plays a folder of segment files (e.g. hourly recordings) as one timeline
+        Button(controls_container, text="Open Folder", command=self.open_folder).pack(side='top', pady=(0, 2), fill='x')
+        # Camera Grid plays several cameras of one site side by side, each with its own log
+        Button(controls_container, text="Camera Grid", command=self.open_camera_grid).pack(side='top', pady=(0, 2), fill='x')
+        # Play and seek from a low-resolution proxy, building it in the background if needed
+        self.use_proxy = BooleanVar(value=False)
+        self.proxy_check = Checkbutton(controls_container, text="Use Proxy", variable=self.use_proxy, command=self.on_proxy_toggle)
+        self.proxy_check.pack(side='top', pady=(0, 16), anchor='w')
 
         # Video playback controls (play, pause, speed, frame navigation, skip)
         kb_btn_frame = Frame(controls_container)
         kb_btn_frame.pack(side='top', pady=(16, 16), fill='x')
         Button(kb_btn_frame, text="Play/Pause", command=lambda: VideoProcessor.toggle_play(self)).pack(side='top', pady=1, fill='x')
+        Button(kb_btn_frame, text="Play Reverse", command=lambda: VideoProcessor.toggle_reverse(self)).pack(side='top', pady=1, fill='x')
         speed_frame = Frame(kb_btn_frame)
         speed_frame.pack(fill='x', pady=1)
         Button(speed_frame, text="Speed -", command=lambda: VideoProcessor.slow_down(self)).pack(side='left', expand=True, fill='x')
-        self.status_label = Label(speed_frame, anchor='center', width=5)  # Shows current speed
+        self.status_label = Label(speed_frame, anchor='center', width=9)  # Shows achieved/requested speed
         self.status_label.pack(side='left', padx=4, fill='x', expand=True)
         Button(speed_frame, text="Speed +", command=lambda: VideoProcessor.speed_up(self)).pack(side='left', expand=True, fill='x')
+        # Skim plays static footage (inside the motion region, if set) at high speed
+        self.skim_var = BooleanVar(value=False)
+        Checkbutton(kb_btn_frame, text="Skim static footage", variable=self.skim_var,
+                    command=lambda: self.skim.set_enabled(self.skim_var.get())).pack(side='top', anchor='w')
         # Frame navigation
         frame_frame = Frame(kb_btn_frame)
         frame_frame.pack(fill='x', pady=1)
         Button(frame_frame, text="Prev Frame", command=lambda: VideoProcessor.prev_frame(self)).pack(side='left', expand=True, fill='x')
         Button(frame_frame, text="Next Frame", command=lambda: VideoProcessor.next_frame(self)).pack(side='left', expand=True, fill='x')
+        Button(kb_btn_frame, text="Save Still", command=self.save_still).pack(side='top', pady=1, fill='x')  # Full resolution frame
+        # Frame cache status, click to change its size
+        self.cache_label = Label(kb_btn_frame, anchor='center', fg='gray30', cursor='hand2')
+        self.cache_label.pack(fill='x', pady=1)
+        self.cache_label.bind('<Button-1>', lambda e: self.prompt_cache_size())
+        VideoProcessor.update_cache_label(self)
         # Skip 5s
         skip5s_frame = Frame(kb_btn_frame)
         skip5s_frame.pack(fill='x', pady=1)
@@ -90,22 +149,44 @@ class CarCounterGUI:
         Button(skip1hr_frame, text="Skip -1hr", command=lambda: VideoProcessor.skip_back_1hr(self)).pack(side='left', expand=True, fill='x')
         Button(skip1hr_frame, text="Skip +1hr", command=lambda: VideoProcessor.skip_forward_1hr(self)).pack(side='left', expand=True, fill='x')
 
+        # Motion suggestions: detect candidate events, then review them with Tab / Return
+        review_frame = Frame(controls_container)
+        review_frame.pack(side='top', pady=(0, 16), fill='x')
+        region_frame = Frame(review_frame)
+        region_frame.pack(fill='x', pady=1)
+        self.region_selector = RegionSelector(self)
+        Button(region_frame, text="Set Region", command=self.region_selector.arm).pack(side='left', expand=True, fill='x')
+        Button(region_frame, text="Detect Motion", command=lambda: self.review.detect()).pack(side='left', expand=True, fill='x')
+        suggestion_label = Label(review_frame, anchor='center', fg='gray30')
+        suggestion_label.pack(fill='x', pady=1)
+        self.review = CandidateReview(self, suggestion_label)
+
         # Log-related controls (export, clear, undo/redo, search, delete)
         log_btn_frame = Frame(controls_container)
         log_btn_frame.pack(side='top', pady=(40, 16), fill='x')
         self.export_btn = Button(log_btn_frame, text="Export Log", command=lambda: self.logger.export_log(self))  # Export log to CSV
         self.export_btn.pack(side='top', pady=2, fill='x')
+        self.clips_btn = Button(log_btn_frame, text="Export Clips", command=self.export_clips)  # Clip around each event
+        self.clips_btn.pack(side='top', pady=2, fill='x')
+        self.sheets_btn = Button(log_btn_frame, text="Contact Sheets", command=self.show_contact_sheets)  # Frame of each event
+        self.sheets_btn.pack(side='top', pady=2, fill='x')
         self.clear_btn = Button(log_btn_frame, text="Clear Log", command=lambda: self.logger.clear_log(self))    # Clear log
         self.clear_btn.pack(side='top', pady=2, fill='x')
         undo_frame = Frame(log_btn_frame)
         undo_frame.pack(fill='x', pady=1)
         Button(undo_frame, text="Undo", command=lambda: self.logger.restore_last_undo(self)).pack(side='left', expand=True, fill='x')
         Button(undo_frame, text="Redo", command=lambda: self.logger.redo(self)).pack(side='left', expand=True, fill='x')
+        self.project_btn = Button(log_btn_frame, text="Open Project", command=self.open_project)  # Project database
+        self.project_btn.pack(side='top', pady=2, fill='x')
         Button(log_btn_frame, text="Search Log", command=self.prompt_search_log).pack(side='top', pady=2, fill='x')  # Search log entries
+        self.dashboard = CountDashboard(self)  # Live counts per interval, follows the logger while open
+        Button(log_btn_frame, text="Live Counts", command=self.dashboard.show).pack(side='top', pady=2, fill='x')
+        self.merge_btn = Button(log_btn_frame, text="Merge Logs", command=self.merge_logs)  # Agreement between annotators
+        self.merge_btn.pack(side='top', pady=2, fill='x')
         Button(log_btn_frame, text="Delete Entry", command=lambda: self.logger.undo(self)).pack(side='bottom', pady=2, fill='x')  # Delete last entry
 
         # Quit button at the very bottom
-        Button(controls_container, text="Save and Quit", command=self.root.quit).pack(side='bottom', pady=16, fill='x')
+        Button(controls_container, text="Save and Quit", command=self.quit).pack(side='bottom', pady=16, fill='x')
 
         # Prevent window from resizing automatically to fit widgets
         # Had issues with the window continuously resizing
@@ -117,6 +198,7 @@ class CarCounterGUI:
         # --- Keyboard Shortcuts ---
         # Video controls
         self.root.bind('<space>', lambda e: VideoProcessor.toggle_play(self))           # Space: play/pause
+        self.root.bind('<Shift-space>', lambda e: VideoProcessor.toggle_reverse(self))  # Shift+Space: play backwards
         self.root.bind('<KeyPress-equal>', lambda e: VideoProcessor.speed_up(self))     # =: speed up
         self.root.bind('<KeyPress-minus>', lambda e: VideoProcessor.slow_down(self))    # -: slow down
         self.root.bind('<comma>', lambda e: VideoProcessor.prev_frame(self))            # ,: previous frame
@@ -131,89 +213,201 @@ class CarCounterGUI:
         self.root.bind('<BackSpace>', lambda e: self.logger.undo(self))                 # Backspace: delete last entry
         self.root.bind('<Control-z>', lambda e: self.logger.restore_last_undo(self))    # Ctrl+Z: undo
         self.root.bind('<Control-y>', lambda e: self.logger.redo(self))                 # Ctrl+Y: redo
+        self.root.bind('<Tab>', lambda e: self.review.step(1) or 'break')          # Tab: next suggestion
+        for sequence in ('<Shift-Tab>', '<ISO_Left_Tab>'):                              # Shift+Tab: previous suggestion
+            try:
+                self.root.bind(sequence, lambda e: self.review.step(-1) or 'break')
+            except Exception:
+                pass  # ISO_Left_Tab only exists on X11
+        self.root.bind('<Return>', lambda e: self.review.accept())                      # Return: accept suggestion
         self.log_text.bind('<Button-1>', self.on_log_click)                             # Click log: highlight entry
-        self.root.bind('<Escape>', lambda e: self.root.quit())                          # Escape: quit
+        self.root.bind('<F3>', lambda e: self.perf_hud.toggle())                        # F3: performance overlay
+        self.root.bind('<Escape>', lambda e: self.quit())                               # Escape: quit
+        self.root.protocol('WM_DELETE_WINDOW', self.quit)                               # Window close: quit
         # Bind all alphabet keys to log_key_event (for event logging)
         for char in 'abcdefghijklmnopqrstuvwxyz':
             self.root.bind(f'<KeyPress-{char}>', self.log_key_event)
             self.root.bind(f'<KeyPress-{char.upper()}>', self.log_key_event)
+        # Import OpenCV, NumPy and Pillow in the background once the window is up, ready for the first video
+        self.root.after_idle(lambda: preload('cv2', 'numpy', 'PIL.ImageTk'))
 
 ## GUI Functions ##########################################################
 
     def open_video(self, event=None):
         """
-        Opens a file dialog for the user to select a video file. Initializes the video processor and logger,
-        prompts for the video start time, and displays the first frame and log.
+        Opens a file dialog for the user to select a video file and loads it.
         """
         path = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
         if path:
-            self.video_path = path
-            self.video = VideoProcessor.open_video(path)
-            csv_path = os.path.splitext(path)[0] + ".csv"
-            self.logger = CSVLogger(csv_path)
-            self.paused = True
-            self.frame_pos = 0
-            VideoProcessor.show_frame(self)
-            self.update_log_display()
-            # --- Start time logic (from main.py) ---
+            self.load_video(path)
+
+    def open_folder(self, event=None):
+        """
+        Opens a folder of segment files whose names end in their HHMMSS start time as one continuous video.
+        The start time comes from the first file name, and the log is saved next to the folder.
+        """
+        folder = filedialog.askdirectory(title="Open Folder of Segments")
+        if folder:
+            self.load_video(os.path.normpath(folder), folder=True)
+
+    def open_camera_grid(self):
+        """
+        Opens two to four videos of the same site in a synchronized grid window, each counted into its own CSV.
+        Start times come from the file names; the user is asked for any that have none.
+        """
+        paths = filedialog.askopenfilenames(title="Choose 2-4 Cameras", filetypes=[("Video files", "*.mp4 *.avi *.mov")])
+        if not paths:
+            return
+        if not 2 <= len(paths) <= MAX_CAMERAS:
+            messagebox.showerror("Camera Grid", f"Choose between 2 and {MAX_CAMERAS} videos.")
+            return
+        if self.video_path in paths:
+            messagebox.showerror("Camera Grid", f"{os.path.basename(self.video_path)} is open in the main window.")
+            return
+        offsets = []
+        for path in paths:
             video_basename = os.path.splitext(os.path.basename(path))[0]
-            default_start_time = VideoProcessor.extract_default_start_time(video_basename)
-            prompt = "Enter the video start time (HH:MM:SS)"
-            if default_start_time:
-                prompt += f" [default: {default_start_time}]"
-            prompt += ":"
-            start_time_str = simpledialog.askstring("Start Time", prompt, initialvalue=default_start_time or "00:00:00", parent=self.root)
-            if not start_time_str and default_start_time:
-                start_time_str = default_start_time
+            start_time_str = VideoProcessor.extract_default_start_time(video_basename)
+            if not start_time_str:
+                start_time_str = simpledialog.askstring("Start Time", f"Enter the start time of {video_basename} (HH:MM:SS):",
+                                                        initialvalue="00:00:00", parent=self.root)
             offset = VideoProcessor.parse_start_time(start_time_str) if start_time_str else None
-            self.start_offset = offset if offset is not None else timedelta()
-            VideoProcessor.show_frame(self)  # Show first frame
-            self.update_log_display()
+            offsets.append(offset if offset is not None else timedelta())
+        if not self.paused:
+            VideoProcessor.toggle_play(self)
+        CameraGrid(self.root, paths, offsets)
 
-    def update_log_display(self, highlight_line=None, highlight_lines=None):
+    def load_video(self, path, folder=False):
         """
-        Updates the log display area with the contents of the log file. Optionally highlights a specific line or lines.
+        Opens a video file, or the segments of a folder, for playback and logging.
+        The container, the log and the first frame are read by a VideoOpener in the background while the user is
+        asked for the start time of a single file; finish_load() takes over once both are done.
         """
+        VideoProcessor.stop_reader(self)
+        self.proxy_stop.set()
+        if self.clips_stop:
+            self.clips_stop.set()
+        if self.sheets_stop:
+            self.sheets_stop.set()
+        self.skim.reset()
+        if self.opener:
+            self.opener.cancel()
+        if self.video:
+            self.video.release()
+            self.video = None
         if self.logger:
-            try:
-                with open(self.logger.filename, 'r') as f:
-                    log_content = f.read()
-            except Exception:
-                log_content = "No log file found."
-        else:
-            log_content = "No log file found."
-        self.log_text.config(state='normal')
-        self.log_text.delete(1.0, 'end')
-        self.log_text.insert('end', log_content)
-        lines = log_content.splitlines()
-        self.log_text.tag_remove('highlight', '1.0', 'end')
-        # If highlight_lines is provided, highlight all those lines
+            self.logger.close()
+            self.logger = None
+        self.dashboard.attach(None)
+        self.video_path = path
+        self.seek_index = None
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.paused = True
+        self.frame_pos = 0
+        self.capture_pos = 0
+        self.frame_cache.clear()
+        VideoProcessor.show_frame(self)  # Blank until the first frame is decoded
+        self.update_log_display()
+        opener = self.opener = VideoOpener(path, folder, self.use_proxy.get() and not folder,
+                                           (self.frame_width, self.frame_height))
+        self.poll_load(opener)
+        if folder:
+            return  # Segment start times come from their file names
+        # --- Start time logic (from main.py) ---
+        video_basename = os.path.splitext(os.path.basename(path))[0]
+        default_start_time = VideoProcessor.extract_default_start_time(video_basename)
+        prompt = "Enter the video start time (HH:MM:SS)"
+        if default_start_time:
+            prompt += f" [default: {default_start_time}]"
+        prompt += ":"
+        start_time_str = simpledialog.askstring("Start Time", prompt, initialvalue=default_start_time or "00:00:00", parent=self.root)
+        if not start_time_str and default_start_time:
+            start_time_str = default_start_time
+        offset = VideoProcessor.parse_start_time(start_time_str) if start_time_str else None
+        if self.video_path != path:
+            return  # Another video was opened meanwhile
+        self.start_offset = offset if offset is not None else timedelta()
+        opener.start_known = True
+        if self.opener is not opener:
+            self.review.load(path)  # Already open, the start time places its suggestions
+            self.attach_project()
+
+    def poll_load(self, opener):
+        """
+        Shows what the VideoOpener is doing until it is done, then finishes loading the video.
+        """
+        if opener is not self.opener:
+            return  # Superseded by another video
+        if not opener.done.is_set():
+            self.status_label.config(text=f"{opener.stage}...")
+            self.root.after(20, lambda: self.poll_load(opener))
+            return
+        self.opener = None
+        self.finish_load(opener)
+
+    def finish_load(self, opener):
+        """
+        Takes over the capture, log and first frame of a finished VideoOpener, shows them and reports the time
+        from opening to the first frame.
+        """
+        path = opener.path
+        VideoProcessor.update_speed_label(self)
+        if opener.error is not None:
+            messagebox.showerror("Open Folder" if opener.folder else "Open Video", f"Could not open {path}: {opener.error}")
+            self.video_path = ""
+            return
+        self.video = opener.video
+        self.proxy_path = opener.proxy_path
+        self.source_fps = opener.source_fps
+        if self.use_proxy.get() and not opener.folder and not self.proxy_path:
+            self.build_proxy(path)
+        VideoProcessor.load_seek_index(self, path)
+        self.logger = opener.logger
+        self.dashboard.attach(self.logger)
+        if opener.first_frame is not None:
+            self.frame_pos = self.capture_pos = 1
+            self.frame_cache.put(0, opener.first_frame)
+            VideoProcessor.display_image(self, opener.first_frame.image)
+        self.update_log_display()
+        first_frame_ms = (time.perf_counter() - opener.started) * 1000
+        PERF.record('first_frame', first_frame_ms)
+        self.root.title(f"Car Counter - {os.path.basename(path)} (first frame in {first_frame_ms / 1000:.2f} s)")
+        self.timeline.load(path)
+        if opener.timeline is not None:
+            # Timeline times count from the first segment's start time
+            self.start_offset = timedelta(milliseconds=opener.timeline.start_ms)
+            opener.start_known = True
+        if opener.start_known:
+            self.review.load(path)
+            self.attach_project()
+
+    def update_log_display(self, highlight_line=None, highlight_lines=None):
+        """
+        Rebuilds the log display area from the logger. Optionally highlights a specific line or lines.
+        Single entry changes should go through log_panel instead, which updates the display in place.
+        """
+        self.log_panel.source = self.logger
         if highlight_lines:
-            for line_num in highlight_lines:
-                self.log_text.tag_add('highlight', f'{line_num}.0', f'{line_num}.end')
-            self.log_text.tag_configure('highlight', background='yellow')
-            self.log_text.see(f'{highlight_lines[0]}.0')
-        # Otherwise, if highlight_line is provided, highlight that single line
+            self.log_panel.refresh(highlight_lines)
         elif highlight_line is not None:
-            self.log_text.tag_add('highlight', f'{highlight_line}.0', f'{highlight_line}.end')
-            self.log_text.tag_configure('highlight', background='yellow')
-            self.log_text.see(f'{highlight_line}.0')
-        self.log_text.config(state='disabled')
+            self.log_panel.refresh([highlight_line])
+        else:
+            self.log_panel.refresh()
 
     def on_log_click(self, event):
         """
         Handles clicks on the log display. Highlights the clicked line and seeks the video to the corresponding timestamp.
         """
-        # Remove previous highlight
-        self.log_text.tag_remove('highlight', '1.0', 'end')
         # Get the line number clicked
-        index = self.log_text.index(f'@{event.x},{event.y}')
-        line_number = int(index.split('.')[0])
+        line_number = self.log_panel.line_at(event.y)
+        if line_number is None:
+            self.log_panel.set_highlight([], see=False)
+            return
         # Highlight the clicked line
-        self.log_text.tag_add('highlight', f'{line_number}.0', f'{line_number}.end')
-        self.log_text.tag_configure('highlight', background='yellow')
+        self.log_panel.set_highlight([line_number], see=False)
         # Get the line content
-        line_content = self.log_text.get(f'{line_number}.0', f'{line_number}.end').strip()
+        line_content = self.logger.line_text(line_number).strip()
         # Try to extract the timestamp (assumes format: timestamp, key)
         if ',' in line_content:
             timestamp_str = line_content.split(',')[0].strip()
@@ -235,11 +429,9 @@ class CarCounterGUI:
                 offset_seconds = self.start_offset.total_seconds() if self.start_offset else 0
                 video_seconds = max(0, total_seconds - offset_seconds)
                 if self.video:
-                    fps = self.video.get(cv2.CAP_PROP_FPS)
-                    frame = int(video_seconds * fps)
-                    self.video.set(cv2.CAP_PROP_POS_FRAMES, frame)
+                    frame = VideoProcessor.ms_to_frame(self, video_seconds * 1000)
                     self.paused = True
-                    VideoProcessor.show_frame(self)
+                    VideoProcessor.seek_to_frame(self, frame)
         except Exception:
             pass
 
@@ -251,33 +443,302 @@ class CarCounterGUI:
         key = event.char
         if not key.isalpha():
             return
-        frame_idx = int(self.video.get(cv2.CAP_PROP_POS_FRAMES))
-        fps = self.video.get(cv2.CAP_PROP_FPS)
-        seconds = frame_idx / fps if fps > 0 else 0
-        ms = seconds * 1000
+        self.log_key(key)
+
+    def log_key(self, key):
+        """
+        Logs key at the position of the displayed frame and highlights the new entry.
+        """
+        if not self.logger:
+            return
+        self.last_key = key
+        frame_idx = self.frame_pos  # Position of the displayed frame, the decoder may be reading ahead
+        ms = VideoProcessor.frame_to_ms(self, frame_idx)
         timestamp_str = VideoProcessor.format_timestamp(ms, self.start_offset)
-        self.logger.log_entry(key, timestamp_str)
-        self.logger.sort_log_file()
-        # Find the line number of the just-logged event (match both timestamp and key)
-        highlight_line = None
+        logged = self.logger.log_entry(key, timestamp_str)
+        self.undo_stack.append(('+', logged))
+        self.redo_stack.clear()
+        self.log_panel.insert_line(self.logger.line_number(logged), highlight=True)
+
+    def open_project(self):
+        """
+        Opens (or creates) a project database. The current log and every video opened afterwards are mirrored to it.
+        """
+        path = filedialog.asksaveasfilename(title="Open or Create Project", defaultextension=".db", confirmoverwrite=False,
+                                            filetypes=[("Car Counter project", "*.db")])
+        if not path:
+            return
         try:
-            with open(self.logger.filename, 'r') as f:
-                lines = [line for line in f if line.strip()]
-            for idx, line in enumerate(lines, 1):
-                parts = line.strip().split(',')
-                if len(parts) >= 2 and parts[0].strip() == timestamp_str and parts[1].strip() == key:
-                    highlight_line = idx
-                    break
-        except Exception:
-            highlight_line = None
-        self.update_log_display(highlight_line=highlight_line)
+            self.project = ProjectStore(path)
+        except Exception as e:
+            messagebox.showerror("Open Project", f"Could not open {path}: {e}")
+            return
+        self.project_btn.config(text=f"Project: {os.path.basename(path)}")
+        self.attach_project()
+
+    def attach_project(self):
+        """
+        Registers the open video in the project, with its start time, and mirrors its log there.
+        """
+        if not self.project or not self.logger or not self.video:
+            return
+        start_ms = int(self.start_offset.total_seconds() * 1000)
+        video_id = self.project.video_id(self.video_path, start_ms, VideoProcessor.source_fps(self),
+                                         int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.logger.attach_store(self.project, video_id)
+
+    def on_proxy_toggle(self):
+        """
+        Switches the open video to its proxy (building one if there is none yet) or back to the source.
+        """
+        if not self.video or isinstance(self.video, SegmentedCapture):
+            return  # Folder timelines always play from the segment files
+        if not self.use_proxy.get():
+            self.proxy_stop.set()
+            if self.proxy_path:
+                self.switch_capture(None)
+            return
+        proxy_path = proxy.find_proxy(self.video_path)
+        if proxy_path:
+            self.switch_capture(proxy_path)
+        else:
+            self.build_proxy(self.video_path)
+
+    def build_proxy(self, path):
+        """
+        Builds the proxy for path on a background thread and switches to it once it is ready.
+        """
+        if self.proxy_progress is not None and not self.proxy_stop.is_set():
+            return  # Already building
+        self.proxy_stop = threading.Event()
+        stop_event = self.proxy_stop
+        self.proxy_progress = 0.0
+        result = []
+        def progress(fraction):
+            if stop_event is self.proxy_stop:
+                self.proxy_progress = fraction
+        threading.Thread(target=lambda: result.append(proxy.make_proxy(path, stop_event=stop_event, progress=progress)),
+                         daemon=True).start()
+        def poll():
+            if stop_event is not self.proxy_stop:
+                return  # Superseded by a build for another video
+            if not result:
+                self.proxy_check.config(text=f"Use Proxy ({self.proxy_progress:.0%})")
+                self.root.after(500, poll)
+                return
+            self.proxy_progress = None
+            self.proxy_check.config(text="Use Proxy")
+            if result[0] and self.video_path == path and self.use_proxy.get():
+                self.switch_capture(result[0])
+        poll()
+
+    def export_clips(self):
+        """
+        Writes a short clip around each logged event (or a random sample of them) to a folder next to the video,
+        on a background thread, for checking the log.
+        """
+        if not self.video or not self.logger or self.clips_stop is not None:
+            return
+        events = [(e.ms, e.key) for e in self.logger.query(end_ms=UNPARSED_MS)]
+        if not events:
+            messagebox.showinfo("Export Clips", "There are no timestamped entries in the log.")
+            return
+        before = simpledialog.askfloat("Export Clips", "Seconds before each event:", initialvalue=3, minvalue=0, parent=self.root)
+        if before is None:
+            return
+        after = simpledialog.askfloat("Export Clips", "Seconds after each event:", initialvalue=3, minvalue=0, parent=self.root)
+        if after is None:
+            return
+        sample = simpledialog.askinteger("Export Clips", f"Number of events to export (of {len(events)}):",
+                                         initialvalue=len(events), minvalue=1, parent=self.root)
+        if sample is None:
+            return
+        events = clip_exporter.sample_events(events, sample)
+        sources = self.review.sources(self.video_path)  # Each segment of a folder is exported on its own
+        out_folder = clip_exporter.clips_folder(self.video_path)
+        stop_event = self.clips_stop = threading.Event()
+        status = {'progress': 0.0, 'written': [], 'error': None, 'done': False}
+        def work():
+            try:
+                for i, (path, start_ms) in enumerate(sources):
+                    if stop_event.is_set():
+                        break
+                    status['written'] += clip_exporter.export_clips(
+                        path, events, start_ms, out_folder, before, after, stop_event=stop_event,
+                        progress=lambda fraction: status.update(progress=(i + fraction) / len(sources)))
+            except Exception as e:
+                status['error'] = e
+            status['done'] = True
+        threading.Thread(target=work, daemon=True).start()
+        def poll():
+            if not status['done']:
+                self.clips_btn.config(text=f"Export Clips ({status['progress']:.0%})")
+                self.root.after(500, poll)
+                return
+            self.clips_stop = None
+            self.clips_btn.config(text="Export Clips")
+            if status['error'] is not None:
+                messagebox.showerror("Export Clips", f"Could not export clips: {status['error']}")
+            elif not stop_event.is_set():
+                messagebox.showinfo("Export Clips", f"Wrote {len(status['written'])} clips to {out_folder}.")
+        poll()
+
+    def show_contact_sheets(self):
+        """
+        Opens the contact sheets of the open video's events, making them on a background thread first
+        unless earlier ones are kept.
+        """
+        if not self.video or not self.logger or self.sheets_stop is not None:
+            return
+        out_folder = contact_sheet.sheets_folder(self.video_path)
+        index = contact_sheet.load_index(out_folder)
+        if index is not None and not messagebox.askyesno("Contact Sheets", "Make new contact sheets from the current log?\n"
+                                                         "Choose No to open the existing ones."):
+            contact_sheet.ContactSheetViewer(self, out_folder, index)
+            return
+        events = [(e.ms, e.key) for e in self.logger.query(end_ms=UNPARSED_MS)]
+        sources = self.review.sources(self.video_path)
+        stop_event = self.sheets_stop = threading.Event()
+        status = {'progress': 0.0, 'error': None, 'done': False}
+        def work():
+            try:
+                contact_sheet.make_contact_sheets(sources, events, out_folder, stop_event=stop_event,
+                                                  progress=lambda fraction: status.update(progress=fraction))
+            except Exception as e:
+                status['error'] = e
+            status['done'] = True
+        threading.Thread(target=work, daemon=True).start()
+        def poll():
+            if not status['done']:
+                self.sheets_btn.config(text=f"Contact Sheets ({status['progress']:.0%})")
+                self.root.after(500, poll)
+                return
+            self.sheets_stop = None
+            self.sheets_btn.config(text="Contact Sheets")
+            if status['error'] is not None:
+                messagebox.showerror("Contact Sheets", f"Could not make the contact sheets: {status['error']}")
+            elif not stop_event.is_set():
+                contact_sheet.ContactSheetViewer(self, out_folder, contact_sheet.load_index(out_folder))
+        poll()
+
+    def merge_logs(self):
+        """
+        Merges the current log with the logs of other annotators of the same video on a background thread,
+        then shows the consensus, the agreement of each annotator and the disagreements.
+        """
+        import log_merge
+        from count_report import parse_log
+        initialdir = os.path.dirname(self.video_path) if self.video_path else None
+        paths = filedialog.askopenfilenames(title="Logs of the Other Annotators", initialdir=initialdir,
+                                            filetypes=[("CSV files", "*.csv")])
+        if not paths:
+            return
+        own = self.logger.query(end_ms=UNPARSED_MS) if self.logger else None
+        if len(paths) + (own is not None) < 2:
+            messagebox.showinfo("Merge Logs", "Choose at least two logs, or open a video and choose one more.")
+            return
+        tolerance = simpledialog.askfloat("Merge Logs", "Seconds between entries of the same key that still match:",
+                                          initialvalue=1.0, minvalue=0, parent=self.root)
+        if tolerance is None:
+            return
+        names = (["This log"] if own is not None else []) + [os.path.basename(p) for p in paths]
+        result = []
+        def work():
+            try:
+                logs = [parse_log(p) for p in paths]
+                if own is not None:
+                    logs.insert(0, ([e.ms for e in own], [e.key.encode() for e in own]))
+                result.append(log_merge.merge_logs(logs, int(tolerance * 1000), names=names))
+            except Exception as e:
+                result.append(e)
+        threading.Thread(target=work, daemon=True).start()
+        self.merge_btn.config(text="Merging...", state='disabled')
+        def poll():
+            if not result:
+                self.root.after(100, poll)
+                return
+            self.merge_btn.config(text="Merge Logs", state='normal')
+            if isinstance(result[0], Exception):
+                messagebox.showerror("Merge Logs", f"Could not merge the logs: {result[0]}")
+            else:
+                log_merge.MergeWindow(self, result[0])
+        poll()
+
+    def switch_capture(self, proxy_path):
+        """
+        Reopens the current video from proxy_path (or from the source if None), keeping the position and play state.
+        """
+        VideoProcessor.stop_reader(self)
+        self.video.release()
+        self.proxy_path = proxy_path
+        self.source_fps = VideoProcessor.read_source_fps(self.video_path) if proxy_path else None
+        self.video = VideoProcessor.open_video(self.video_path, proxy_path)
+        self.capture_pos = 0  # The new capture starts at the beginning; playback or the next seek moves it
+        if proxy_path:
+            self.timeline.load(self.video_path)  # Generate any remaining thumbnails from the proxy instead
+
+    def save_still(self):
+        """
+        Saves the displayed frame at full resolution, decoded from the source video even when playing from a proxy.
+        """
+        if not self.video:
+            return
+        was_playing = not self.paused
+        self.paused = True
+        frame_idx = max(0, self.frame_pos - 1)
+        frame = VideoProcessor.read_source_frame(self, frame_idx)
+        if frame is None:
+            messagebox.showerror("Save Still", "Could not read the frame from the source video.")
+            return
+        timestamp = VideoProcessor.format_timestamp(VideoProcessor.frame_to_ms(self, frame_idx), self.start_offset)
+        default_name = os.path.splitext(os.path.basename(self.video_path))[0] + "_" + timestamp.replace(':', '') + ".png"
+        path = filedialog.asksaveasfilename(defaultextension=".png", initialfile=default_name,
+                                            initialdir=os.path.dirname(self.video_path),
+                                            filetypes=[("PNG image", "*.png"), ("JPEG image", "*.jpg")])
+        if path and not cv2.imwrite(path, frame):
+            messagebox.showerror("Save Still", f"Could not write {path}.")
+        if was_playing:
+            VideoProcessor.toggle_play(self)
+
+    def quit(self):
+        """
+        Saves the log to its CSV file and closes the application.
+        """
+        VideoProcessor.stop_reader(self)
+        self.proxy_stop.set()
+        self.skim.reset()
+        if self.opener:
+            self.opener.cancel()
+        if self.logger:
+            self.logger.close()
+        if self.project:
+            self.project.close()
+        if PERF.enabled:
+            # Timings of this session, next to the video (or set CARCOUNTER_PERF_FILE)
+            base = os.path.splitext(self.video_path)[0] if self.video_path else "car_counter"
+            try:
+                PERF.dump(os.environ.get('CARCOUNTER_PERF_FILE') or base + ".perf.json")
+            except OSError:
+                pass
+        self.root.quit()
+
+    def prompt_cache_size(self):
+        """
+        Prompts the user for the frame cache size in megabytes.
+        """
+        size = simpledialog.askinteger("Frame Cache", "Frame cache size (MB):", initialvalue=self.frame_cache.max_mb,
+                                       minvalue=0, parent=self.root)
+        if size is not None:
+            self.frame_cache.resize(size)
+            VideoProcessor.update_cache_label(self)
 
     def prompt_search_log(self):
         """
-        Prompts the user for a search term and highlights all matching entries in the log display.
-        This, and the .search_entries method in CSVLogger, are very basic. Use excel or similar for more advanced searching.
+        Prompts the user for a search term or query and highlights all matching entries in the log display.
+        Queries like "t 07:30-08:15" select a key and/or time range; anything else is matched as text.
         """
-        search_term = simpledialog.askstring("Search Log", "Enter search term:", parent=self.root)
+        search_term = simpledialog.askstring("Search Log", "Enter a search term, or a key and/or time range\n"
+                                             "(e.g. t 07:30-08:15):", parent=self.root)
         if search_term and self.logger:
             self.logger.search_entries(search_term, self)
 
@@ -0,0 +1,189 @@
+"""
+Offline motion pre-detection. Proposes candidate crossing times for the operator to confirm.
+
+Usage:
+    python motion_detector.py VIDEO [--start HH:MM:SS] [--region x,y,w,h] [--workers N]
+
+The video is split into chunks that are analysed in a process pool. Each worker runs downscaled grayscale
+background subtraction inside the region and reports the moments motion starts. Candidates are written to
+<video>.candidates as "timestamp, score" lines in the same HH:MM:SS:ms format as the log.
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from lazy_import import lazy_module
+from event_store import format_timestamp_ms, parse_timestamp_ms
+from seek_index import SeekIndex
+from segmented_capture import video_start_ms
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+ANALYSIS_WIDTH = 160  # Width the region is downscaled to before analysis
+
+
+class MotionMeter:
+    """
+    Downscaled grayscale background subtraction inside a region of the frame.
+    score() returns the fraction of region pixels that differ from the running background.
+    """
+    def __init__(self, region=None, alpha=0.05, pixel_threshold=25):
+        self.region = region  # (x, y, w, h) as fractions of the frame, or None for the whole frame
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        self.background = None
+        self._crop = None
+        self._size = None
+
+    def _setup(self, frame):
+        height, width = frame.shape[:2]
+        x, y, w, h = self.region or (0, 0, 1, 1)
+        x0, y0 = int(x * width), int(y * height)
+        x1, y1 = max(x0 + 1, int((x + w) * width)), max(y0 + 1, int((y + h) * height))
+        self._crop = (slice(y0, y1), slice(x0, x1))
+        scale = min(1.0, ANALYSIS_WIDTH / (x1 - x0))
+        self._size = (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale)))
+
+    def score(self, frame):
+        """
+        Update the background with a BGR frame and return its motion score between 0 and 1.
+        """
+        if self._crop is None:
+            self._setup(frame)
+        small = cv2.resize(frame[self._crop], self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            return 0.0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.alpha)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+
+def detect_chunk(path, start, end, region, step=2, on_score=0.02, off_score=0.005, warmup=60):
+    """
+    Analyse frames start..end (exclusive) of a video and return [(frame index, peak score)] for each point where
+    motion starts. Every `step`-th frame is analysed, the ones in between are skipped with grab().
+    The background is primed on `warmup` frames before the chunk. Runs in a worker process.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return []
+    meter = MotionMeter(region)
+    pos = max(0, start - warmup)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+    candidates = []
+    active = False
+    try:
+        while pos < end:
+            if not cap.grab():
+                break
+            if (pos - start) % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                score = meter.score(frame)
+                if pos >= start:
+                    if not active and score >= on_score:
+                        active = True
+                        candidates.append([pos, score])
+                    elif active:
+                        if score <= off_score:
+                            active = False
+                        elif score > candidates[-1][1]:
+                            candidates[-1][1] = score
+            pos += 1
+    finally:
+        cap.release()
+    return [tuple(c) for c in candidates]
+
+
+def detect(path, region=None, workers=None, chunk_seconds=300, min_gap_seconds=1.0, step=2):
+    """
+    Find candidate events in a whole video using a process pool. Returns a sorted list of (frame index, score).
+    Candidates closer than min_gap_seconds to the previous one are merged into it.
+    """
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    chunk = max(1, int(chunk_seconds * fps))
+    starts = list(range(0, frame_count, chunk))
+    # Spawned workers, since the GUI calls this from a thread and forking a threaded process is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(detect_chunk, path, s, min(s + chunk, frame_count), region, step) for s in starts]
+        found = [c for future in futures for c in future.result()]
+    min_gap = int(min_gap_seconds * fps)
+    merged = []
+    for frame_idx, score in sorted(found):
+        if merged and frame_idx - merged[-1][0] < min_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], score))
+        else:
+            merged.append((frame_idx, score))
+    return merged
+
+
+def candidates_path(video_path):
+    """
+    Return the path of the candidate list for a video file.
+    """
+    return os.path.splitext(video_path)[0] + ".candidates"
+
+
+def write_candidates(video_path, candidates, start_offset_ms=0):
+    """
+    Write candidates as "timestamp, score" lines next to the video. Returns the path written.
+    """
+    index = SeekIndex.load(video_path)
+    if index is None:
+        cap = cv2.VideoCapture(video_path)
+        index = SeekIndex(cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), [])
+        cap.release()
+    path = candidates_path(video_path)
+    with open(path, 'w') as f:
+        for frame_idx, score in candidates:
+            ms = start_offset_ms + index.frame_to_ms(frame_idx)
+            f.write(f"{format_timestamp_ms(ms)}, {score:.3f}\n")
+    return path
+
+
+def read_candidates(video_path):
+    """
+    Read the candidate list for a video as a list of timestamps in ms. Returns an empty list if there is none.
+    """
+    try:
+        with open(candidates_path(video_path), 'r') as f:
+            stamps = [parse_timestamp_ms(line.split(',')[0]) for line in f if line.strip()]
+    except OSError:
+        return []
+    return [ms for ms in stamps if ms is not None]
+
+
+def parse_region(text):
+    """
+    Parse an "x,y,w,h" region given as fractions of the frame.
+    """
+    x, y, w, h = (float(v) for v in text.split(','))
+    return (x, y, w, h)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Propose candidate car crossings from motion in a video.")
+    parser.add_argument('video')
+    parser.add_argument('--start', help="video start time HH:MM:SS or HHMMSS (default: from the file name)")
+    parser.add_argument('--region', type=parse_region, help="x,y,w,h as fractions of the frame, e.g. 0.2,0.5,0.6,0.2")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--step', type=int, default=2, help="analyse every Nth frame (default 2)")
+    args = parser.parse_args(argv)
+    try:
+        start_ms = video_start_ms(args.video, args.start)
+    except ValueError as e:
+        parser.error(str(e))
+    candidates = detect(args.video, args.region, args.workers, step=args.step)
+    path = write_candidates(args.video, candidates, start_ms)
+    print(f"{len(candidates)} candidates -> {path}")
+
+
+if __name__ == "__main__":
+    main()
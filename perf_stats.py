@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _Timer:
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.stage, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class PerfStats:
+    """
+    Per-stage timings, counters and gauges for the playback and logging hot paths.
+    Each stage keeps its last WINDOW timings as a rolling sample for percentiles and a histogram.
+    While disabled, time() hands out a shared do-nothing timer and the other calls return straight away,
+    so the instrumentation can stay in the hot paths. Safe to use from the decode and writer threads.
+    """
+    WINDOW = 1000  # Timings kept per stage
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 250)  # Histogram bucket upper bounds
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything recorded so far.
+        """
+        with self._lock:
+            self.samples = {}  # stage -> deque of the last WINDOW timings in ms
+            self.totals = {}  # stage -> [count, total ms] since the last reset
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+
+    def time(self, stage):
+        """
+        Return a context manager that records how long its block takes under stage.
+        """
+        return _Timer(self, stage) if self.enabled else NULL_TIMER
+
+    def record(self, stage, ms):
+        """
+        Record one timing in milliseconds.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.WINDOW)
+                self.totals[stage] = [0, 0.0]
+            samples.append(ms)
+            totals = self.totals[stage]
+            totals[0] += 1
+            totals[1] += ms
+
+    def count(self, name, n=1):
+        """
+        Add n to a counter.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """
+        Set a gauge to its current value, keeping the maximum seen.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            _, peak = self.gauges.get(name, (value, value))
+            self.gauges[name] = (value, max(peak, value))
+
+    def summary(self, stage):
+        """
+        Return count, mean, p50, p95 and max of a stage's recent timings, with a histogram, or None if it has none.
+        """
+        with self._lock:
+            samples = sorted(self.samples.get(stage, ()))
+            count, total = self.totals.get(stage, (0, 0.0))
+        if not samples:
+            return None
+        histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        bucket = 0
+        for ms in samples:
+            while bucket < len(self.BUCKETS_MS) and ms > self.BUCKETS_MS[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+        return {
+            'count': count,
+            'mean': total / count,
+            'p50': samples[len(samples) // 2],
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1],
+            'histogram': dict(zip([f"<={b}ms" for b in self.BUCKETS_MS] + ['more'], histogram)),
+        }
+
+    def snapshot(self):
+        """
+        Return everything recorded as a JSON-serializable dict.
+        """
+        with self._lock:
+            names = sorted(self.samples)
+        stages = {stage: self.summary(stage) for stage in names}
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = {name: {'last': last, 'max': peak} for name, (last, peak) in self.gauges.items()}
+        return {'seconds': time.time() - self.started, 'stages': stages, 'counters': counters, 'gauges': gauges}
+
+    def dump(self, path):
+        """
+        Write snapshot() to a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1)
+
+    def hud_lines(self):
+        """
+        Return short text lines describing the recent timings, for the on-screen overlay.
+        """
+        lines = []
+        with self._lock:
+            names = sorted(self.samples)
+        for stage in names:
+            s = self.summary(stage)
+            if s is not None:
+                lines.append(f"{stage:<13}{s['p50']:6.2f}{s['p95']:7.2f} ms")
+        with self._lock:
+            lines.extend(f"{name:<13}{value:>6}" for name, value in sorted(self.counters.items()))
+            lines.extend(f"{name:<13}{last:>6} (max {peak})" for name, (last, peak) in sorted(self.gauges.items()))
+        return lines
+
+
+# Shared instance used by the instrumented code. Set CARCOUNTER_PERF=1 to enable it from the start.
+PERF = PerfStats(enabled=os.environ.get('CARCOUNTER_PERF') == '1')
+
+
+class PerfHUD:
+    """
+    Overlay in the corner of the video showing PERF's recent p50/p95 timings, counters and gauges.
+    """
+    REFRESH_MS = 500
+
+    def __init__(self, gui):
+        from tkinter import Label
+        self.gui = gui
+        self.label = Label(gui.frame_label, justify='left', anchor='nw', font=('Courier', 8), bg='black', fg='lime')
+        self.visible = False
+        self._job = None
+
+    def toggle(self):
+        """
+        Show or hide the overlay. Showing it also enables PERF; hiding it leaves PERF as it is.
+        """
+        self.visible = not self.visible
+        if self.visible:
+            PERF.enabled = True
+            self.label.place(x=4, y=4)
+            self._refresh()
+        else:
+            self.label.place_forget()
+            if self._job is not None:
+                self.gui.root.after_cancel(self._job)
+                self._job = None
+
+    def _refresh(self):
+        lines = [f"{'stage':<13}{'p50':>6}{'p95':>7}"] + PERF.hud_lines()
+        self.label.config(text="\n".join(lines))
+        self._job = self.gui.root.after(self.REFRESH_MS, self._refresh)
@@ -0,0 +1,58 @@
+import time
+from collections import deque
+
+
+class PlaybackClock:
+    """
+    Wall-clock playback scheduler. Maps the current time to the frame index that should be on screen
+    at the requested speed, so playback keeps pace no matter how long decoding takes.
+    """
+    def __init__(self, start_frame, fps, speed=1.0):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.speed = speed
+        self.start_frame = start_frame
+        self.start_time = time.perf_counter()
+        self._shown = deque()  # (time, frame index) of recently shown frames
+
+    def set_speed(self, speed, frame_idx):
+        """
+        Change the playback speed, continuing from frame_idx as of now.
+        """
+        self.speed = speed
+        self.start_frame = frame_idx
+        self.start_time = time.perf_counter()
+        self._shown.clear()
+
+    def target_frame(self):
+        """
+        Return the index of the frame that should be on screen right now.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        return self.start_frame + int(elapsed * self.fps * self.speed)
+
+    def seconds_until(self, frame_idx):
+        """
+        Return how many seconds remain until frame_idx is due (negative if it is already late).
+        """
+        due = self.start_time + (frame_idx - self.start_frame) / (self.fps * self.speed)
+        return due - time.perf_counter()
+
+    def frame_shown(self, frame_idx):
+        """
+        Record that frame_idx was just shown, for measuring the achieved speed.
+        """
+        now = time.perf_counter()
+        self._shown.append((now, frame_idx))
+        while len(self._shown) > 2 and now - self._shown[0][0] > 1.0:
+            self._shown.popleft()
+
+    def achieved_speed(self):
+        """
+        Return the playback speed actually achieved over roughly the last second, or None if unknown.
+        """
+        if len(self._shown) < 2:
+            return None
+        (t0, f0), (t1, f1) = self._shown[0], self._shown[-1]
+        if t1 <= t0:
+            return None
+        return (f1 - f0) / ((t1 - t0) * self.fps)
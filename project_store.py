@@ -0,0 +1,274 @@
+"""
+Optional SQLite project database holding the counts of many videos and sessions in one file.
+
+Usage:
+    python project_store.py PROJECT.db import LOGS_OR_FOLDERS...
+    python project_store.py PROJECT.db export VIDEO_OR_CSV OUTPUT.csv
+    python project_store.py PROJECT.db videos
+    python project_store.py PROJECT.db counts [--interval 15] [--key t] [--from 07:00] [--to 09:00] [--per-video]
+
+Videos are identified by their path without the extension, which the CSV log next to a video shares, so importing
+a CSV and opening its video in the app refer to the same entry. Events keep the exact CSV line text, so exports
+are identical to the CSV the app writes. Triggers keep per-minute counts up to date as events change, so counts
+over any time range read a few hundred summary rows instead of every event.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from event_store import make_event, format_timestamp_ms, parse_clock_ms
+from segmented_capture import segment_start_ms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    base TEXT NOT NULL UNIQUE,  -- absolute path without extension, shared by the video and its CSV
+    start_ms INTEGER,           -- start time of the video as milliseconds since midnight
+    fps REAL,
+    frame_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    video_id INTEGER NOT NULL REFERENCES videos(id),
+    ms INTEGER NOT NULL,        -- timestamp in milliseconds since midnight
+    key TEXT NOT NULL,
+    text TEXT NOT NULL          -- the line exactly as written to the CSV
+);
+CREATE INDEX IF NOT EXISTS events_video_ms ON events (video_id, ms);
+CREATE INDEX IF NOT EXISTS events_ms_key ON events (ms, key);
+-- Events per minute and key, for each video and over all videos, maintained by the triggers below
+CREATE TABLE IF NOT EXISTS minute_counts (
+    video_id INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (video_id, minute, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS total_minute_counts (
+    minute INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (minute, key)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS events_insert AFTER INSERT ON events BEGIN
+    INSERT INTO minute_counts VALUES (NEW.video_id, NEW.ms / 60000, NEW.key, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    INSERT INTO total_minute_counts VALUES (NEW.ms / 60000, NEW.key, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS events_delete AFTER DELETE ON events BEGIN
+    UPDATE minute_counts SET n = n - 1 WHERE video_id = OLD.video_id AND minute = OLD.ms / 60000 AND key = OLD.key;
+    UPDATE total_minute_counts SET n = n - 1 WHERE minute = OLD.ms / 60000 AND key = OLD.key;
+END;
+"""
+MINUTE_MS = 60000
+
+
+def video_base(path):
+    """
+    Return the identifier of the video a video or CSV path belongs to.
+    """
+    return os.path.splitext(os.path.abspath(path))[0]
+
+
+class ProjectStore:
+    """
+    Videos and their events in a local SQLite file. Safe to share between the GUI and the logger's writer thread.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def video_id(self, path, start_ms=None, fps=None, frame_count=None):
+        """
+        Return the id of the video that path (a video or its CSV) belongs to, adding it if needed.
+        Any of start_ms, fps and frame_count that are given are stored.
+        """
+        base = video_base(path)
+        with self._lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO videos (base) VALUES (?)", (base,))
+            self.db.execute("UPDATE videos SET start_ms = COALESCE(?, start_ms), fps = COALESCE(?, fps), "
+                            "frame_count = COALESCE(?, frame_count) WHERE base = ?", (start_ms, fps, frame_count, base))
+            return self.db.execute("SELECT id FROM videos WHERE base = ?", (base,)).fetchone()[0]
+
+    def replace_events(self, video_id, events):
+        """
+        Replace all events of a video with the given LogEvents in one transaction.
+        """
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM events WHERE video_id = ?", (video_id,))
+            self.db.executemany("INSERT INTO events (video_id, ms, key, text) VALUES (?, ?, ?, ?)",
+                                ((video_id, e.ms, e.key, e.text) for e in events))
+
+    def apply(self, video_id, ops):
+        """
+        Apply a batch of ('+' | '-', LogEvent) operations in one transaction. A delete removes one event with
+        the same time and text, as identical lines are interchangeable.
+        """
+        with self._lock, self.db:
+            for op, e in ops:
+                if op == '+':
+                    self.db.execute("INSERT INTO events (video_id, ms, key, text) VALUES (?, ?, ?, ?)",
+                                    (video_id, e.ms, e.key, e.text))
+                else:
+                    self.db.execute("DELETE FROM events WHERE rowid = (SELECT rowid FROM events "
+                                    "WHERE video_id = ? AND ms = ? AND text = ? LIMIT 1)", (video_id, e.ms, e.text))
+
+    def videos(self):
+        """
+        Return [(id, base, start_ms, fps, frame_count, event count)] for every video in the project.
+        """
+        with self._lock:
+            return self.db.execute(
+                "SELECT v.id, v.base, v.start_ms, v.fps, v.frame_count, "
+                "(SELECT COUNT(*) FROM events e WHERE e.video_id = v.id) FROM videos v ORDER BY v.base").fetchall()
+
+    def lines(self, video_id):
+        """
+        Return a video's events as CSV lines in time order.
+        """
+        with self._lock:
+            rows = self.db.execute("SELECT text FROM events WHERE video_id = ? ORDER BY ms, rowid", (video_id,))
+            return [text for (text,) in rows]
+
+    @staticmethod
+    def _where(start_ms, end_ms, key, video_ids, column='ms'):
+        clauses, params = [], []
+        if start_ms is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append(f"{column} < ?")
+            params.append(end_ms)
+        if key is not None:
+            clauses.append("key = ?")
+            params.append(key)
+        if video_ids is not None:
+            clauses.append(f"video_id IN ({','.join('?' * len(video_ids))})")
+            params.extend(video_ids)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _split(self, start_ms, end_ms):
+        # Split [start_ms, end_ms) into whole minutes answered from the summary tables and the ragged edges
+        # answered from events. Returns (first minute, end minute, [(edge start, edge end)]).
+        first = -(-start_ms // MINUTE_MS) if start_ms is not None else None
+        last = end_ms // MINUTE_MS if end_ms is not None else None
+        if first is not None and last is not None and first >= last:
+            return None, None, [(start_ms, end_ms)]
+        edges = []
+        if start_ms is not None and start_ms < first * MINUTE_MS:
+            edges.append((start_ms, first * MINUTE_MS))
+        if end_ms is not None and last * MINUTE_MS < end_ms:
+            edges.append((last * MINUTE_MS, end_ms))
+        return first, last, edges
+
+    def _count_rows(self, start_ms, end_ms, key, video_ids, interval_ms=None, per_video=False):
+        # (video id?, bucket?, key, count) rows from the summary tables plus the ragged edges of the range
+        if interval_ms is not None and interval_ms % MINUTE_MS:
+            first, last, edges = None, None, [(start_ms, end_ms)]  # Intervals that do not align with minutes
+        else:
+            first, last, edges = self._split(start_ms, end_ms)
+        whole_minutes = not (first is None and last is None and edges)
+        video_cols = "video_id, " if per_video else ""
+        rows = []
+        if whole_minutes:
+            table = "minute_counts" if per_video or video_ids is not None else "total_minute_counts"
+            where, params = self._where(first, last, key, video_ids, column='minute')
+            select = f"{video_cols}minute * {MINUTE_MS} / ? * ? AS bucket, key, SUM(n)"
+            rows += self.db.execute(f"SELECT {select} FROM {table}{where} GROUP BY {video_cols}bucket, key "
+                                    f"HAVING SUM(n) > 0", [interval_ms or 1, interval_ms or 1] + params).fetchall()
+        for edge_start, edge_end in edges:
+            where, params = self._where(edge_start, edge_end, key, video_ids)
+            select = f"{video_cols}ms / ? * ? AS bucket, key, COUNT(*)"
+            rows += self.db.execute(f"SELECT {select} FROM events{where} GROUP BY {video_cols}bucket, key",
+                                    [interval_ms or 1, interval_ms or 1] + params).fetchall()
+        totals = {}
+        for row in rows:
+            group = row[:-1] if interval_ms is not None else row[:-3] + row[-2:-1]
+            totals[group] = totals.get(group, 0) + row[-1]
+        return sorted(group + (count,) for group, count in totals.items())
+
+    def count_by_key(self, start_ms=None, end_ms=None, video_ids=None):
+        """
+        Return {key: count} over all videos (or the given ones) for events in [start_ms, end_ms).
+        """
+        with self._lock:
+            return {key: count for key, count in self._count_rows(start_ms, end_ms, None, video_ids)}
+
+    def interval_counts(self, interval_ms, start_ms=None, end_ms=None, key=None, per_video=False):
+        """
+        Return rows of (interval start ms, key, count), or (video id, interval start ms, key, count) if per_video,
+        for events in [start_ms, end_ms) across all videos.
+        """
+        with self._lock:
+            return self._count_rows(start_ms, end_ms, key, None, interval_ms, per_video)
+
+    def import_csv(self, csv_path):
+        """
+        Load a CSV log into the project, replacing the events stored for its video. Returns the number of events.
+        """
+        with open(csv_path, 'r', encoding='utf-8', errors='replace') as f:
+            events = [make_event(i, line) for i, line in enumerate(f) if line.strip()]
+        self.replace_events(self.video_id(csv_path, segment_start_ms(csv_path)), events)
+        return len(events)
+
+    def export_csv(self, video_id, csv_path):
+        """
+        Write a video's events to a CSV file in the app's format.
+        """
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in self.lines(video_id)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a Car Counter project database.")
+    parser.add_argument('project', help="project database file (created if missing)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    imp = commands.add_parser('import', help="import CSV logs")
+    imp.add_argument('logs', nargs='+', help="CSV log files or folders to search for them")
+    exp = commands.add_parser('export', help="export one video's events as a CSV log")
+    exp.add_argument('video', help="the video or its original CSV")
+    exp.add_argument('output')
+    commands.add_parser('videos', help="list the videos in the project")
+    counts = commands.add_parser('counts', help="print counts per interval and key across all videos")
+    counts.add_argument('--interval', type=float, default=15, help="interval length in minutes (default 15)")
+    counts.add_argument('--key')
+    counts.add_argument('--from', dest='start', help="HH:MM[:SS]")
+    counts.add_argument('--to', dest='end', help="HH:MM[:SS] (exclusive)")
+    counts.add_argument('--per-video', action='store_true')
+    args = parser.parse_args(argv)
+    store = ProjectStore(args.project)
+    try:
+        if args.command == 'import':
+            from count_report import find_logs
+            for log in find_logs(args.logs):
+                print(f"{log}: {store.import_csv(log)} events")
+        elif args.command == 'export':
+            store.export_csv(store.video_id(args.video), args.output)
+        elif args.command == 'videos':
+            for video_id, base, start_ms, _, _, count in store.videos():
+                start = format_timestamp_ms(start_ms) if start_ms is not None else "-"
+                print(f"{video_id:5} {start} {count:8} {base}")
+        else:
+            start = parse_clock_ms(args.start) if args.start else None
+            end = parse_clock_ms(args.end) if args.end else None
+            interval_ms = max(1, int(args.interval * 60 * 1000))
+            bases = {video_id: base for video_id, base, *_ in store.videos()}
+            for row in store.interval_counts(interval_ms, start, end, args.key, args.per_video):
+                *video, bucket, key, count = row
+                prefix = f"{os.path.basename(bases[video[0]])}, " if video else ""
+                print(f"{prefix}{format_timestamp_ms(bucket)}, {key}, {count}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Low-resolution proxies for fast playback and seeking.
+
+Usage:
+    python proxy.py VIDEOS_OR_FOLDERS... [--width 640] [--height 480] [--workers N]
+
+A proxy is a Motion JPEG .avi next to the original with the same frame rate and exactly one proxy frame per
+source frame, so frame indices (and the timestamps derived from them) carry over unchanged. Every MJPG frame
+is a keyframe, which makes seeking in the proxy a direct jump.
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+
+PROXY_SIZE = (640, 480)  # Matches the size of the video display
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+TEMP_SUFFIX = ".tmp.avi"  # Proxy being written; VideoWriter picks the container from the extension
+
+
+def proxy_path(video_path):
+    """
+    Return the path of the proxy for a video file.
+    """
+    return os.path.splitext(video_path)[0] + ".proxy.avi"
+
+
+def find_proxy(video_path):
+    """
+    Return the path of an up-to-date proxy for video_path, or None if there is none.
+    """
+    path = proxy_path(video_path)
+    try:
+        if os.stat(path).st_mtime_ns >= os.stat(video_path).st_mtime_ns:
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def make_proxy(video_path, size=PROXY_SIZE, stop_event=None, progress=None):
+    """
+    Write a proxy for video_path in one sequential pass and return its path, or None if it was stopped or failed.
+    progress, if given, is called with the fraction done every few hundred frames.
+    """
+    src = cv2.VideoCapture(video_path)
+    if not src.isOpened():
+        return None
+    fps = src.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(src.get(cv2.CAP_PROP_FRAME_COUNT))
+    path = proxy_path(video_path)
+    tmp_path = path + TEMP_SUFFIX
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    if not writer.isOpened():
+        src.release()
+        return None
+    writer.set(cv2.VIDEOWRITER_PROP_QUALITY, 90)
+    written = 0
+    try:
+        while stop_event is None or not stop_event.is_set():
+            ret, frame = src.read()
+            if not ret:
+                break
+            writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            written += 1
+            if progress is not None and written % 300 == 0 and frame_count:
+                progress(min(1.0, written / frame_count))
+    finally:
+        src.release()
+        writer.release()
+    if written == 0 or (stop_event is not None and stop_event.is_set()):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+    os.replace(tmp_path, path)
+    if progress is not None:
+        progress(1.0)
+    return path
+
+
+def find_videos(paths):
+    """
+    Expand folders into the videos they contain (recursively), leaving out existing proxies and the
+    unfinished ones an interrupted run left behind.
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for ext in VIDEO_EXTENSIONS:
+                videos.extend(glob.glob(os.path.join(path, '**', '*' + ext), recursive=True))
+        else:
+            videos.append(path)
+    return sorted(v for v in set(videos) if not v.endswith(('.proxy.avi', '.proxy.avi' + TEMP_SUFFIX)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create low-resolution proxies for Car Counter videos.")
+    parser.add_argument('videos', nargs='+', help="video files or folders to search for them")
+    parser.add_argument('--width', type=int, default=PROXY_SIZE[0])
+    parser.add_argument('--height', type=int, default=PROXY_SIZE[1])
+    parser.add_argument('--force', action='store_true', help="rebuild proxies that are already up to date")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    videos = [v for v in find_videos(args.videos) if args.force or find_proxy(v) is None]
+    size = (args.width, args.height)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for video, path in zip(videos, pool.map(make_proxy, videos, [size] * len(videos))):
+            print(f"{video} -> {path or 'failed'}")
+
+
+if __name__ == "__main__":
+    main()
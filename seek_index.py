@@ -0,0 +1,160 @@
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+
+
+class SeekIndex:
+    """
+    Keyframe positions and per-frame presentation timestamps for a video, cached in a .idx file next to it.
+    The index is built by reading packets without decoding them, so a scan is limited by disk speed only.
+    """
+    MAGIC = b'CCIX'
+    VERSION = 2  # 1 stored keyframes by decode position, wrong for streams with B-frames
+    HEADER = struct.Struct('<4sHqqIIId')  # magic, version, size, mtime_ns, frames, keyframes, pts count, fps
+
+    def __init__(self, fps, frame_count, keyframes, pts=None):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.frame_count = frame_count
+        self.keyframes = keyframes  # array('I') of keyframe indices, ascending
+        self.pts = pts if pts is not None else array('d')  # Empty for constant frame rate files
+
+    @staticmethod
+    def index_path(video_path):
+        """
+        Return the path of the index sidecar for a video file.
+        """
+        return os.path.splitext(video_path)[0] + ".idx"
+
+    @classmethod
+    def load(cls, video_path):
+        """
+        Load the cached index for video_path, or return None if there is none or the video has changed.
+        """
+        try:
+            st = os.stat(video_path)
+            with open(cls.index_path(video_path), 'rb') as f:
+                header = f.read(cls.HEADER.size)
+                magic, version, size, mtime_ns, frames, key_count, pts_count, fps = cls.HEADER.unpack(header)
+                if magic != cls.MAGIC or version != cls.VERSION or size != st.st_size or mtime_ns != st.st_mtime_ns:
+                    return None
+                keyframes = array('I')
+                keyframes.fromfile(f, key_count)
+                pts = array('d')
+                pts.fromfile(f, pts_count)
+        except (OSError, EOFError, struct.error):
+            return None
+        return cls(fps, frames, keyframes, pts)
+
+    def save(self, video_path):
+        """
+        Write the index next to video_path, replacing any previous one atomically.
+        """
+        st = os.stat(video_path)
+        path = self.index_path(video_path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, st.st_size, st.st_mtime_ns, self.frame_count,
+                                     len(self.keyframes), len(self.pts), self.fps))
+            self.keyframes.tofile(f)
+            self.pts.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def build(cls, video_path):
+        """
+        Scan a video's packets and return its index, or None if the backend cannot report keyframes.
+        """
+        if not hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME'):
+            return None
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not cap.isOpened():
+            return None
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            keyframe_pts = []
+            pts = array('d')
+            while cap.grab():
+                t = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframe_pts.append(t)
+                pts.append(t)
+        finally:
+            cap.release()
+        if not keyframe_pts:
+            return None
+        # Packets come in decode order, presentation order is ascending timestamps. A keyframe's position in
+        # decode order can be ahead of its position on screen (open GOPs with B-frames), so keyframes are
+        # found by their timestamp once the timestamps are sorted
+        pts = array('d', sorted(pts))
+        keyframes = array('I', sorted(bisect_left(pts, t) for t in keyframe_pts))
+        index = cls(fps, len(pts), keyframes)
+        if any(abs(t - index.fps_ms(i)) > 0.5 for i, t in enumerate(pts)):
+            index.pts = pts  # Variable frame rate, keep every timestamp
+        return index
+
+    @classmethod
+    def load_or_build(cls, video_path):
+        """
+        Return the cached index for video_path, building and caching it if needed. Returns None on failure.
+        """
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path)
+            if index is not None:
+                try:
+                    index.save(video_path)
+                except OSError:
+                    pass  # Read-only footage folder, keep the index in memory only
+        return index
+
+    def fps_ms(self, frame_idx):
+        """
+        Return the nominal timestamp of frame_idx from the frame rate alone.
+        """
+        return frame_idx * 1000.0 / self.fps
+
+    def duration_ms(self):
+        """
+        Return the time in milliseconds at which the last frame stops being shown.
+        """
+        if self.pts:
+            return self.pts[-1] + 1000.0 / self.fps
+        return self.fps_ms(self.frame_count)
+
+    def keyframe_before(self, frame_idx):
+        """
+        Return the index of the last keyframe at or before frame_idx.
+        """
+        i = bisect_right(self.keyframes, frame_idx)
+        return self.keyframes[i - 1] if i else 0
+
+    def frame_to_ms(self, frame_idx):
+        """
+        Return the presentation timestamp in milliseconds of frame_idx.
+        """
+        if self.pts and 0 <= frame_idx < len(self.pts):
+            return self.pts[frame_idx]
+        return self.fps_ms(frame_idx)
+
+    def ms_to_frame(self, ms):
+        """
+        Return the index of the frame on screen at ms milliseconds into the video.
+        """
+        if self.pts:
+            return max(0, bisect_right(self.pts, ms + 1e-6) - 1)
+        return int(ms * self.fps / 1000.0 + 1e-6)
+
+
+def frame_at_ms(ms, fps, frame_count, index=None):
+    """
+    Return the index of the frame on screen at ms milliseconds into a video, or None if ms is before its start or
+    after its end. ms_to_frame alone clamps times past the end to the last frame.
+    """
+    duration = index.duration_ms() if index is not None else frame_count * 1000.0 / fps
+    if ms < 0 or ms >= duration:
+        return None
+    return index.ms_to_frame(ms) if index is not None else min(int(ms * fps / 1000), frame_count - 1)
@@ -0,0 +1,332 @@
+"""
+Continuous playback of a folder of segmented recordings, such as the hourly files a recorder writes.
+
+Each segment's start time comes from the HHMMSS at the end of its file name, the same way a single video's
+default start time does. Frames of all segments are numbered one after another, so the rest of the app can
+treat the folder as one long video: SegmentedCapture reads and seeks across segment boundaries like a
+cv2.VideoCapture, and TimelineIndex maps frames to times (and back) like a SeekIndex.
+"""
+import os
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from lazy_import import lazy_module
+from perf_stats import PERF
+from proxy import VIDEO_EXTENSIONS
+from seek_index import SeekIndex
+from video_processor import VideoProcessor
+
+cv2 = lazy_module('cv2')
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def segment_start_ms(path):
+    """
+    Return the start time in milliseconds since midnight from the HHMMSS at the end of a file name, or None.
+    """
+    digits = VideoProcessor.extract_default_start_time(os.path.splitext(os.path.basename(path))[0])
+    offset = VideoProcessor.parse_start_time(digits) if digits else None
+    return int(offset.total_seconds() * 1000) if offset is not None else None
+
+
+def video_start_ms(video_path, start=None):
+    """
+    Return the clock time in milliseconds of a video's first frame: start if given, in the HH:MM:SS or HHMMSS form
+    the GUI accepts, otherwise the HHMMSS at the end of the file name, otherwise 0.
+    Raises ValueError if start is given but unreadable.
+    """
+    if start:
+        offset = VideoProcessor.parse_start_time(start)
+        if offset is None:
+            raise ValueError(f"invalid start time {start!r}, use HH:MM:SS or HHMMSS")
+        return int(offset.total_seconds() * 1000)
+    return segment_start_ms(video_path) or 0
+
+
+def _order_by_time_of_day(paths):
+    # Sort by start time and rotate the list to begin after the longest gap, counting the one across midnight
+    paths = sorted(paths, key=segment_start_ms)
+    starts = [segment_start_ms(p) for p in paths]
+    gaps = [(starts[0] + DAY_MS - starts[-1], 0)] + [(starts[i] - starts[i - 1], i) for i in range(1, len(starts))]
+    first = max(gaps, key=lambda gap: gap[0])[1]  # The first gap (midnight) wins ties, keeping the plain order
+    return paths[first:] + paths[:first]
+
+
+def _probe(path):
+    # (frame count, fps, SeekIndex or None) of a segment, from its cached index if there is one
+    index = SeekIndex.load(path)
+    if index is not None:
+        return index.frame_count, index.fps, index
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return 0, 0.0, None
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS), None
+    finally:
+        cap.release()
+
+
+class TimelineIndex:
+    """
+    Where each segment of a folder sits on its timeline, with the SeekIndex interface over the whole folder.
+    Times are milliseconds from the start of the first segment, taken from the segment start times, so a gap
+    in the recording is also a gap in time. Segments' own seek indexes are used once they are loaded.
+    """
+    def __init__(self, folder, segments):
+        # segments: [(path, start ms since midnight, frame count, fps, SeekIndex or None)] in recording order
+        self.folder = folder
+        self.paths = [s[0] for s in segments]
+        self.start_ms = segments[0][1]  # Clock time of the first frame
+        self.starts = [s[1] - self.start_ms for s in segments]
+        self.counts = [s[2] for s in segments]
+        self.fps_list = [s[3] if s[3] and s[3] > 0 else 30.0 for s in segments]
+        self.indexes = [s[4] for s in segments]
+        self.offsets = []  # Timeline frame number of each segment's first frame
+        total = 0
+        for count in self.counts:
+            self.offsets.append(total)
+            total += count
+        self.frame_count = total
+        self.fps = self.fps_list[0]
+
+    @classmethod
+    def probe(cls, folder):
+        """
+        Find the segments in a folder and read their lengths. Files are taken in name order, and a start time
+        earlier than the one before is taken to be after midnight. Raises ValueError if there are none.
+        When the names differ only in their HHMMSS, so they carry no date, name order puts a 23:59 segment after
+        the 00:00 one. Such folders are ordered by time of day instead, starting after the longest gap around the
+        clock, which for any recording shorter than a day is the time it was not running.
+        """
+        paths = []
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if name.lower().endswith(VIDEO_EXTENSIONS) and not name.endswith('.proxy.avi') and os.path.isfile(path):
+                if segment_start_ms(path) is not None:
+                    paths.append(path)
+        if len({os.path.splitext(os.path.basename(p))[0][:-6] for p in paths}) == 1:
+            paths = _order_by_time_of_day(paths)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            probes = list(pool.map(_probe, paths))
+        segments = []
+        day_ms = 0
+        for path, (count, fps, index) in zip(paths, probes):
+            if count <= 0:
+                continue  # Unreadable or empty file
+            start = segment_start_ms(path) + day_ms
+            if segments and start < segments[-1][1]:
+                day_ms += DAY_MS
+                start += DAY_MS
+            segments.append((path, start, count, fps, index))
+        if not segments:
+            raise ValueError(f"No videos with an HHMMSS start time at the end of their name in {folder}")
+        return cls(folder, segments)
+
+    def load_indexes(self, keep_going=lambda: True):
+        """
+        Load or build the seek index of every segment that does not have one yet, while keep_going() is true.
+        """
+        for i, path in enumerate(self.paths):
+            if not keep_going():
+                return
+            if self.indexes[i] is None:
+                self.indexes[i] = SeekIndex.load_or_build(path)
+
+    def locate(self, frame_idx):
+        """
+        Return (segment, frame within the segment) of a timeline frame number.
+        """
+        frame_idx = min(max(0, frame_idx), self.frame_count - 1)
+        i = bisect_right(self.offsets, frame_idx) - 1
+        return i, frame_idx - self.offsets[i]
+
+    def keyframe_before(self, frame_idx):
+        """
+        Return the timeline frame number of the last keyframe at or before frame_idx, within its segment.
+        Frames of segments that are not indexed yet count as keyframes, so seeks go straight to them.
+        """
+        i, local = self.locate(frame_idx)
+        index = self.indexes[i]
+        return self.offsets[i] + (index.keyframe_before(local) if index is not None else local)
+
+    def frame_to_ms(self, frame_idx):
+        """
+        Return the timeline time in milliseconds of frame_idx.
+        """
+        i, local = self.locate(frame_idx)
+        index = self.indexes[i]
+        ms = index.frame_to_ms(local) if index is not None else local * 1000.0 / self.fps_list[i]
+        return self.starts[i] + ms
+
+    def ms_to_frame(self, ms):
+        """
+        Return the timeline frame number on screen at ms. Times in a gap between segments show the last frame
+        of the segment before it.
+        """
+        i = max(0, bisect_right(self.starts, ms) - 1)
+        ms -= self.starts[i]
+        index = self.indexes[i]
+        local = index.ms_to_frame(ms) if index is not None else int(ms * self.fps_list[i] / 1000.0 + 1e-6)
+        return self.offsets[i] + min(max(0, local), self.counts[i] - 1)
+
+
+class _Prefetch:
+    __slots__ = ('segment', 'done', 'cancelled', 'result')
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result = None  # (capture, first frame or None) once opened
+
+
+class SegmentedCapture:
+    """
+    Reads the segments of a TimelineIndex as one video, through the parts of the cv2.VideoCapture interface
+    the app uses. Whenever a segment is opened, the next one is opened and its first frame decoded on a
+    background thread, so playing on past the end of a segment does not wait for a decoder to start.
+    Like a VideoCapture, it must only be used from one thread at a time.
+    """
+    def __init__(self, index, prefetch=True):
+        self.index = index
+        self.prefetch = prefetch
+        self._cap = None
+        self._segment = -1
+        self._local = 0  # Frame of the current segment the next grab() reads
+        self._primed = None  # First frame of the current segment, decoded in advance, for the next grab()
+        self._grabbed = None  # Primed frame taken by the last grab(), for retrieve()
+        self._next = None  # _Prefetch of the segment being opened in the background
+        self._lock = threading.Lock()
+        self._released = False
+
+    def clone(self):
+        """
+        Return another capture of the same timeline, for reading frames away from playback.
+        """
+        return SegmentedCapture(self.index, prefetch=False)
+
+    def isOpened(self):
+        return not self._released
+
+    def release(self):
+        self._released = True
+        self._drop_prefetch()
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position())
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.index.frame_count)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.index.fps
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.index.frame_to_ms(self._position())
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        segment, local = self.index.locate(int(value))
+        if segment != self._segment:
+            self._open(segment, local)
+        elif local != self._local:
+            self._primed = self._grabbed = None
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, local)
+            self._local = local
+        return True
+
+    def grab(self):
+        self._grabbed = None
+        if self._released:
+            return False
+        if self._segment < 0:
+            self._open(0, 0)
+        while True:
+            if self._local < self.index.counts[self._segment]:
+                if self._primed is not None:
+                    self._grabbed, self._primed = self._primed, None
+                    self._local += 1
+                    return True
+                if self._cap.grab():
+                    self._local += 1
+                    return True
+            if self._segment + 1 >= len(self.index.paths):
+                return False
+            self._open(self._segment + 1, 0)
+
+    def retrieve(self):
+        if self._grabbed is not None:
+            return True, self._grabbed
+        return self._cap.retrieve() if self._cap is not None else (False, None)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def _position(self):
+        return self.index.offsets[self._segment] + self._local if self._segment >= 0 else 0
+
+    def _open(self, segment, local):
+        with PERF.time('segment_open'):
+            taken = self._take_prefetched(segment)
+            if self._cap is not None:
+                self._cap.release()
+            self._primed = self._grabbed = None
+            if taken is not None:
+                cap, first_frame = taken
+                if local == 0 and first_frame is not None:
+                    self._primed = first_frame
+                else:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, local)
+            else:
+                cap = cv2.VideoCapture(self.index.paths[segment])
+                if local:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, local)
+            self._cap, self._segment, self._local = cap, segment, local
+        if self.prefetch and segment + 1 < len(self.index.paths):
+            self._start_prefetch(segment + 1)
+
+    def _start_prefetch(self, segment):
+        self._drop_prefetch()
+        job = self._next = _Prefetch(segment)
+        path = self.index.paths[segment]
+
+        def worker():
+            cap = cv2.VideoCapture(path)
+            ret, frame = cap.read()
+            with self._lock:
+                if not job.cancelled:
+                    job.result = (cap, frame if ret else None)
+                    cap = None
+            if cap is not None:
+                cap.release()
+            job.done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _take_prefetched(self, segment):
+        # The prefetched capture if it is for segment (waiting for it if needed), discarding it otherwise
+        job = self._next
+        if job is None or job.segment != segment:
+            self._drop_prefetch()
+            return None
+        self._next = None
+        if not job.done.is_set():
+            PERF.count('segment_prefetch_waits')
+            job.done.wait()
+        return job.result
+
+    def _drop_prefetch(self):
+        job, self._next = self._next, None
+        if job is None:
+            return
+        with self._lock:
+            job.cancelled = True
+            result, job.result = job.result, None
+        if result is not None:
+            result[0].release()
@@ -0,0 +1,140 @@
+import threading
+from array import array
+from bisect import bisect_left
+from lazy_import import lazy_module
+from motion_detector import MotionMeter
+from video_processor import VideoProcessor
+
+cv2 = lazy_module('cv2')
+
+
+class MotionScanner:
+    """
+    Scores motion inside a region on a worker thread, reading ahead of the playhead on its own capture.
+    Every STEP-th frame is analysed and the ones in between are skipped with grab(). Analysed frames where
+    motion is seen (with hysteresis, as in motion_detector) are recorded, so the player can tell how far
+    the footage ahead of it is known to be static.
+    """
+    STEP = 4
+    ON_SCORE = 0.02  # Motion starts at this score
+    OFF_SCORE = 0.005  # and ends once the score drops to this
+    WARMUP_SAMPLES = 8  # Samples treated as motion while the background model settles
+    AHEAD_SECONDS = 600  # How far ahead of the playhead the scanner reads
+
+    def __init__(self, open_capture, region, start_frame, fps):
+        self.region = region
+        self.start = start_frame  # First frame scanned
+        self.frontier = start_frame  # Frames before this have been scanned
+        self.playhead = start_frame  # Updated by the player, the scanner waits when far enough ahead of it
+        self.motion = array('I')  # Analysed frames where motion was seen, ascending
+        self.finished = False  # Set once the end of the video is reached
+        self._ahead = int(fps * self.AHEAD_SECONDS)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(open_capture,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def covers(self, frame_idx, slack):
+        """
+        Return True if frame_idx is scanned, or at most slack frames past what has been scanned.
+        """
+        return self.start <= frame_idx <= self.frontier + slack
+
+    def static_until(self, frame_idx):
+        """
+        Return the first frame at or after frame_idx where motion was seen, or the end of the scanned footage.
+        """
+        i = bisect_left(self.motion, frame_idx)
+        return self.motion[i] if i < len(self.motion) else self.frontier
+
+    def _run(self, open_capture):
+        cap = open_capture()
+        try:
+            if not cap.isOpened():
+                return
+            pos = self.start
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            meter = MotionMeter(self.region)
+            samples = 0
+            active = True
+            while not self._stop_event.is_set():
+                if pos - self.playhead > self._ahead:
+                    self._stop_event.wait(0.05)
+                    continue
+                if not cap.grab():
+                    self.finished = True
+                    return
+                if (pos - self.start) % self.STEP == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        self.finished = True
+                        return
+                    score = meter.score(frame)
+                    samples += 1
+                    if samples <= self.WARMUP_SAMPLES:
+                        active = True
+                    elif active:
+                        active = score > self.OFF_SCORE
+                    else:
+                        active = score >= self.ON_SCORE
+                    if active:
+                        self.motion.append(pos)
+                pos += 1
+                self.frontier = pos
+        finally:
+            cap.release()
+
+
+class Skimmer:
+    """
+    Adaptive skim playback: while enabled, footage the MotionScanner has found static is played at SKIM_SPEED,
+    and playback drops back to the chosen speed LEAD_SECONDS (of skimming) before the next motion.
+    The scanner watches gui.motion_region and restarts whenever the region changes or the playhead jumps
+    away from the scanned footage.
+    """
+    SKIM_SPEED = 50
+    LEAD_SECONDS = 0.1  # Wall-clock time of skimming kept between the playhead and the next motion
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.enabled = False
+        self.scanner = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.reset()
+
+    def reset(self):
+        """
+        Stop scanning, for example when another video is opened.
+        """
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+
+    def speed_at(self, frame_idx, normal_speed):
+        """
+        Return the speed to play at from frame_idx: SKIM_SPEED if the footage ahead is known to be static for
+        long enough, otherwise normal_speed.
+        """
+        gui = self.gui
+        if not self.enabled or not gui.video:
+            return normal_speed
+        fps = VideoProcessor.source_fps(gui) or 30.0
+        scanner = self.scanner
+        if scanner is None or scanner.region != gui.motion_region or not scanner.covers(frame_idx, int(fps * 10)):
+            self.reset()
+            self.scanner = MotionScanner(self._opener(), gui.motion_region, frame_idx, fps)
+            return normal_speed
+        scanner.playhead = frame_idx
+        static_until = scanner.static_until(frame_idx)
+        if scanner.finished and static_until == scanner.frontier:
+            return self.SKIM_SPEED  # Static all the way to the end of the video
+        return self.SKIM_SPEED if static_until - frame_idx > fps * self.SKIM_SPEED * self.LEAD_SECONDS else normal_speed
+
+    def _opener(self):
+        return VideoProcessor.scan_opener(self.gui)
@@ -0,0 +1,16 @@
+from array import array
+from clip_exporter import plan_runs
+from seek_index import SeekIndex
+
+
+def test_events_past_the_end_are_left_out():
+    # Variable frame rate file of 10 frames, the last one shown from 500 ms until 540 ms
+    pts = array('d', [0, 40, 80, 120, 160, 200, 300, 400, 450, 500])
+    index = SeekIndex(25.0, 10, array('I', [0]), pts)
+    runs = plan_runs([(100, 'c'), (520, 't'), (600, 'c'), (60000, 'c')], 0, 25.0, 10, before=0, after=0, index=index)
+    assert [name for _, _, clips in runs for _, _, name in clips] == ['c_000000100.mp4', 't_000000520.mp4']
+
+
+def test_events_past_the_end_are_left_out_without_an_index():
+    runs = plan_runs([(100, 'c'), (400, 'c'), (-10, 'c')], 0, 25.0, 10, before=0, after=0)
+    assert [clips[0][:2] for _, _, clips in runs] == [(2, 3)]
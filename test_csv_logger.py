@@ -0,0 +1,41 @@
+from csv_logger import CSVLogger
+
+
+def write_session(path, csv_lines, records, header=None):
+    # Leave the files an unclean exit would: the last snapshot and the journal of changes made since
+    content = "".join(line + "\n" for line in csv_lines).encode('utf-8')
+    path.write_bytes(content)
+    header = CSVLogger._journal_header(content) if header is None else header
+    with open(str(path) + ".journal", 'w') as f:
+        f.write(header + "\n" + "".join(records))
+
+
+def open_log(path):
+    logger = CSVLogger(str(path))
+    texts = [e.text for e in logger.events]
+    logger.close()
+    return texts
+
+
+def test_journal_is_replayed_after_an_unclean_exit(tmp_path):
+    path = tmp_path / "log.csv"
+    write_session(path, ["07:00:01, c", "07:00:02, t", "07:00:02, t"],
+                  ["+ 07:00:03, c\n", "- 07:00:02, t\n", "+ 07:00:00, b\n"])
+    expected = ["07:00:00, b", "07:00:01, c", "07:00:02, t", "07:00:03, c"]
+    assert open_log(path) == expected
+    assert path.read_text().splitlines() == expected  # Replay writes a fresh snapshot
+    assert open_log(path) == expected
+
+
+def test_truncated_last_record_is_dropped(tmp_path):
+    path = tmp_path / "log.csv"
+    write_session(path, ["07:00:01, c"], ["+ 07:00:02, c\n", "- 07:00:01, c\n", "+ 07:00:0"])
+    assert open_log(path) == ["07:00:02, c"]
+
+
+def test_journal_with_a_bad_crc_header_is_ignored(tmp_path):
+    path = tmp_path / "log.csv"
+    write_session(path, ["07:00:01, c"], ["+ 07:00:02, c\n"], header="# base crc32=1 size=12")
+    assert open_log(path) == ["07:00:01, c"]
+    write_session(path, ["07:00:01, c"], ["+ 07:00:02, c\n"], header="garbage")
+    assert open_log(path) == ["07:00:01, c"]
@@ -0,0 +1,57 @@
+import random
+import pytest
+from event_store import LogEvent, SortedEventList, bound
+
+
+class SmallBuckets(SortedEventList):
+    LOAD = 2  # Split buckets after a few inserts, so the tests cross bucket boundaries
+
+
+def make_events():
+    # Several events share each timestamp and key and differ only by id
+    return [LogEvent(ms, i, 'c', f"{ms}, c") for i, ms in enumerate([1000] * 6 + [2000] * 5 + [3000] * 4)]
+
+
+def test_add_returns_the_rank_among_duplicate_timestamps():
+    events = make_events()
+    shuffled = events[:]
+    random.Random(1).shuffle(shuffled)
+    lst = SmallBuckets()
+    for n, event in enumerate(shuffled, 1):
+        assert lst.add(event) == sorted(shuffled[:n]).index(event)
+    assert list(lst) == events
+    assert [lst[i] for i in range(len(lst))] == events
+    assert lst[-1] == events[-1]
+    assert [lst.index(e) for e in events] == list(range(len(events)))
+    assert list(lst.islice(4, 9)) == events[4:9]
+
+
+def test_bisect_by_time_with_duplicate_timestamps():
+    lst = SmallBuckets(make_events())
+    assert lst.bisect_left(bound(1000)) == 0
+    assert lst.bisect_left(bound(2000)) == 6
+    assert lst.bisect_left(bound(3000)) == 11
+    assert lst.bisect_left(bound(3001)) == 15
+    assert lst.bisect_left(lst[7]) == 7
+    assert lst.bisect_right(lst[7]) == 8
+
+
+def test_remove_returns_the_rank_and_keeps_duplicates_apart():
+    events = make_events()
+    lst = SmallBuckets(events)
+    assert lst.remove(events[8]) == 8
+    assert lst.remove(events[6]) == 6
+    assert lst.remove(events[0]) == 0
+    remaining = [e for i, e in enumerate(events) if i not in (0, 6, 8)]
+    assert list(lst) == remaining
+    assert [lst.index(e) for e in remaining] == list(range(len(remaining)))
+    with pytest.raises(ValueError):
+        lst.remove(events[6])
+    with pytest.raises(ValueError):
+        lst.index(events[8])
+    for event in remaining:
+        lst.remove(event)
+    assert len(lst) == 0
+    with pytest.raises(IndexError):
+        lst[0]
+    assert lst.add(events[3]) == 0
@@ -0,0 +1,23 @@
+import numpy as np
+from log_merge import merge_logs
+
+
+def make_log(events):
+    return np.array([ms for ms, _ in events], np.int64), np.array([key.encode() for _, key in events], 'S')
+
+
+def test_close_events_of_one_key_pair_in_order():
+    a = make_log([(0, 'c'), (200, 'c')])
+    b = make_log([(600, 'c'), (700, 'c')])
+    result = merge_logs([a, b], tolerance_ms=1000)
+    assert result.times.tolist() == [[0, 600], [200, 700]]
+    assert result.consensus_counts() == {'c': 2}
+    assert [s['agreement'] for s in result.annotator_stats()] == [1.0, 1.0]
+
+
+def test_events_outside_the_tolerance_do_not_match():
+    a = make_log([(0, 'c'), (5000, 't')])
+    b = make_log([(1500, 'c'), (5100, 'c')])
+    result = merge_logs([a, b], tolerance_ms=1000)
+    assert result.consensus_counts() == {}
+    assert len(result.disagreements()) == 4
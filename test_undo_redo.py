@@ -0,0 +1,92 @@
+from csv_logger import CSVLogger
+
+
+class StubPanel:
+    def __init__(self):
+        self.highlights = []
+        self.calls = []
+
+    def highlighted_line(self):
+        return self.highlights[0] if self.highlights else None
+
+    def insert_line(self, line_number, highlight=True):
+        self.calls.append(('insert', line_number))
+        self.highlights = [line_number]
+
+    def delete_line(self, line_number, highlight_line=None):
+        self.calls.append(('delete', line_number))
+        self.highlights = [highlight_line] if highlight_line else []
+
+
+class StubGui:
+    def __init__(self):
+        self.log_panel = StubPanel()
+        self.undo_stack = []
+        self.redo_stack = []
+        self.paused = False
+
+
+def open_log(tmp_path):
+    # Three identical entries: same key and timestamp, told apart only by their event ids
+    path = tmp_path / "log.csv"
+    path.write_text("07:00:01, c\n07:00:01, c\n07:00:01, c\n07:00:02, t\n")
+    return CSVLogger(str(path))
+
+
+def ids(logger):
+    return [e.id for e in logger.events]
+
+
+def test_undo_and_redo_a_delete_among_identical_entries(tmp_path):
+    logger = open_log(tmp_path)
+    gui = StubGui()
+    gui.log_panel.highlights = [2]
+    logger.undo(gui)
+    assert ids(logger) == [0, 2, 3]
+    assert gui.log_panel.calls == [('delete', 2)]
+    logger.restore_last_undo(gui)
+    assert ids(logger) == [0, 1, 2, 3]
+    assert gui.log_panel.calls[-1] == ('insert', 2)
+    assert gui.undo_stack == [] and len(gui.redo_stack) == 1
+    logger.redo(gui)
+    assert ids(logger) == [0, 2, 3]
+    assert gui.log_panel.calls[-1] == ('delete', 2)
+    assert gui.redo_stack == [] and [e.id for _, e in gui.undo_stack] == [1]
+    logger.close()
+    assert (tmp_path / "log.csv").read_text().splitlines() == ["07:00:01, c", "07:00:01, c", "07:00:02, t"]
+
+
+def test_several_deletes_of_identical_entries_undo_in_reverse(tmp_path):
+    logger = open_log(tmp_path)
+    gui = StubGui()
+    gui.log_panel.highlights = [3]
+    logger.undo(gui)
+    gui.log_panel.highlights = [1]
+    logger.undo(gui)
+    assert ids(logger) == [1, 3]
+    logger.restore_last_undo(gui)
+    assert ids(logger) == [0, 1, 3]
+    assert gui.log_panel.calls[-1] == ('insert', 1)
+    logger.restore_last_undo(gui)
+    assert ids(logger) == [0, 1, 2, 3]
+    assert gui.log_panel.calls[-1] == ('insert', 3)
+    logger.redo(gui)
+    logger.redo(gui)
+    assert ids(logger) == [1, 3]
+    assert logger.count('c') == 1
+    logger.close()
+
+
+def test_undoing_a_logged_entry_removes_that_entry(tmp_path):
+    logger = open_log(tmp_path)
+    gui = StubGui()
+    logged = logger.log_entry('c', "07:00:01")
+    gui.undo_stack.append(('+', logged))
+    assert ids(logger) == [0, 1, 2, 4, 3]
+    logger.restore_last_undo(gui)
+    assert ids(logger) == [0, 1, 2, 3]
+    assert gui.log_panel.calls == [('delete', 4)]
+    logger.redo(gui)
+    assert ids(logger) == [0, 1, 2, 4, 3]
+    assert gui.log_panel.calls[-1] == ('insert', 4)
+    logger.close()
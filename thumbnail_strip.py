@@ -0,0 +1,225 @@
+import os
+import struct
+import threading
+from tkinter import Canvas, Label
+from lazy_import import lazy_module
+from video_processor import VideoProcessor
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+ImageTk = lazy_module('PIL.ImageTk')
+
+
+class ThumbnailCache:
+    """
+    Thumbnails sampled every `interval` frames, stored in a memory-mapped .thumbs file next to the video.
+    The header records how many thumbnails have been filled so far, so generation can be watched
+    (and resumed) while it is still running.
+    """
+    MAGIC = b'CCTH'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHqqIIIII')  # magic, version, size, mtime_ns, interval, count, width, height, filled
+    THUMB_SIZE = (128, 72)
+    MAX_COUNT = 1000  # Thumbnails per video, however long it is
+    MIN_SECONDS = 5  # Shortest interval between thumbnails
+
+    def __init__(self, path, mm):
+        self.path = path
+        self._mm = mm
+        _, _, _, _, self.interval, self.count, width, height, _ = self.HEADER.unpack_from(mm, 0)
+        self.size = (width, height)
+        self.thumbs = np.ndarray((self.count, height, width, 3), np.uint8, buffer=mm, offset=self.HEADER.size)
+
+    @staticmethod
+    def cache_path(video_path):
+        """
+        Return the path of the thumbnail sidecar for a video file.
+        """
+        return os.path.splitext(video_path)[0] + ".thumbs"
+
+    @classmethod
+    def open(cls, video_path, frame_count, fps):
+        """
+        Open the thumbnail cache for video_path, creating an empty one if there is none or the video has changed.
+        """
+        st = os.stat(video_path)
+        path = cls.cache_path(video_path)
+        try:
+            mm = np.memmap(path, np.uint8, mode='r+')
+            magic, version, size, mtime_ns = cls.HEADER.unpack_from(mm, 0)[:4]
+            if magic == cls.MAGIC and version == cls.VERSION and size == st.st_size and mtime_ns == st.st_mtime_ns:
+                return cls(path, mm)
+            del mm
+        except (OSError, ValueError, struct.error):
+            pass
+        fps = fps if fps > 0 else 30.0
+        interval = max(int(fps * cls.MIN_SECONDS), -(-frame_count // cls.MAX_COUNT), 1)
+        count = max(1, -(-frame_count // interval))
+        width, height = cls.THUMB_SIZE
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, st.st_size, st.st_mtime_ns, interval, count, width, height, 0))
+            f.truncate(cls.HEADER.size + count * width * height * 3)
+        return cls(path, np.memmap(path, np.uint8, mode='r+'))
+
+    @property
+    def filled(self):
+        """
+        Number of thumbnails generated so far, from the start of the video.
+        """
+        return self.HEADER.unpack_from(self._mm, 0)[-1]
+
+    def _set_filled(self, filled):
+        struct.pack_into('<I', self._mm, self.HEADER.size - 4, filled)
+
+    def frame_of(self, i):
+        """
+        Return the frame index that thumbnail i was taken from.
+        """
+        return i * self.interval
+
+    def generate(self, open_capture, stop_event, get_seek_index=lambda: None):
+        """
+        Fill the remaining thumbnails in one forward pass over the capture open_capture() returns, grab()bing
+        past the frames in between. Once get_seek_index() returns an index, gaps that span a keyframe jump
+        straight to it instead of grabbing through the GOPs in between.
+        """
+        cap = open_capture()
+        if not cap.isOpened():
+            return
+        try:
+            i = self.filled
+            pos = 0
+            if i:
+                pos = self.frame_of(i)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            while i < self.count and not stop_event.is_set():
+                target = self.frame_of(i)
+                seek_index = get_seek_index()
+                if seek_index is not None:
+                    keyframe = seek_index.keyframe_before(target)
+                    if keyframe > pos:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                        pos = keyframe
+                while pos < target and cap.grab():
+                    pos += 1
+                if pos < target or not cap.grab():
+                    break
+                pos += 1
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self.thumbs[i])
+                i += 1
+                self._set_filled(i)
+                if i % 50 == 0:
+                    self._mm.flush()
+        finally:
+            cap.release()
+            self._mm.flush()
+
+
+class TimelineStrip:
+    """
+    Strip of thumbnails under the video. Thumbnails are generated by a background worker and appear as they
+    are filled in. Hovering shows the cached thumbnail for that point in the video, and clicking seeks there.
+    """
+    HEIGHT = 40
+    POLL_MS = 500
+
+    def __init__(self, parent, gui, width):
+        self.gui = gui
+        self.width = width
+        self.canvas = Canvas(parent, width=width, height=self.HEIGHT, bg='gray20', highlightthickness=0)
+        self.strip_photo = None  # PhotoImages are created when the first video is loaded, so Pillow can load late
+        self.strip_image = self.canvas.create_image(0, 0, anchor='nw')
+        self.playhead = self.canvas.create_line(0, 0, 0, self.HEIGHT, fill='yellow', width=2)
+        self.preview_photo = None
+        self.preview = Label(parent, bd=1, relief='solid')
+        self.cache = None
+        self.frame_count = 0
+        self._drawn = -1  # Thumbnails filled when the strip was last drawn
+        self._stop_event = threading.Event()
+        self._poll_job = None
+        self.canvas.bind('<Motion>', self._on_motion)
+        self.canvas.bind('<Leave>', lambda e: self.preview.place_forget())
+        self.canvas.bind('<Button-1>', self._on_click)
+
+    def load(self, video_path):
+        """
+        Open (or start generating) the thumbnails for a newly opened video.
+        """
+        self.close()
+        if self.strip_photo is None:
+            self.strip_photo = ImageTk.PhotoImage('RGB', (self.width, self.HEIGHT))
+            self.canvas.itemconfig(self.strip_image, image=self.strip_photo)
+            self.preview_photo = ImageTk.PhotoImage('RGB', ThumbnailCache.THUMB_SIZE)
+            self.preview.config(image=self.preview_photo)
+        self._stop_event = threading.Event()
+        video = self.gui.video
+        self.frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            self.cache = ThumbnailCache.open(video_path, self.frame_count, video.get(cv2.CAP_PROP_FPS))
+        except OSError:
+            self.cache = None
+            return
+        if self.cache.filled < self.cache.count:
+            cache, stop_event = self.cache, self._stop_event
+            threading.Thread(target=cache.generate,
+                             args=(VideoProcessor.scan_opener(self.gui), stop_event, lambda: self.gui.seek_index),
+                             daemon=True).start()
+        self._drawn = -1
+        self._poll()
+
+    def close(self):
+        """
+        Stop generating thumbnails for the current video.
+        """
+        self._stop_event.set()
+        if self._poll_job is not None:
+            self.canvas.after_cancel(self._poll_job)
+            self._poll_job = None
+
+    def _poll(self):
+        filled = self.cache.filled
+        if filled != self._drawn:
+            self._draw(filled)
+        if self.frame_count:
+            x = self.gui.frame_pos * self.width // self.frame_count
+            self.canvas.coords(self.playhead, x, 0, x, self.HEIGHT)
+        self._poll_job = self.canvas.after(self.POLL_MS, self._poll)
+
+    def _draw(self, filled):
+        # Lay evenly spaced thumbnails side by side across the strip
+        self._drawn = filled
+        tile_w = self.HEIGHT * self.cache.size[0] // self.cache.size[1]
+        strip = np.zeros((self.HEIGHT, self.width, 3), np.uint8)
+        for x in range(0, self.width, tile_w):
+            i = self._thumb_at(x)
+            if i < filled:
+                w = min(tile_w, self.width - x)
+                tile = cv2.resize(self.cache.thumbs[i], (tile_w, self.HEIGHT), interpolation=cv2.INTER_AREA)
+                strip[:, x:x + w] = tile[:, :w]
+        self.strip_photo.paste(Image.fromarray(strip))
+
+    def _thumb_at(self, x):
+        return min(self.cache.count - 1, max(0, x * self.cache.count // self.width))
+
+    def _on_motion(self, event):
+        if self.cache is None:
+            return
+        i = self._thumb_at(event.x)
+        if i >= self.cache.filled:
+            self.preview.place_forget()
+            return
+        self.preview_photo.paste(Image.fromarray(self.cache.thumbs[i]))
+        x = min(max(event.x, self.cache.size[0] // 2), self.width - self.cache.size[0] // 2)
+        self.preview.place(in_=self.canvas, x=x, y=-4, anchor='s')
+        self.preview.lift()
+
+    def _on_click(self, event):
+        if self.cache is None or not self.gui.video:
+            return
+        frame_idx = min(self.frame_count - 1, event.x * self.frame_count // self.width)
+        VideoProcessor.seek_to_frame(self.gui, frame_idx)
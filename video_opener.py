@@ -0,0 +1,94 @@
+"""
+Opening a video (or a folder of segments) away from the Tk thread.
+
+Probing the container, reading the log next to it and decoding the first frame can each take seconds on a
+network drive. VideoOpener does them on a worker thread, so the window stays responsive and the start time can
+be asked for in the meantime; the GUI polls it and takes over what it opened once it is done.
+"""
+import os
+import threading
+import time
+import proxy
+from csv_logger import CSVLogger
+from frame_reader import FrameScaler
+from perf_stats import PERF
+from segmented_capture import SegmentedCapture, TimelineIndex
+from video_processor import VideoProcessor
+
+
+class VideoOpener:
+    """
+    Opens path on a worker thread: a video file, or with folder=True every segment file in the folder.
+    stage names the step the worker is on, for the GUI to show, and done is set once it has finished.
+    Afterwards either error is set, or video, logger and first_frame (plus timeline for a folder, and
+    proxy_path and source_fps when playing from a proxy) are ready to be taken over.
+    """
+    def __init__(self, path, folder=False, use_proxy=False, size=(640, 480)):
+        self.path = path
+        self.folder = folder
+        self.use_proxy = use_proxy
+        self.size = size
+        self.started = time.perf_counter()  # For the time to first frame
+        self.stage = "Opening"
+        self.done = threading.Event()
+        self.error = None
+        self.video = None
+        self.timeline = None  # TimelineIndex of a folder
+        self.proxy_path = None
+        self.source_fps = None
+        self.logger = None
+        self.first_frame = None  # Frame 0 scaled for display, or None if it could not be decoded
+        self.start_known = False  # Set by the GUI once the start time has been entered
+        self._lock = threading.Lock()
+        self._cancelled = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        """
+        Give up on this open, for example because another video was chosen. Whatever the worker opened is
+        released, now or as soon as it finishes.
+        """
+        with self._lock:
+            self._cancelled = True
+            finished = self.done.is_set()
+        if finished:
+            self._release()
+
+    def _run(self):
+        try:
+            with PERF.time('open_probe'):
+                if self.folder:
+                    self.stage = "Reading segments"
+                    self.timeline = TimelineIndex.probe(self.path)
+                    self.video = SegmentedCapture(self.timeline)
+                else:
+                    self.proxy_path = proxy.find_proxy(self.path) if self.use_proxy else None
+                    self.source_fps = VideoProcessor.read_source_fps(self.path) if self.proxy_path else None
+                    self.video = VideoProcessor.open_video(self.path, self.proxy_path)
+                    if not self.video.isOpened():
+                        raise OSError(f"Could not open {self.path}")
+            if not self._cancelled:
+                self.stage = "Reading log"
+                with PERF.time('open_log'):
+                    self.logger = CSVLogger(os.path.splitext(self.path)[0] + ".csv")
+            if not self._cancelled:
+                self.stage = "Decoding"
+                with PERF.time('open_first_frame'):
+                    ret, frame = self.video.read()
+                    if ret:
+                        self.first_frame = FrameScaler(self.size).scale(frame)
+        except Exception as e:
+            self.error = e
+        with self._lock:
+            self.done.set()
+            cancelled = self._cancelled
+        if cancelled or self.error is not None:
+            self._release()
+
+    def _release(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        if self.logger is not None:
+            self.logger.close()
+            self.logger = None
@@ -1,15 +1,90 @@
-import cv2
-import os
+import threading
+import time
 from datetime import timedelta, datetime
-from PIL import Image, ImageTk
+from frame_reader import FrameReader, FrameScaler, ReverseReader
+from playback_clock import PlaybackClock
+from seek_index import SeekIndex
+from perf_stats import PERF
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+ImageTk = lazy_module('PIL.ImageTk')
 
 class VideoProcessor:
+    LANDING_FRAMES = 10  # Frames before a seek target that are cached while decoding up to it
+    SKIM_JUMP_SECONDS = 2  # Video time the decoder may fall behind while skimming before it seeks ahead instead
+
+    @staticmethod
+    def open_video(path, proxy_path=None):
+        """
+        Open a video file and return a cv2.VideoCapture object. If a proxy is given, frames are decoded from it
+        instead; it has one frame per source frame, so frame indices are the same either way.
+        """
+        return cv2.VideoCapture(proxy_path or path)
+
+    @staticmethod
+    def source_fps(gui):
+        """
+        Return the frame rate of the source video, which a proxy may only store rounded.
+        """
+        fps = getattr(gui, 'source_fps', None)
+        return fps if fps else gui.video.get(cv2.CAP_PROP_FPS)
+
+    @staticmethod
+    def read_source_fps(path):
+        """
+        Return the frame rate stored in a video file.
+        """
+        probe = cv2.VideoCapture(path)
+        fps = probe.get(cv2.CAP_PROP_FPS)
+        probe.release()
+        return fps
+
+    @staticmethod
+    def source_opener(gui):
+        """
+        Return a function that opens a separate capture of the source video (or folder timeline) frames are
+        read from away from playback, such as thumbnails and stills.
+        """
+        clone = getattr(gui.video, 'clone', None)
+        if clone is not None:
+            return clone
+        path = gui.video_path
+        return lambda: cv2.VideoCapture(path)
+
     @staticmethod
-    def open_video(path):
+    def scan_opener(gui):
         """
-        Open a video file and return a cv2.VideoCapture object.
+        Return a function that opens the cheapest capture of the frames for background scans such as thumbnails
+        and skimming: a folder timeline's segments, the proxy when one is in use, or the video itself.
         """
-        return cv2.VideoCapture(path)
+        clone = getattr(gui.video, 'clone', None)
+        if clone is not None:
+            return clone
+        path = gui.proxy_path or gui.video_path
+        return lambda: cv2.VideoCapture(path)
+
+    @staticmethod
+    def read_source_frame(gui, frame_idx):
+        """
+        Decode frame_idx at full resolution from the source video, even when playing from a proxy.
+        Returns the BGR frame, or None if it could not be read.
+        """
+        cap = VideoProcessor.source_opener(gui)()
+        if not cap.isOpened():
+            return None
+        try:
+            index = getattr(gui, 'seek_index', None)
+            pos = frame_idx
+            if index is not None:
+                pos = index.keyframe_before(frame_idx)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            while pos < frame_idx and cap.grab():
+                pos += 1
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
 
     @staticmethod
     def toggle_play(gui, event=None):
@@ -20,20 +95,213 @@ class VideoProcessor:
             return
         gui.paused = not gui.paused
         if not gui.paused:
+            if getattr(gui, 'reverse', False):
+                VideoProcessor.stop_reader(gui)  # Was playing backwards, carry on forwards
+                gui.reverse = False
+            if gui.play_job is not None:
+                gui.root.after_cancel(gui.play_job)
             VideoProcessor.play_video(gui)
 
+    @staticmethod
+    def toggle_reverse(gui, event=None):
+        """
+        Play backwards at the current speed, or pause if already playing backwards.
+        """
+        if not gui.video:
+            return
+        if not gui.paused and gui.reverse:
+            gui.paused = True
+            return
+        VideoProcessor.stop_reader(gui)
+        gui.reverse = True
+        gui.paused = False
+        if gui.play_job is not None:
+            gui.root.after_cancel(gui.play_job)
+        VideoProcessor.play_video(gui)
+
     @staticmethod
     def play_video(gui):
         """
-        Play the video by reading frames and updating the GUI at the current speed.
+        Play the video by showing frames decoded ahead by a FrameReader, paced by a wall clock at the current speed.
+        Frames that fall behind the clock are dropped, and the achieved speed is shown in the status label.
+        While gui.reverse is set, a ReverseReader decodes the frames before the playhead and the clock runs backwards.
         """
-        if not gui.paused and gui.video and gui.video.isOpened():
-            ret, frame = gui.video.read()
-            if not ret:
+        gui.play_job = None
+        if PERF.enabled and getattr(gui, 'play_due', None) is not None:
+            # How late Tk ran this tick, which includes painting and anything else on the main thread
+            PERF.record('tk_lag', max(0.0, (time.perf_counter() - gui.play_due) * 1000))
+        if gui.paused or not gui.video or not gui.video.isOpened():
+            VideoProcessor.stop_reader(gui)
+            return
+        speed = VideoProcessor.playback_speed(gui)
+        # The first frame due is the one after the displayed frame, or the one before it when playing backwards
+        first_due = gui.frame_pos if speed > 0 else gui.frame_pos - 2
+        if gui.reader is None:
+            size = (gui.frame_width, gui.frame_height)
+            clock = PlaybackClock(first_due, gui.video.get(cv2.CAP_PROP_FPS), speed)
+            if speed > 0:
+                VideoProcessor.sync_capture(gui)
+                gui.reader = FrameReader(gui.video, size, clock=clock)
+            else:
+                gui.reader = ReverseReader(gui.video, size, gui.frame_pos - 1, clock, VideoProcessor.keyframe_lookup(gui))
+            gui.reader.start()
+        reader = gui.reader
+        clock = reader.clock
+        if clock.speed != speed:
+            clock.set_speed(speed, first_due)
+        elif speed > gui.speed and clock.target_frame() - reader.position > clock.fps * VideoProcessor.SKIM_JUMP_SECONDS:
+            # Skimming faster than the decoder can grab through the footage, seek ahead to the clock instead
+            VideoProcessor.stop_reader(gui)
+            gui.frame_pos = min(clock.target_frame(), int(gui.video.get(cv2.CAP_PROP_FRAME_COUNT)) - 1)
+            PERF.count('skim_jumps')
+            gui.play_due = None
+            gui.play_job = gui.root.after(1, lambda: VideoProcessor.play_video(gui))
+            return
+        item = reader.take(clock.target_frame())
+        if item is not None:
+            gui.frame_pos, frame = item
+            VideoProcessor.display_image(gui, frame.image)
+            with PERF.time('cache_put'):
+                gui.frame_cache.put(gui.frame_pos - 1, frame)
+            clock.frame_shown(gui.frame_pos)
+            VideoProcessor.update_speed_label(gui)
+            PERF.count('frames_shown')
+        if PERF.enabled:
+            PERF.gauge('queue_depth', reader.frames.qsize())
+            PERF.gauge('dropped', reader.dropped)
+        next_pos = reader.next_position()
+        if next_pos is None:
+            if reader.exhausted():
+                VideoProcessor.stop_reader(gui)
                 return
-            VideoProcessor.show_frame(gui, frame)
-            delay = int(30 / gui.speed)
-            gui.root.after(delay, lambda: VideoProcessor.play_video(gui))
+            # Decoder has not caught up yet, check again shortly
+            delay = 5
+        else:
+            delay = max(1, int(clock.seconds_until(next_pos - 1) * 1000))
+        gui.play_due = time.perf_counter() + delay / 1000
+        gui.play_job = gui.root.after(delay, lambda: VideoProcessor.play_video(gui))
+
+    @staticmethod
+    def playback_speed(gui):
+        """
+        Return the speed to play at right now: the chosen speed, or the skim speed through static footage.
+        The speed is negative while playing backwards.
+        """
+        if getattr(gui, 'reverse', False):
+            return -gui.speed
+        skim = getattr(gui, 'skim', None)
+        return skim.speed_at(gui.frame_pos, gui.speed) if skim is not None else gui.speed
+
+    @staticmethod
+    def keyframe_lookup(gui):
+        """
+        Return the seek index's keyframe_before for decoding backwards in whole GOPs, or None if every seek lands
+        where it is asked to (a proxy), or there is no index yet.
+        """
+        index = getattr(gui, 'seek_index', None)
+        if index is None or getattr(gui, 'proxy_path', None):
+            return None
+        return index.keyframe_before
+
+    @staticmethod
+    def update_speed_label(gui):
+        """
+        Show the requested speed in the status label, along with the achieved speed while playing.
+        """
+        if not hasattr(gui, 'status_label'):
+            return
+        achieved = gui.reader.clock.achieved_speed() if gui.reader else None
+        if achieved is None:
+            gui.status_label.config(text=f"{gui.speed}x")
+        else:
+            gui.status_label.config(text=f"{achieved:.1f}/{gui.reader.clock.speed}x")
+
+    @staticmethod
+    def update_cache_label(gui):
+        """
+        Show the frame cache fill and hit rate in the cache label, if present.
+        """
+        if hasattr(gui, 'cache_label'):
+            gui.cache_label.config(text=gui.frame_cache.describe())
+
+    @staticmethod
+    def stop_reader(gui):
+        """
+        Stop the background decode thread and discard its queued frames. The capture is left wherever the
+        thread stopped, and is moved back to the displayed frame by sync_capture() before it is next read.
+        """
+        reader = getattr(gui, 'reader', None)
+        if reader is None:
+            return
+        reader.stop()
+        gui.reader = None
+        gui.capture_pos = reader.position
+        VideoProcessor.update_speed_label(gui)
+
+    @staticmethod
+    def sync_capture(gui):
+        """
+        Make sure the next frame the capture decodes is the one after the displayed frame.
+        """
+        if gui.capture_pos != gui.frame_pos:
+            VideoProcessor.position_capture(gui, gui.frame_pos)
+
+    @staticmethod
+    def position_capture(gui, frame_idx):
+        """
+        Move the capture so its next read() returns frame_idx.
+        With a seek index, the capture jumps to the nearest keyframe (or stays put if it is already inside
+        the right GOP) and decodes forward to land exactly on the frame. The last LANDING_FRAMES frames
+        decoded on the way are added to the frame cache, ready for stepping backwards.
+        """
+        with PERF.time('seek'):
+            VideoProcessor._position_capture(gui, frame_idx)
+
+    @staticmethod
+    def _position_capture(gui, frame_idx):
+        index = getattr(gui, 'seek_index', None)
+        if index is None or getattr(gui, 'proxy_path', None):
+            # Every frame of a proxy is a keyframe, so the backend seek is exact and cheap
+            gui.video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            gui.capture_pos = frame_idx
+            return
+        keyframe = index.keyframe_before(frame_idx)
+        pos = gui.capture_pos
+        if not keyframe <= pos <= frame_idx:
+            gui.video.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            pos = keyframe
+        while pos < frame_idx:
+            if not gui.video.grab():
+                break
+            if frame_idx - pos <= VideoProcessor.LANDING_FRAMES and pos not in gui.frame_cache:
+                ret, frame = gui.video.retrieve()
+                if ret:
+                    gui.frame_cache.put(pos, VideoProcessor.scale_for_display(gui, frame))
+            pos += 1
+        gui.capture_pos = pos
+
+    @staticmethod
+    def scale_for_display(gui, frame):
+        """
+        Scale a decoded BGR frame to the display size, returning a DisplayFrame that is reused on the next call.
+        """
+        if gui.scaler is None:
+            gui.scaler = FrameScaler((gui.frame_width, gui.frame_height))
+        return gui.scaler.scale(frame)
+
+    @staticmethod
+    def display_image(gui, img):
+        """
+        Show an already scaled RGBA PIL image in the video frame label by pasting it into one reused PhotoImage.
+        """
+        if gui.frame_photo is None:
+            with PERF.time('photo_create'):
+                gui.frame_photo = ImageTk.PhotoImage('RGBA', (gui.frame_width, gui.frame_height))
+        with PERF.time('paste'):
+            gui.frame_photo.paste(img)
+        if gui.frame_label.imgtk is not gui.frame_photo:
+            gui.frame_label.imgtk = gui.frame_photo
+            gui.frame_label.config(image=gui.frame_photo)
 
     @staticmethod
     def show_frame(gui, frame=None):
@@ -41,30 +309,93 @@ class VideoProcessor:
         Display a single video frame in the GUI. If no frame is provided, read the next frame from the video.
         """
         if gui.video and frame is None:
-            ret, frame = gui.video.read()
+            VideoProcessor.stop_reader(gui)
+            VideoProcessor.sync_capture(gui)
+            with PERF.time('decode'):
+                ret, frame = gui.video.read()
             if not ret:
                 gui.frame_label.config(image=gui.blank_imgtk)
                 gui.frame_label.imgtk = gui.blank_imgtk
                 return
-        if frame is not None:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-            img = img.resize((gui.frame_width, gui.frame_height), Image.LANCZOS)
-            imgtk = ImageTk.PhotoImage(image=img)
-            gui.frame_label.imgtk = imgtk
-            gui.frame_label.config(image=imgtk)
+            gui.frame_pos = gui.capture_pos = int(gui.video.get(cv2.CAP_PROP_POS_FRAMES))
+            scaled = VideoProcessor.scale_for_display(gui, frame)
+            gui.frame_cache.put(gui.frame_pos - 1, scaled)
+            VideoProcessor.display_image(gui, scaled.image)
+        elif frame is not None:
+            VideoProcessor.display_image(gui, VideoProcessor.scale_for_display(gui, frame).image)
         else:
             gui.frame_label.config(image=gui.blank_imgtk)
             gui.frame_label.imgtk = gui.blank_imgtk
 
+    @staticmethod
+    def seek_to_frame(gui, frame_idx):
+        """
+        Seek the video to frame_idx and show that frame. If the video is playing, playback continues from there.
+        Frames in the frame cache are shown without touching the decoder.
+        """
+        if not gui.video:
+            return
+        VideoProcessor.stop_reader(gui)
+        index = getattr(gui, 'seek_index', None)
+        if index is not None:
+            frame_idx = min(max(0, frame_idx), index.frame_count - 1)
+        cached = gui.frame_cache.get(frame_idx)
+        if cached is not None:
+            gui.frame_pos = frame_idx + 1
+            VideoProcessor.display_image(gui, cached.image)
+        else:
+            VideoProcessor.position_capture(gui, frame_idx)
+            gui.frame_pos = frame_idx
+            VideoProcessor.show_frame(gui)
+        VideoProcessor.update_cache_label(gui)
+
+    @staticmethod
+    def load_seek_index(gui, path):
+        """
+        Load the cached seek index for path, or build it on a background thread. gui.seek_index is set once ready.
+        """
+        timeline = getattr(gui.video, 'index', None)
+        if timeline is not None:
+            # Folder timeline: usable straight away, its segments' indexes are filled in as they are built
+            gui.seek_index = timeline
+            threading.Thread(target=timeline.load_indexes, args=(lambda: gui.video_path == path,), daemon=True).start()
+            return
+        gui.seek_index = None
+        def worker():
+            index = SeekIndex.load_or_build(path)
+            if gui.video_path == path:
+                gui.seek_index = index
+        threading.Thread(target=worker, daemon=True).start()
+
+    @staticmethod
+    def frame_to_ms(gui, frame_idx):
+        """
+        Return the video time in milliseconds of frame_idx, using presentation timestamps when indexed.
+        """
+        index = getattr(gui, 'seek_index', None)
+        if index is not None:
+            return index.frame_to_ms(frame_idx)
+        fps = VideoProcessor.source_fps(gui)
+        return frame_idx / fps * 1000 if fps > 0 else 0
+
+    @staticmethod
+    def ms_to_frame(gui, ms):
+        """
+        Return the index of the frame shown at ms milliseconds of video time.
+        """
+        index = getattr(gui, 'seek_index', None)
+        if index is not None:
+            return index.ms_to_frame(ms)
+        fps = VideoProcessor.source_fps(gui)
+        return int(ms / 1000 * fps)
+
     @staticmethod
     def speed_up(gui):
         """
         Increase playback speed, up to a maximum of 10x. Update the status label if present.
         """
         gui.speed = min(gui.speed + 0.25, 10)
-        if hasattr(gui, 'status_label'):
-            gui.status_label.config(text=f"{gui.speed}x")
+        VideoProcessor.update_speed_label(gui)
         return gui.speed
 
     @staticmethod
@@ -73,8 +404,7 @@ class VideoProcessor:
         Decrease playback speed, down to a minimum of 0.25x. Update the status label if present.
         """
         gui.speed = max(gui.speed - 0.25, 0.25)
-        if hasattr(gui, 'status_label'):
-            gui.status_label.config(text=f"{gui.speed}x")
+        VideoProcessor.update_speed_label(gui)
         return gui.speed
 
     @staticmethod
@@ -83,10 +413,9 @@ class VideoProcessor:
         Move to the previous frame in the video and pause playback.
         """
         if gui.video:
-            #checks the current frame, checks that it is not the first frame, and then sets the video to the previous frame
-            gui.video.set(cv2.CAP_PROP_POS_FRAMES, max(0, gui.video.get(cv2.CAP_PROP_POS_FRAMES) - 2))
             gui.paused = True
-            VideoProcessor.show_frame(gui)
+            # frame_pos is one past the displayed frame, so the previous frame is two back
+            VideoProcessor.seek_to_frame(gui, max(0, gui.frame_pos - 2))
 
     @staticmethod
     def next_frame(gui):
@@ -94,86 +423,66 @@ class VideoProcessor:
         Move to the next frame in the video and pause playback.
         """
         if gui.video: # check if video is opened
-            # checks the current frame, checks that it is not the last frame, and then sets the video to the next frame
-            frame_count = int(gui.video.get(cv2.CAP_PROP_FRAME_COUNT)) # get total number of frames
-            gui.video.set(cv2.CAP_PROP_POS_FRAMES, min(frame_count - 1, gui.video.get(cv2.CAP_PROP_POS_FRAMES) + 1))
             gui.paused = True
-            VideoProcessor.show_frame(gui)
+            VideoProcessor.stop_reader(gui)
+            # checks that it is not the last frame, and then shows the frame after the displayed one
+            frame_count = int(gui.video.get(cv2.CAP_PROP_FRAME_COUNT)) # get total number of frames
+            VideoProcessor.seek_to_frame(gui, min(frame_count - 1, gui.frame_pos))
 
     @staticmethod
-    def skip_back_5s(gui):
+    def skip_seconds(gui, seconds):
         """
-        Skip backward 5 seconds in the video.
+        Skip forward (positive) or backward (negative) the given number of seconds in the video.
         """
         if gui.video:
+            VideoProcessor.stop_reader(gui)
             vp = gui.video
             fps = vp.get(cv2.CAP_PROP_FPS)
-            new_pos = max(0, vp.get(cv2.CAP_PROP_POS_FRAMES) - int(fps * 5))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+            frame_count = int(vp.get(cv2.CAP_PROP_FRAME_COUNT))
+            new_pos = min(frame_count - 1, max(0, gui.frame_pos + int(fps * seconds)))
+            VideoProcessor.seek_to_frame(gui, new_pos)
+
+    @staticmethod
+    def skip_back_5s(gui):
+        """
+        Skip backward 5 seconds in the video.
+        """
+        VideoProcessor.skip_seconds(gui, -5)
 
     @staticmethod
     def skip_forward_5s(gui):
         """
         Skip forward 5 seconds in the video.
         """
-        if gui.video:
-            vp = gui.video
-            fps = vp.get(cv2.CAP_PROP_FPS)
-            frame_count = int(vp.get(cv2.CAP_PROP_FRAME_COUNT))
-            new_pos = min(frame_count - 1, vp.get(cv2.CAP_PROP_POS_FRAMES) + int(fps * 5))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+        VideoProcessor.skip_seconds(gui, 5)
 
     @staticmethod
     def skip_back_5min(gui):
         """
         Skip backward 5 minutes in the video.
         """
-        if gui.video:
-            vp = gui.video
-            fps = vp.get(cv2.CAP_PROP_FPS)
-            new_pos = max(0, vp.get(cv2.CAP_PROP_POS_FRAMES) - int(fps * 60 * 5))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+        VideoProcessor.skip_seconds(gui, -60 * 5)
 
     @staticmethod
     def skip_forward_5min(gui):
         """
         Skip forward 5 minutes in the video.
         """
-        if gui.video:
-            vp = gui.video
-            fps = vp.get(cv2.CAP_PROP_FPS)
-            frame_count = int(vp.get(cv2.CAP_PROP_FRAME_COUNT))
-            new_pos = min(frame_count - 1, vp.get(cv2.CAP_PROP_POS_FRAMES) + int(fps * 60 * 5))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+        VideoProcessor.skip_seconds(gui, 60 * 5)
 
     @staticmethod
     def skip_back_1hr(gui):
         """
         Skip backward 1 hour in the video.
         """
-        if gui.video:
-            vp = gui.video
-            fps = vp.get(cv2.CAP_PROP_FPS)
-            new_pos = max(0, vp.get(cv2.CAP_PROP_POS_FRAMES) - int(fps * 60 * 60))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+        VideoProcessor.skip_seconds(gui, -60 * 60)
 
     @staticmethod
     def skip_forward_1hr(gui):
         """
         Skip forward 1 hour in the video.
         """
-        if gui.video:
-            vp = gui.video
-            fps = vp.get(cv2.CAP_PROP_FPS)
-            frame_count = int(vp.get(cv2.CAP_PROP_FRAME_COUNT))
-            new_pos = min(frame_count - 1, vp.get(cv2.CAP_PROP_POS_FRAMES) + int(fps * 60 * 60))
-            vp.set(cv2.CAP_PROP_POS_FRAMES, new_pos)
-            VideoProcessor.show_frame(gui)
+        VideoProcessor.skip_seconds(gui, 60 * 60)
 
     @staticmethod
     def parse_start_time(start_time_str):